@@ -7,24 +7,6 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from .config import Config
 
-from logging.config import dictConfig
-
-dictConfig({
-    'version': 1,
-    'formatters': {'default': {
-        'format': '[%(asctime)s] %(levelname)s in %(module)s: %(message)s',
-    }},
-    'handlers': {'wsgi': {
-        'class': 'logging.StreamHandler',
-        'stream': 'ext://flask.logging.wsgi_errors_stream',
-        'formatter': 'default'
-    }},
-    'root': {
-        'level': 'INFO',
-        'handlers': ['wsgi']
-    }
-})
-
 app = Flask(__name__)
 app.config.from_object(Config)
 app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
@@ -36,6 +18,20 @@ login_manager = LoginManager(app)
 login_manager.session_protection = "strong"
 login_manager.login_view = "auth.login"
 
+from . import database, logconfig, metrics, slowquery, querybudget, profiling, assets, hints, querycache, content, fragments, tokens, warmup
+
+database.init_app(app)
+logconfig.init_app(app)
+assets.init_app(app)
+hints.init_app(app)
+fragments.init_app(app)
+profiling.init_app(app)
+metrics.init_app(app)
+slowquery.init_app(app)
+querybudget.init_app(app)
+tokens.init_app(app)
+warmup.init_app(app)
+
 
 @app.context_processor
 def inject_current_year():
@@ -55,6 +51,41 @@ def create_app():
     if "auth" not in app.blueprints:
         app.register_blueprint(auth_blueprint, url_prefix="/auth")
 
+    from .api import api as api_blueprint
+
+    if "api" not in app.blueprints:
+        app.register_blueprint(api_blueprint, url_prefix="/api/v1")
+
+    from .ingest import ingest_trivias_command
+
+    if "ingest-trivias" not in app.cli.commands:
+        app.cli.add_command(ingest_trivias_command)
+
+    from .related import rebuild_related_command
+
+    if "rebuild-related" not in app.cli.commands:
+        app.cli.add_command(rebuild_related_command)
+
+    from .storage import migrate_uploads_command
+
+    if "migrate-uploads" not in app.cli.commands:
+        app.cli.add_command(migrate_uploads_command)
+
+    from .reconcile import reconcile_uploads_command
+
+    if "reconcile-uploads" not in app.cli.commands:
+        app.cli.add_command(reconcile_uploads_command)
+
+    from .onthisday import backfill_month_day_command
+
+    if "backfill-month-day" not in app.cli.commands:
+        app.cli.add_command(backfill_month_day_command)
+
+    from .content import render_bodies_command
+
+    if "render-bodies" not in app.cli.commands:
+        app.cli.add_command(render_bodies_command)
+
     return app
 
 
@@ -63,9 +94,9 @@ def external_url_handler(error, endpoint, values):
     # This is an example of hooking the build_error_handler.
     # Here, lookup_url is some utility function you've built
     # which looks up the endpoint in some external URL registry.
-    print("endpoint type:", endpoint)
+    logging.debug("endpoint type: %s", endpoint)
     for value in values:
-        print("value:", value)
+        logging.debug("value: %s", value)
 
     url = lookup_url(endpoint, **values)
     if url is None:
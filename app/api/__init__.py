@@ -0,0 +1,12 @@
+"""
+blueprint creation file for the versioned json api
+"""
+from flask import Blueprint
+from app import csrf
+
+api = Blueprint("api", __name__)  # pylint: disable=invalid-name
+
+# Writes are authenticated by bearer token, not by the session cookie.
+csrf.exempt(api)
+
+from . import views
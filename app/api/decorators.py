@@ -0,0 +1,25 @@
+from functools import wraps
+from flask import abort, g
+from app import tokens
+
+
+def token_required(permission):
+    """
+    api views authenticate with `Authorization: Bearer <auth token>`
+    instead of the session cookie, and so skip csrf. g.api_user is a
+    tokens.TokenUser, not a database row.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user = tokens.from_request()
+            if user is None:
+                abort(401)
+            if not user.can(permission):
+                abort(403)
+            g.api_user = user
+            return f(*args, **kwargs)
+
+        return decorated_function
+
+    return decorator
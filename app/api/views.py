@@ -0,0 +1,239 @@
+"""
+Read-only json api for posters and trivias.
+
+Lists are keyset paginated on (timestamp, id) / (date, id): a response
+carries an opaque `next` cursor instead of a page number, so deep pages
+cost the same index seek as the first one. Rows without a timestamp or
+date follow the dated ones, newest id first. `fields=` picks the columns to
+load; the heavy text columns (body, body_html, description) are only read
+when asked for. Responses are compact json with an ETag, and a matching
+If-None-Match gets a 304.
+"""
+import json
+import base64
+import binascii
+from datetime import datetime
+from flask import request, abort, current_app
+from sqlalchemy import tuple_
+from app import db, bulk as batches, suggest as suggestions
+from app.models import Post, PostType, Trivia, Permission
+from app.ingest import parse_items, ingest
+from . import api
+from .decorators import token_required
+
+_RESOURCES = {
+    "posters": {
+        "model": Post,
+        "order": Post.timestamp,
+        "post_type": PostType.POSTER,
+        "fields": {
+            "id": Post.id,
+            "header": Post.header,
+            "tags": Post.tags,
+            "timestamp": Post.timestamp,
+            "url": Post.url,
+            "description": Post.description,
+            "body": Post.body,
+            "body_html": Post.body_html,
+            "excerpt": Post.excerpt,
+            "reading_time": Post.reading_time,
+        },
+        "default_fields": ("id", "header", "tags", "timestamp", "url"),
+    },
+    "trivias": {
+        "model": Trivia,
+        "order": Trivia.date,
+        "post_type": PostType.TRIVIA,
+        "fields": {
+            "id": Trivia.id,
+            "header": Trivia.header,
+            "tags": Trivia.tags,
+            "date": Trivia.date,
+            "url": Trivia.url,
+            "body": Trivia.body,
+            "body_html": Trivia.body_html,
+            "excerpt": Trivia.excerpt,
+            "reading_time": Trivia.reading_time,
+        },
+        "default_fields": ("id", "header", "tags", "date", "url"),
+    },
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError("{!r} is not json serializable".format(value))
+
+
+def dumps(payload):
+    """
+    compact utf-8 json, no whitespace between tokens.
+    """
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False,
+                      default=_json_default).encode("utf-8")
+
+
+def serialize(rows, names):
+    """
+    column tuples to dicts. extra trailing columns (the cursor) are ignored.
+    """
+    return [dict(zip(names, row)) for row in rows]
+
+
+def encode_cursor(order_value, id):
+    # An empty order value stands for NULL.
+    raw = "{}|{:d}".format(order_value.isoformat() if order_value is not None else "", id)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        order_value, id = base64.urlsafe_b64decode(padded).decode("utf-8").rsplit("|", 1)
+        return datetime.fromisoformat(order_value) if order_value else None, int(id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        abort(400, "invalid cursor")
+
+
+def _fields(resource):
+    requested = request.args.get("fields")
+    if not requested:
+        return list(resource["default_fields"])
+
+    names = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in names if name not in resource["fields"]]
+    if unknown:
+        abort(400, "unknown fields: {}".format(", ".join(unknown)))
+    if "id" not in names:
+        names.insert(0, "id")
+    return names
+
+
+def _respond(payload):
+    response = current_app.response_class(dumps(payload), mimetype="application/json")
+    response.headers["Cache-Control"] = "public, max-age={:d}".format(current_app.config["API_MAX_AGE"])
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def _list(name):
+    resource = _RESOURCES[name]
+    model, order = resource["model"], resource["order"]
+    names = _fields(resource)
+    limit = request.args.get("limit", current_app.config["API_PAGE_SIZE"], type=int)
+    if limit < 1:
+        abort(400, "limit must be positive")
+    limit = min(limit, current_app.config["API_MAX_PAGE_SIZE"])
+
+    # The keyset columns ride along at the end of every row for the cursor.
+    columns = [resource["fields"][field] for field in names]
+    query = db.session.query(*columns, order, model.id).filter(model.post_type == resource["post_type"])
+
+    cursor = request.args.get("cursor")
+    after = decode_cursor(cursor) if cursor else None
+
+    # Rows with an order value come first, newest first, then the ones
+    # without, by id. Each part is a plain keyset scan, and NULLs sort the
+    # same way on every database.
+    rows = []
+    if after is None or after[0] is not None:
+        dated = query.filter(order.isnot(None))
+        if after is not None:
+            dated = dated.filter(tuple_(order, model.id) < after)
+        rows = dated.order_by(order.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        undated = query.filter(order.is_(None))
+        if after is not None and after[0] is None:
+            undated = undated.filter(model.id < after[1])
+        rows += undated.order_by(model.id.desc()).limit(limit + 1 - len(rows)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+
+    return _respond({"items": serialize(rows, names), "next": next_cursor})
+
+
+def _detail(name, id):
+    resource = _RESOURCES[name]
+    model = resource["model"]
+    names = _fields(resource)
+    columns = [resource["fields"][field] for field in names]
+
+    row = (
+        db.session.query(*columns)
+        .filter(model.id == id, model.post_type == resource["post_type"])
+        .first()
+    )
+    if row is None:
+        abort(404)
+    return _respond(serialize([row], names)[0])
+
+
+@api.route("/posters", methods=["GET"])
+def posters():
+    return _list("posters")
+
+
+@api.route("/posters/<int:id>", methods=["GET"])
+def poster(id):
+    return _detail("posters", id)
+
+
+@api.route("/trivias", methods=["GET"])
+def trivias():
+    return _list("trivias")
+
+
+@api.route("/trivias/<int:id>", methods=["GET"])
+def trivia(id):
+    return _detail("trivias", id)
+
+
+@api.route("/suggest", methods=["GET"])
+def suggest():
+    """
+    Headers and tags with a word starting with q, from the in-memory index.
+    """
+    limit = request.args.get("limit", current_app.config["SUGGEST_LIMIT"], type=int)
+    if limit < 1:
+        abort(400, "limit must be positive")
+    limit = min(limit, current_app.config["SUGGEST_MAX_LIMIT"])
+    return _respond({"items": suggestions.search(request.args.get("q", ""), limit)})
+
+
+@api.route("/bulk", methods=["POST"])
+@token_required(Permission.WRITE_ARTICLES)
+def bulk():
+    """
+    Delete, retag or change the type of many items in one transaction:
+    {"kind": "posters", "action": "retag", "ids": [1, 2], "tags": "ucl"}.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get("ids"), list):
+        abort(400, "body must be a json object with a list of ids")
+    try:
+        changed = batches.apply(payload.get("kind"), payload.get("action"), payload["ids"],
+                                tags=payload.get("tags"), post_type=payload.get("post_type"))
+    except batches.BulkError as e:
+        abort(400, str(e))
+    return current_app.response_class(dumps({"changed": changed}), mimetype="application/json")
+
+
+@api.route("/trivias/bulk", methods=["POST"])
+@token_required(Permission.WRITE_ARTICLES)
+def bulk_trivias():
+    """
+    Bulk create trivias from a json array or jsonl body.
+    """
+    try:
+        items = parse_items(request.get_data(as_text=True))
+    except ValueError:
+        abort(400, "body must be a json array or json lines")
+    if len(items) > current_app.config["API_BULK_MAX_ITEMS"]:
+        abort(413, "at most {:d} items per request".format(current_app.config["API_BULK_MAX_ITEMS"]))
+
+    result = ingest(items)
+    status = 201 if result["inserted"] else 400
+    return current_app.response_class(dumps(result), status=status, mimetype="application/json")
@@ -0,0 +1,173 @@
+"""
+Static assets built once at startup.
+
+Every file under static/ is copied to static/dist/ under a name carrying
+a hash of its content (css minified first), and url_for("static", ...)
+is rewritten to that name. A changed file gets a new url, so nginx can
+serve dist/ as immutable for a year. BUNDLES concatenate several css
+files into one request.
+
+CRITICAL_CSS names, per template, the selectors visible before any
+scrolling. Those rules are cut from the site bundle and inlined with
+critical_css(); the bundle itself is loaded with stylesheet(), which
+does not block rendering.
+"""
+import os
+import re
+import hashlib
+import logging
+from markupsafe import Markup, escape
+
+logger = logging.getLogger(__name__)
+
+DIST = "dist"
+
+BUNDLES = {
+    "css/site.css": ("css/nav.css", "css/footer.css", "css/index.css"),
+}
+
+CRITICAL_CSS = {
+    "base.html": (".nav-sporty", ".badge-match", ".footer", ".navbar-nav"),
+    "index.html": (".hero-", ".match-chip"),
+    "post.html": (".hero-",),
+    "trivia.html": (".hero-",),
+}
+
+_manifest = {}
+_critical = {}
+
+_STRINGS = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')")
+_COMMENTS = re.compile(r"/\*.*?\*/", re.S)
+_SPACE = re.compile(r"\s+")
+_PUNCTUATION = re.compile(r"\s*([{};:,>])\s*")
+
+
+def minify(css):
+    """
+    drop comments and the whitespace css does not need. quoted strings
+    (data urls, content values) are left as they are.
+    """
+    parts = _STRINGS.split(_COMMENTS.sub("", css))
+    for index in range(0, len(parts), 2):
+        code = _SPACE.sub(" ", parts[index])
+        parts[index] = _PUNCTUATION.sub(r"\1", code).replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def rules(css):
+    """
+    top-level (prelude, body) pairs of minified css; an @media body is
+    itself a list of rules.
+    """
+    depth = start = body = 0
+    prelude = ""
+    for index, char in enumerate(css):
+        if char == "{":
+            if depth == 0:
+                prelude, body = css[start:index], index + 1
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                yield prelude, css[body:index]
+                start = index + 1
+
+
+def critical(css, prefixes):
+    """
+    the rules of css with a selector starting with one of prefixes.
+    """
+    kept = []
+    for prelude, body in rules(css):
+        if prelude.startswith("@media"):
+            inner = critical(body, prefixes)
+            if inner:
+                kept.append("{}{{{}}}".format(prelude, inner))
+        elif any(selector.strip().startswith(prefixes) for selector in prelude.split(",")):
+            kept.append("{}{{{}}}".format(prelude, body))
+    return "".join(kept)
+
+
+def _write(dist, name, data):
+    root, ext = os.path.splitext(name)
+    hashed = "{}.{}{}".format(root, hashlib.sha256(data).hexdigest()[:10], ext)
+    path = os.path.join(dist, hashed)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Workers may build at the same time; the content is identical.
+        tmp = "{}.{:d}.tmp".format(path, os.getpid())
+        with open(tmp, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp, path)
+    return "/".join((DIST, hashed))
+
+
+def _read(static, name):
+    with open(os.path.join(static, name), "rb") as handle:
+        data = handle.read()
+    if name.endswith(".css"):
+        data = minify(data.decode("utf-8")).encode("utf-8")
+    return data
+
+
+def build(app):
+    """
+    fingerprint every static file and bundle, and cut the critical css.
+    returns the manifest of logical name -> dist name.
+    """
+    static = app.static_folder
+    dist = os.path.join(static, DIST)
+    manifest = {}
+
+    for directory, subdirectories, files in os.walk(static):
+        subdirectories[:] = [d for d in subdirectories if os.path.join(directory, d) != dist]
+        for filename in files:
+            name = os.path.relpath(os.path.join(directory, filename), static).replace(os.sep, "/")
+            manifest[name] = _write(dist, name, _read(static, name))
+
+    bundles = {}
+    for bundle, parts in BUNDLES.items():
+        bundles[bundle] = "".join(_read(static, part).decode("utf-8") for part in parts)
+        manifest[bundle] = _write(dist, bundle, bundles[bundle].encode("utf-8"))
+
+    site = bundles.get("css/site.css", "")
+    _critical.clear()
+    _critical.update({template: critical(site, prefixes) for template, prefixes in CRITICAL_CSS.items()})
+    _manifest.clear()
+    _manifest.update(manifest)
+    logger.info("built %d static assets", len(manifest))
+    return manifest
+
+
+def asset_url(filename):
+    """
+    the fingerprinted name of a static file, or the name itself.
+    """
+    return _manifest.get(filename, filename)
+
+
+def critical_css(template):
+    css = _critical.get(template)
+    return Markup("<style>{}</style>".format(css)) if css else Markup("")
+
+
+def stylesheet(url):
+    """
+    a stylesheet that loads without blocking the first render.
+    """
+    url = escape(url)
+    return Markup(
+        '<link rel="preload" href="{0}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+        '<noscript><link rel="stylesheet" href="{0}"></noscript>'.format(url)
+    )
+
+
+def init_app(app):
+    build(app)
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            values["filename"] = asset_url(values["filename"])
+
+    app.jinja_env.globals.update(critical_css=critical_css, stylesheet=stylesheet)
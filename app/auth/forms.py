@@ -8,10 +8,12 @@ from wtforms import (
     SubmitField,
     FileField,
     TextAreaField,
-    DateField
+    DateField,
+    SelectField,
 )
 from wtforms.validators import DataRequired, Length, Email, Regexp, EqualTo
 from wtforms import ValidationError, validators
+from app.models import PostType
 
 #Ensure the fields name are same as in the fields in the Models for Post.
 class PosterCreateForm(FlaskForm):
@@ -79,6 +81,21 @@ class TriviaEditForm(FlaskForm):
         logging.info(f"date: {self.date.data}")
         return
 
+class BulkForm(FlaskForm):
+    # The selected ids come from the checkboxes of the listing, not a field.
+    action = SelectField(
+        "Action",
+        choices=[("delete", "Delete"), ("retag", "Replace tags"), ("change_type", "Change type")],
+    )
+    tags = StringField("Tags", [validators.Optional(), validators.Length(max=64)])
+    post_type = SelectField(
+        "Type",
+        coerce=int,
+        choices=[(PostType.POSTER, "Poster"), (PostType.BLOG, "Blog"),
+                 (PostType.ZINES, "Zine"), (PostType.TRIVIA, "Trivia")],
+    )
+    submit = SubmitField("Apply")
+
 class LoginForm(FlaskForm):
     email = StringField(
         "Email",
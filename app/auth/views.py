@@ -3,7 +3,6 @@ All custom login and logout apis are defined here.
 """
 import os
 import sys
-import traceback
 import logging
 from flask import (
     redirect,
@@ -14,15 +13,19 @@ from flask import (
     flash,
     jsonify,
     abort,
+    send_from_directory,
 )
 from flask_login import current_user, login_required, login_user, logout_user
+from sqlalchemy.orm import undefer, undefer_group
 from app import db, app
 from app.auth import auth
 from app.models import User, Permission, Role, Post, PostType, Trivia
 from werkzeug.utils import secure_filename
-from app.auth.forms import LoginForm, PosterCreateForm, PosterEditForm, TriviaCreateForm, TriviaEditForm
+from app.auth.forms import LoginForm, PosterCreateForm, PosterEditForm, TriviaCreateForm, TriviaEditForm, BulkForm
 from app.auth.decorators import permission_required
 from app.auth.utils import allowed_file
+from app import slowquery, profiling, related, storage, bulk
+from app.cache import bump_content_version
 
 
 @auth.route("/login", methods=["POST", "GET"])
@@ -60,44 +63,47 @@ def poster_delete(post):
     logging.info('file path is {:s}'.format(post.doc))
 
     try:
-        os.remove(post.doc)
-    except:
-        return AttributeError
+        storage.remove(post.doc)
+    except OSError:
+        # The row goes anyway; `flask reconcile-uploads` reclaims the file.
+        logging.exception('file deletion {:s} failed'.format(post.doc))
+        return
 
     logging.info('file deletion {:s} is success'.format(post.doc))
     return
 
 def poster_create(post, path, f):
-    filename = 'tactification_' + str(post.id) + f.filename
-    absolute_path = os.path.join(path, filename)
+    filename = storage.FILE_PREFIX + str(post.id) + f.filename
+    absolute_path = storage.save(f, filename, path)
     logging.info('poster_create path: {:s} filename: {:s}'.format(path, absolute_path))
 
-    f.save(absolute_path)
     uploaded_file_url = url_for("main.download_file", id=post.id, filename=filename)
     post.doc = absolute_path 
     post.url = uploaded_file_url
+    post.checksum = storage.checksum(absolute_path)
     post.show()
     return True
 
 def poster_update(post, path, f):
-    filename = 'tactification_' + str(post.id) + f.filename
+    filename = storage.FILE_PREFIX + str(post.id) + f.filename
 
     try:
         # Check if file already exists.
         if (os.path.exists(post.doc) and os.path.isfile(post.doc) is False):
             raise NameError
-        #remove the current file
-        os.remove(post.doc)
-        #add new file.
-        absolute_path = os.path.join(path, filename)
+        #add new file first, so a failed save keeps the current one.
+        absolute_path = storage.save(f, filename, path)
         logging.info('poster_update path: {:s} filename: {:s}'.format(path, absolute_path))
-        f.save(absolute_path)
+        #remove the current file
+        if post.doc != absolute_path:
+            storage.remove(post.doc)
     except:
         return False
 
     uploaded_file_url = url_for("main.download_file", id=post.id, filename=filename)
     post.doc = absolute_path 
     post.url = uploaded_file_url
+    post.checksum = storage.checksum(absolute_path)
     post.show()
     return True
 
@@ -127,13 +133,15 @@ def writeposters():
             db.session.commit()
 
             path = "{:s}".format(app.config["UPLOAD_FOLDER"])
-            print("directory:{:s} id={:s}", path, post.id)
+            logging.info("directory: {:s} id={:d}".format(path, post.id))
             if poster_create(post, path, f) is False:
                 flash("Failed creating file in upload folder")
                 return redirect(url_for("auth.writeposters"))
 
             db.session.add(post)
             db.session.commit()
+            related.refresh("posters", post.id)
+            bump_content_version()
 
             flash("Created post")
             return redirect(request.args.get("next") or url_for("main.index"))
@@ -150,11 +158,11 @@ def writeposters():
 def editposters(id):
     #Find the post and get the post form. Return for any errors.
     try:
-        post = Post.query.get_or_404(id)
+        post = Post.query.options(undefer_group("text")).get_or_404(id)
         posterform = PosterEditForm(obj=post)
         posterform.show()
     except:
-        print(traceback.format_exc())
+        logging.exception("editposters lookup failed")
         post_err_string = 'ID: {id} not found to edit'
         logging.info(post_err_string.format(id=id))
         return redirect(url_for("auth.writeposters"))
@@ -194,6 +202,8 @@ def editposters(id):
 
         db.session.add(post)
         db.session.commit()
+        related.refresh("posters", post.id)
+        bump_content_version()
         flash("Edited post")
         return redirect(
             request.args.get("next")
@@ -218,6 +228,8 @@ def deleteposters(id):
     poster_delete(post)
     db.session.delete(post)
     db.session.commit()
+    related.refresh("posters", id)
+    bump_content_version()
 
     logging.info('file deletion {:s} from db is success'.format(post.doc))
     return redirect(request.args.get("next") or url_for("main.index"))
@@ -241,12 +253,13 @@ def writetrivias():
                             tags=tags, date=date, #url=url,
                             post_type=PostType.TRIVIA)
         except Exception as e:
-            logging.error(f"Error occurred while creating trivia: {e}")
-            traceback.print_exc()
+            logging.exception(f"Error occurred while creating trivia: {e}")
             return render_template("error.html", msg="Trivia creation failed")
 
         db.session.add(trivia)
         db.session.commit()
+        related.refresh("trivias", trivia.id)
+        bump_content_version()
 
         flash("Created trivia")
         return redirect(request.args.get("next") or url_for("main.index"))
@@ -258,10 +271,10 @@ def writetrivias():
 @permission_required(Permission.WRITE_ARTICLES)
 def edittrivias(id):
     try:
-        trivia = Trivia.query.get_or_404(id)
+        trivia = Trivia.query.options(undefer(Trivia.body)).get_or_404(id)
         triviaform = TriviaEditForm(obj=trivia)
     except:
-        print(traceback.format_exc())
+        logging.exception("edittrivias lookup failed")
         trivia_err_string = 'ID: {id} not found to edit'
         logging.info(trivia_err_string.format(id=id))
         return redirect(url_for("auth.writetrivias"))
@@ -285,6 +298,8 @@ def edittrivias(id):
         
         db.session.add(trivia)
         db.session.commit()
+        related.refresh("trivias", trivia.id)
+        bump_content_version()
         flash(f"Edited trivia with ID: {trivia.id}")
         return redirect(
             request.args.get("next")
@@ -307,5 +322,73 @@ def deletetrivias(id):
 
     db.session.delete(trivia)
     db.session.commit()
+    related.refresh("trivias", id)
+    bump_content_version()
 
     return redirect(request.args.get("next") or url_for("main.index"))
+
+@auth.route("/bulk", methods=["GET", "POST"])
+@login_required
+@permission_required(Permission.WRITE_ARTICLES)
+def bulk_edit():
+    kind = request.args.get("kind", "posters")
+    if kind not in ("posters", "trivias"):
+        abort(404)
+    form = BulkForm()
+
+    if form.validate_on_submit():
+        ids = request.form.getlist("ids", type=int)
+        try:
+            changed = bulk.apply(kind, form.action.data, ids,
+                                 tags=form.tags.data, post_type=form.post_type.data)
+        except bulk.BulkError as e:
+            flash(str(e))
+        else:
+            flash("{:s}: {:d} {:s} changed".format(form.action.data, changed, kind))
+        return redirect(url_for("auth.bulk_edit", kind=kind, page=request.args.get("page", 1, type=int)))
+
+    model, order = (Post, Post.timestamp) if kind == "posters" else (Trivia, Trivia.date)
+    pagination = (
+        db.session.query(model.id, model.header, model.tags, model.post_type, order.label("date"))
+        .order_by(order.desc(), model.id.desc())
+        .paginate(page=request.args.get("page", 1, type=int),
+                  per_page=app.config["BULK_PAGE_SIZE"], error_out=False)
+    )
+    return render_template("bulk.html", form=form, kind=kind, pagination=pagination,
+                           type_names=bulk.TYPE_NAMES)
+
+@auth.route("/slowqueries", methods=["GET"])
+@login_required
+@permission_required(Permission.ADMINISTER)
+def slowqueries():
+    statements = slowquery.aggregate()
+    return render_template("slowqueries.html", statements=statements,
+                           threshold=app.config["SLOW_QUERY_THRESHOLD_MS"])
+
+@auth.route("/profiling", methods=["GET", "POST"])
+@login_required
+@permission_required(Permission.ADMINISTER)
+def profiler():
+    if request.method == "POST":
+        try:
+            rate = profiling.set_sample_rate(app, request.form.get("rate", 0))
+        except ValueError:
+            flash("Sample rate must be a number between 0 and 1")
+            return _profiler_page(400)
+        flash("Profiling sample rate set to {:g}".format(rate))
+        return redirect(url_for("auth.profiler"))
+
+    return _profiler_page()
+
+def _profiler_page(status=200):
+    return render_template("profiling.html",
+                           rate=profiling.sample_rate(app),
+                           token=profiling.request_token(app),
+                           header=profiling.PROFILE_HEADER,
+                           profiles=profiling.profiles(app)), status
+
+@auth.route("/profiling/<path:filename>", methods=["GET"])
+@login_required
+@permission_required(Permission.ADMINISTER)
+def download_profile(filename):
+    return send_from_directory(app.config["PROFILE_DIR"], filename, as_attachment=True)
@@ -0,0 +1,140 @@
+"""
+Batch delete, retag and change of type for posters and trivias.
+
+A batch is a handful of set-based statements and one commit, whatever
+its size, followed by a single content version bump. Poster files are
+removed only after the commit, in a shared thread pool, so a rollback
+never leaves rows pointing at deleted files; a removal that fails is
+logged and left to `flask reconcile-uploads`.
+
+Deleted items, and items a change of type takes in or out of a related
+corpus, are updated in the related lists after the commit, in one pass
+per batch. Retagged items are rescored by the next `flask rebuild-related`.
+"""
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from sqlalchemy import delete, select, update
+from app import app, db, related, storage
+from app.cache import bump_content_version
+from app.models import Post, PostType, PostView, RelatedItem, Trivia
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ("delete", "retag", "change_type")
+
+TYPE_NAMES = {
+    PostType.POSTER: "poster",
+    PostType.BLOG: "blog",
+    PostType.ZINES: "zine",
+    PostType.TRIVIA: "trivia",
+}
+
+_KINDS = {
+    "posters": {"model": Post, "post_type": PostType.POSTER,
+                "types": (PostType.POSTER, PostType.BLOG, PostType.ZINES)},
+    "trivias": {"model": Trivia, "post_type": PostType.TRIVIA,
+                "types": (PostType.TRIVIA,)},
+}
+
+_pool = {"pid": None, "executor": None, "pending": set()}
+_pool_lock = threading.Lock()
+
+
+class BulkError(ValueError):
+    """
+    a batch that cannot be applied as asked; nothing was written.
+    """
+
+
+def _executor():
+    # One pool per process; a forked worker must not reuse the parent's threads.
+    with _pool_lock:
+        if _pool["pid"] != os.getpid():
+            _pool["executor"] = ThreadPoolExecutor(
+                max_workers=app.config["BULK_REMOVE_WORKERS"], thread_name_prefix="bulk-remove"
+            )
+            _pool["pid"], _pool["pending"] = os.getpid(), set()
+        return _pool["executor"]
+
+
+def _remove(path):
+    try:
+        storage.remove(path)
+    except OSError:
+        logger.exception("file deletion %s failed", path)
+
+
+def remove_files(paths):
+    """
+    queue paths for removal; returns without waiting.
+    """
+    executor = _executor()
+    for path in paths:
+        future = executor.submit(_remove, path)
+        _pool["pending"].add(future)
+        future.add_done_callback(_pool["pending"].discard)
+
+
+def drain():
+    """
+    wait for every queued file removal.
+    """
+    wait(list(_pool["pending"]))
+
+
+def validate(kind, action, ids, tags=None, post_type=None):
+    if kind not in _KINDS:
+        raise BulkError("unknown kind {!r}".format(kind))
+    if action not in ACTIONS:
+        raise BulkError("unknown action {!r}".format(action))
+    if not ids:
+        raise BulkError("no items selected")
+    if len(ids) > app.config["BULK_MAX_ITEMS"]:
+        raise BulkError("at most {:d} items per batch".format(app.config["BULK_MAX_ITEMS"]))
+    if action == "retag" and not (tags and tags.strip() and len(tags) <= 64):
+        raise BulkError("tags must be 1 to 64 characters")
+    if action == "change_type" and post_type not in _KINDS[kind]["types"]:
+        raise BulkError("{} cannot become type {!r}".format(kind, post_type))
+
+
+def apply(kind, action, ids, tags=None, post_type=None):
+    """
+    run one batch in one transaction. returns the number of rows changed;
+    raises BulkError before writing anything if the batch is invalid.
+    """
+    try:
+        ids = sorted({int(i) for i in ids})
+    except (TypeError, ValueError):
+        raise BulkError("ids must be integers")
+    validate(kind, action, ids, tags, post_type)
+    model = _KINDS[kind]["model"]
+    selected = model.id.in_(ids)
+
+    files = []
+    try:
+        if action == "delete":
+            if model is Post:
+                files = [doc for doc in db.session.scalars(select(Post.doc).where(selected)) if doc]
+                db.session.execute(delete(PostView).where(PostView.post_id.in_(ids)))
+            db.session.execute(
+                delete(RelatedItem).where(RelatedItem.kind == _KINDS[kind]["post_type"],
+                                          RelatedItem.item_id.in_(ids))
+            )
+            changed = db.session.execute(delete(model).where(selected)).rowcount
+        elif action == "retag":
+            changed = db.session.execute(update(model).where(selected).values(tags=tags.strip())).rowcount
+        else:
+            changed = db.session.execute(update(model).where(selected).values(post_type=post_type)).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if action != "retag":
+        related.refresh_many(kind, ids)
+    bump_content_version()
+    remove_files(files)
+    logger.info("bulk %s of %d %s: %d changed, %d files queued", action, len(ids), kind, changed, len(files))
+    return changed
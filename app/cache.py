@@ -0,0 +1,271 @@
+"""
+Response cache and the content version, shared by all uWSGI workers.
+
+Writes to posters or trivias bump the content version. Cached renderings
+are keyed on it, so an edit makes the old entries unreachable instead of
+deleting them one by one, and ETags derived from it let a client that is
+up to date get a 304 without any database work.
+
+Both live outside the worker processes, so one rendering serves every
+worker and a bump is seen by all of them on their next lookup:
+
+    uwsgi   uWSGI's cache2 framework (the cache2 lines in app.ini), in
+            shared memory. Used whenever the app runs under uWSGI with
+            those caches configured.
+    sqlite  a local SQLite file in WAL mode (CACHE_PATH), for the flask
+            dev server, cli commands and tests.
+    local   the old per-process dict; nothing is shared.
+
+CACHE_BACKEND picks one; "auto" prefers uwsgi, then sqlite.
+"""
+import os
+import math
+import time
+import pickle
+import sqlite3
+import threading
+from app import app
+
+CONTENT_VERSION = "content_version"
+
+
+class SimpleCache:
+    """
+    bounded in-process key/value cache with optional per-entry ttl.
+    """
+
+    def __init__(self, max_items=1024):
+        self.max_items = max_items
+        self._items = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires < time.monotonic():
+            self._items.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (value, expires)
+            # Dicts keep insertion order: drop the oldest entries first.
+            while len(self._items) > self.max_items:
+                self._items.pop(next(iter(self._items)))
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def counter(self, name, seed):
+        return self._counters.setdefault(name, seed)
+
+    def incr(self, name, seed):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, seed) + 1
+            return self._counters[name]
+
+
+class SqliteCache:
+    """
+    key/value store in a local sqlite file, one connection per process and
+    thread. Oldest entries are evicted past max_items, like SimpleCache.
+    """
+
+    _PRUNE_EVERY = 64
+
+    def __init__(self, path, max_items=4096):
+        self.path = path
+        self.max_items = max_items
+        self._local = threading.local()
+        self._sets = 0
+
+    def _db(self):
+        local = self._local
+        # sqlite connections must not cross a fork.
+        if getattr(local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters "
+                "(name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    def get(self, key):
+        row = self._db().execute(
+            "SELECT value, expires FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        conn = self._db()
+        # REPLACE gives the row a new rowid, so rowid order is insertion order.
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires),
+        )
+        self._sets += 1
+        if self._sets % self._PRUNE_EVERY == 0:
+            self._prune(conn)
+
+    def _prune(self, conn):
+        conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM cache WHERE rowid <= "
+            "(SELECT rowid FROM cache ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+            (self.max_items,),
+        )
+
+    def clear(self):
+        self._db().execute("DELETE FROM cache")
+
+    def counter(self, name, seed):
+        conn = self._db()
+        row = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            return row[0]
+        conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES (?, ?)", (name, seed))
+        return conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+    def incr(self, name, seed):
+        conn = self._db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES (?, ?)", (name, seed))
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+            value = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return value
+
+
+class UwsgiCache:
+    """
+    uWSGI cache2 in shared memory. Counters use uWSGI's atomic 64 bit
+    math on a second, small cache.
+    """
+
+    def __init__(self, name, counters):
+        import uwsgi
+
+        self._uwsgi = uwsgi
+        self.name = name
+        self.counters = counters
+
+    def get(self, key):
+        data = self._uwsgi.cache_get(key, self.name)
+        return None if data is None else pickle.loads(data)
+
+    def set(self, key, value, ttl=None):
+        # A value too big for the cache is simply not stored.
+        self._uwsgi.cache_update(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                                 int(math.ceil(ttl or 0)), self.name)
+
+    def clear(self):
+        self._uwsgi.cache_clear(self.name)
+
+    def counter(self, name, seed):
+        if not self._uwsgi.cache_exists(name, self.counters):
+            # Two workers seeding at once only makes the number larger.
+            self._uwsgi.cache_inc(name, seed, 0, self.counters)
+        return self._uwsgi.cache_num(name, self.counters)
+
+    def incr(self, name, seed):
+        self.counter(name, seed)
+        self._uwsgi.cache_inc(name, 1, 0, self.counters)
+        return self._uwsgi.cache_num(name, self.counters)
+
+
+def _uwsgi_available(name):
+    try:
+        import uwsgi
+    except ImportError:
+        return False
+    configured = uwsgi.opt.get("cache2") or []
+    if not isinstance(configured, list):
+        configured = [configured]
+    return any(
+        "name={}".format(name) in (entry.decode() if isinstance(entry, bytes) else entry)
+        for entry in configured
+    )
+
+
+def make_backend(config):
+    backend = config["CACHE_BACKEND"]
+    if backend == "auto":
+        backend = "uwsgi" if _uwsgi_available(config["CACHE_UWSGI_NAME"]) else "sqlite"
+    if backend == "uwsgi":
+        return UwsgiCache(config["CACHE_UWSGI_NAME"], config["CACHE_UWSGI_COUNTERS"])
+    if backend == "sqlite":
+        return SqliteCache(config["CACHE_PATH"], config["CACHE_MAX_ITEMS"])
+    if backend == "local":
+        return SimpleCache(config["CACHE_MAX_ITEMS"])
+    raise ValueError("unknown CACHE_BACKEND {!r}".format(backend))
+
+
+class SharedCache:
+    """
+    the configured backend, created on first use so the app config
+    (and the uwsgi module, present only inside workers) is settled.
+    """
+
+    def __init__(self):
+        self._backends = {}
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        config = app.config
+        key = (config["CACHE_BACKEND"], config["CACHE_PATH"], config["CACHE_UWSGI_NAME"])
+        backend = self._backends.get(key)
+        if backend is None:
+            with self._lock:
+                backend = self._backends.get(key)
+                if backend is None:
+                    backend = self._backends[key] = make_backend(config)
+        return backend
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl)
+
+    def clear(self):
+        self.backend.clear()
+
+
+cache = SharedCache()
+
+
+def content_version():
+    # Seeded from the clock so a restart (or a wiped store) never reuses a
+    # version, and an ETag, that was handed out for different content.
+    return cache.backend.counter(CONTENT_VERSION, int(time.time()))
+
+
+def bump_content_version():
+    """
+    call after committing any change to posters or trivias, and after
+    every write derived from it (the related lists) has committed too, so
+    no reader caches the new version with stale derived data.
+    """
+    return cache.backend.incr(CONTENT_VERSION, int(time.time()))
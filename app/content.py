@@ -0,0 +1,233 @@
+"""
+Markdown bodies, rendered once when they are written.
+
+Post.body and Trivia.body hold what the author typed, in Markdown. Setting
+body, from a form, the api or a script, renders it, sanitises the html
+with nh3 and stores three derived columns next to it:
+
+    body_html     the sanitised html the detail pages print as is,
+    excerpt       plain text, at most EXCERPT_LENGTH characters, for
+                  cards, feeds and meta descriptions,
+    reading_time  minutes at WORDS_PER_MINUTE, at least 1.
+
+Read paths do no parsing, stripping or escaping of bodies.
+
+Bodies written before Markdown are html, and the row says so: body_format
+is BodyFormat.HTML for them and MARKDOWN for everything written since, so
+a new body that happens to open with inline html is still Markdown. Html
+bodies are only sanitised, so old posts keep their layout when they are
+edited or backfilled: the allowlist below keeps their classes, simple
+inline styles, YouTube iframes and tweet blockquotes.
+
+Rows from before the column have no body_format. `flask render-bodies`
+classifies them once, by the old rule (html when the body starts with
+"<"), and fills the derived columns of rows that have none, rendering in
+a process pool. Bulk inserts that skip the ORM attributes add
+body_format and fields(body) to their rows.
+"""
+import os
+import math
+import time
+import html
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import click
+import markdown
+import nh3
+from sqlalchemy import event, inspect, or_, select, update
+from sqlalchemy.orm.attributes import flag_modified
+from app import db
+from app.cache import bump_content_version
+from app.models import BodyFormat, Post, Trivia
+
+logger = logging.getLogger(__name__)
+
+EXCERPT_LENGTH = 300
+WORDS_PER_MINUTE = 200
+
+EXTENSIONS = ("extra", "sane_lists")
+
+# nh3's defaults plus what the hand-written html of older posts relies on:
+# bootstrap classes, a few inline styles, YouTube embeds and tweet
+# blockquotes (the page loads widgets.js for those; scripts never pass).
+TAGS = nh3.ALLOWED_TAGS | {"iframe"}
+ATTRIBUTES = dict(
+    nh3.ALLOWED_ATTRIBUTES,
+    **{
+        "*": {"class", "style", "title", "lang", "dir"},
+        "iframe": {"src", "width", "height", "title", "allow", "allowfullscreen", "frameborder",
+                   "loading", "referrerpolicy"},
+    }
+)
+STYLE_PROPERTIES = {
+    "color", "background-color", "text-align", "font-size", "font-style", "font-weight",
+    "text-decoration", "width", "max-width", "height", "float", "margin", "margin-top",
+    "margin-bottom", "margin-left", "margin-right", "padding", "border", "border-radius",
+}
+IFRAME_SOURCES = ("https://www.youtube.com/embed/", "https://www.youtube-nocookie.com/embed/")
+
+_local = threading.local()
+
+
+def _markdown():
+    # A Markdown instance keeps state between conversions: one per thread.
+    if not hasattr(_local, "markdown"):
+        _local.markdown = markdown.Markdown(extensions=EXTENSIONS, output_format="html")
+    return _local.markdown
+
+
+def _attribute(element, attribute, value):
+    if element == "iframe" and attribute == "src" and not value.startswith(IFRAME_SOURCES):
+        return None
+    return value
+
+
+def sanitise(body_html):
+    return nh3.clean(body_html, tags=TAGS, attributes=ATTRIBUTES, attribute_filter=_attribute,
+                     filter_style_properties=STYLE_PROPERTIES)
+
+
+def render(body, body_format=BodyFormat.MARKDOWN):
+    """
+    sanitised html of a Markdown (or legacy html) body.
+    """
+    body = body or ""
+    if body_format != BodyFormat.HTML:
+        body = _markdown().reset().convert(body)
+    return sanitise(body)
+
+
+def legacy_format(body):
+    """
+    the format of a row older than body_format: html bodies predate
+    Markdown, and all of them start with a tag.
+    """
+    return BodyFormat.HTML if (body or "").lstrip().startswith("<") else BodyFormat.MARKDOWN
+
+
+def plain_text(body_html):
+    text = html.unescape(nh3.clean(body_html, tags=set()))
+    return " ".join(text.split())
+
+
+def excerpt(text, length=EXCERPT_LENGTH):
+    """
+    text cut at a word boundary to at most length characters.
+    """
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:.") + "…"
+
+
+def reading_time(text):
+    return max(1, math.ceil(len(text.split()) / WORDS_PER_MINUTE))
+
+
+def fields(body, body_format=BodyFormat.MARKDOWN):
+    """
+    the derived columns of a body, as a dict.
+    """
+    body_html = render(body, body_format)
+    text = plain_text(body_html)
+    return {"body_html": body_html, "excerpt": excerpt(text), "reading_time": reading_time(text)}
+
+
+def _store(target, derived):
+    for name, value in derived.items():
+        setattr(target, name, value)
+
+
+def _body_set(target, value, oldvalue, initiator):
+    body_format = target.body_format
+    if body_format is None:
+        # new rows are Markdown; an unclassified old row is classified now.
+        state = inspect(target)
+        body_format = BodyFormat.MARKDOWN if state.transient or state.pending else legacy_format(value)
+        # set without the event below, which would render a second time.
+        target.__dict__["body_format"] = body_format
+        flag_modified(target, "body_format")
+    _store(target, fields(value, body_format))
+
+
+def _body_format_set(target, value, oldvalue, initiator):
+    if value == oldvalue:
+        return
+    # loads the deferred body of a stored row; unset on a new one.
+    body = target.body
+    if body is not None:
+        _store(target, fields(body, value))
+
+
+for _model in (Post, Trivia):
+    event.listen(_model.body, "set", _body_set)
+    event.listen(_model.body_format, "set", _body_format_set)
+
+
+def _classified(body, body_format):
+    """
+    the derived columns of a backfilled row, and its format.
+    """
+    body_format = body_format or legacy_format(body)
+    return dict(fields(body, body_format), body_format=body_format)
+
+
+def _rendered(rows, pool):
+    bodies = [row.body for row in rows]
+    formats = [row.body_format for row in rows]
+    if pool is None:
+        return list(map(_classified, bodies, formats))
+    return list(pool.map(_classified, bodies, formats, chunksize=16))
+
+
+def backfill(batch=200, workers=1, everything=False):
+    """
+    render bodies whose derived columns or format are empty, or every
+    body with everything=True (after a change to the rendering rules).
+    workers > 1 renders in that many processes. returns the number of
+    rows updated.
+    """
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    updated = 0
+    try:
+        for model in (Post, Trivia):
+            last_id = 0
+            while True:
+                query = select(model.id, model.body, model.body_format).where(
+                    model.id > last_id, model.body.isnot(None)
+                )
+                if not everything:
+                    query = query.where(or_(model.body_html.is_(None), model.body_format.is_(None)))
+                rows = db.session.execute(query.order_by(model.id).limit(batch)).all()
+                if not rows:
+                    break
+                rendered = _rendered(rows, pool)
+                db.session.execute(
+                    update(model), [dict(values, id=row.id) for row, values in zip(rows, rendered)]
+                )
+                db.session.commit()
+                last_id = rows[-1].id
+                updated += len(rows)
+                logger.info("rendered %d bodies", updated)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if updated:
+        bump_content_version()
+    return updated
+
+
+@click.command("render-bodies")
+@click.option("--batch", default=200, show_default=True, help="Rows updated per transaction.")
+@click.option("--workers", type=int, help="Rendering processes, one per cpu by default.")
+@click.option("--all", "everything", is_flag=True, help="Render every body, not only missing ones.")
+def render_bodies_command(batch, workers, everything):
+    """
+    Fill body_format, body_html, excerpt and reading_time from the bodies.
+    """
+    start = time.perf_counter()
+    updated = backfill(batch, workers or os.cpu_count() or 1, everything)
+    click.echo("rendered {:d} bodies in {:.1f} s".format(updated, time.perf_counter() - start))
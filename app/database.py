@@ -0,0 +1,70 @@
+"""
+Database connections across forks.
+
+uWSGI imports the app in the master and forks the workers from it. A
+pooled connection opened before the fork would be shared by every
+worker, which corrupts the PostgreSQL protocol stream and makes sqlite
+locks unreliable. Each child drops the pool it inherited, without
+closing the parent's sockets, and opens its own on first use.
+
+A sqlite database file gets its directory created, since sqlite will
+not create one. Connections of the app's sqlite engine get WAL mode and
+a power() function; other engines in the process are left alone.
+"""
+import os
+import math
+import logging
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from app import db
+
+logger = logging.getLogger(__name__)
+
+try:
+    from uwsgidecorators import postfork
+except ImportError:
+    postfork = None
+
+
+def dispose_engines(app):
+    """
+    replace every engine's pool, leaving the inherited connections to the
+    process that opened them.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def ensure_sqlite_dir(url):
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+
+
+def _sqlite_on_connect(dbapi_connection, connection_record):
+    # SQLite is not always built with math functions; the view counter
+    # upsert (app/viewcounts.py) needs pow().
+    dbapi_connection.create_function("power", 2, math.pow)
+    # In WAL mode readers are not blocked while a writer commits.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+def init_app(app):
+    ensure_sqlite_dir(app.config["SQLALCHEMY_DATABASE_URI"])
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _sqlite_on_connect)
+
+    def after_fork():
+        dispose_engines(app)
+        logger.debug("dropped inherited database pools in %d", os.getpid())
+
+    # uWSGI forks from C and may not run python's at-fork handlers;
+    # disposing twice is harmless.
+    if postfork is not None:
+        postfork(after_fork)
+    os.register_at_fork(after_in_child=after_fork)
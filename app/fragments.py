@@ -0,0 +1,61 @@
+"""
+{% cache key, ttl %} ... {% endcache %} for template fragments.
+
+The rendered fragment is stored under key and the content version, so
+any write to posters or trivias makes every cached fragment unreachable
+and the next render fills it again. ttl is in seconds; none keeps the
+fragment until the version moves on or the store evicts it.
+
+The store is app.jinja_env.fragment_cache, the shared response cache by
+default; anything with get(key) and set(key, value, ttl) will do. Hits
+and misses are counted per fragment name, the part of the key before
+the first ":", e.g. "index-cards" for "index-cards:2".
+
+Only cache what is the same for every visitor: nothing with the current
+user, flashed messages or a csrf token inside.
+"""
+from flask import g, has_request_context
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from app.cache import cache, content_version
+from app.metrics import record_cache
+
+
+def _version():
+    # One lookup per request, however many fragments the page has.
+    if not has_request_context():
+        return content_version()
+    if "fragment_version" not in g:
+        g.fragment_version = content_version()
+    return g.fragment_version
+
+
+class FragmentCacheExtension(Extension):
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=cache)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = parser.parse_expression()
+        ttl = parser.parse_expression() if parser.stream.skip_if("comma") else nodes.Const(None)
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_render", [key, ttl]), [], [], body).set_lineno(lineno)
+
+    def _render(self, key, ttl, caller):
+        store = self.environment.fragment_cache
+        key = str(key)
+        cache_key = "fragment:{}:{}".format(key, _version())
+        fragment = store.get(cache_key)
+        record_cache("fragment:" + key.split(":", 1)[0], fragment is not None)
+        if fragment is None:
+            fragment = str(caller())
+            store.set(cache_key, fragment, ttl)
+        return Markup(fragment)
+
+
+def init_app(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
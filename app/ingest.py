@@ -0,0 +1,130 @@
+"""
+Bulk trivia ingestion shared by the api endpoint and the cli command.
+
+Every item goes through TriviaCreateForm, so bulk items obey exactly the
+rules of auth.writetrivias. Valid items are written with one executemany
+insert and a single commit. Invalid items are reported by index and do
+not block the rest.
+"""
+import json
+import click
+from werkzeug.datastructures import MultiDict
+from sqlalchemy import insert
+from app import app, db
+from app.models import Trivia, PostType, BodyFormat, month_day
+from app.auth.forms import TriviaCreateForm
+from app.cache import bump_content_version
+from app.content import fields
+
+_FORM_FIELDS = ("header", "body", "tags", "date", "url")
+
+
+def _json_lines(text):
+    items, offset = [], 0
+    for line in text.splitlines(True):
+        if line.strip():
+            try:
+                items.append(json.loads(line.rstrip("\r\n")))
+            except json.JSONDecodeError as error:
+                # Positioned in the whole text, so lineno is the file's line.
+                raise json.JSONDecodeError(error.msg, text, offset + error.pos) from None
+        offset += len(line)
+    return items
+
+
+def parse_items(text):
+    """
+    a json array, {"items": [...]}, or one json object per line (jsonl).
+    json.JSONDecodeError, a ValueError, for anything else.
+    """
+    start = text.strip()[:1]
+    if not start:
+        return []
+    if start in "[{":
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            if start == "[":
+                raise
+            data = None
+        if isinstance(data, list):
+            return data
+        if isinstance(data, dict) and isinstance(data.get("items"), list):
+            return data["items"]
+        if isinstance(data, dict):
+            return [data]
+    return _json_lines(text)
+
+
+def validate_trivias(items):
+    """
+    rows ready for insert and a list of {"index", "errors"} for rejects.
+    needs a request context, like any FlaskForm.
+    """
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "errors": {"item": ["must be an object"]}})
+            continue
+
+        formdata = MultiDict(
+            (field, str(item[field])) for field in _FORM_FIELDS if item.get(field) is not None
+        )
+        form = TriviaCreateForm(formdata=formdata, meta={"csrf": False})
+        if not form.validate():
+            errors.append({"index": index, "errors": form.errors})
+            continue
+
+        # Same columns as auth.writetrivias stores; url is validated but not saved there either.
+        rows.append({
+            "header": form.header.data,
+            "body": form.body.data,
+            "tags": form.tags.data,
+            "date": form.date.data,
+            "month_day": month_day(form.date.data),
+            "post_type": PostType.TRIVIA,
+            "body_format": BodyFormat.MARKDOWN,
+            **fields(form.body.data),
+        })
+    return rows, errors
+
+
+def insert_trivias(rows):
+    """
+    one executemany insert, one transaction.
+    """
+    if not rows:
+        return 0
+    db.session.execute(insert(Trivia), rows)
+    db.session.commit()
+    bump_content_version()
+    return len(rows)
+
+
+def ingest(items):
+    rows, errors = validate_trivias(items)
+    inserted = insert_trivias(rows)
+    return {"received": len(items), "inserted": inserted, "errors": errors}
+
+
+@click.command("ingest-trivias")
+@click.argument("path", type=click.File("r", encoding="utf-8"))
+def ingest_trivias_command(path):
+    """
+    Bulk load trivias from a json or jsonl file.
+    """
+    try:
+        items = parse_items(path.read())
+    except json.JSONDecodeError as error:
+        raise click.BadParameter("line {:d} column {:d}: {}".format(error.lineno, error.colno, error.msg),
+                                 param_hint="PATH")
+    except ValueError as error:
+        # Not utf-8.
+        raise click.BadParameter(str(error), param_hint="PATH")
+    with app.test_request_context():
+        result = ingest(items)
+
+    click.echo("received {received:d} inserted {inserted:d} rejected {rejected:d}".format(
+        rejected=len(result["errors"]), **result))
+    for error in result["errors"]:
+        click.echo("item {index:d}: {errors}".format(**error), err=True)
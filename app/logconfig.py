@@ -0,0 +1,196 @@
+"""
+Non-blocking structured logging.
+
+Views only put records on a bounded queue (QueueHandler); a QueueListener
+thread formats them as one JSON object per line and writes them to stderr,
+which uWSGI collects. Records carry the request id, endpoint and the time
+since the request started, and every request ends with one "app.requests"
+record holding its status and total duration. Hot INFO lines are sampled
+per logger through Config.LOG_SAMPLING, and records are dropped, never
+blocked on, when the queue is full.
+
+The listener thread starts with the app and again in every forked worker,
+from the uWSGI postfork hook or python's at-fork handler, before anything
+else runs there. The worker keeps the queue it inherited, so nothing it
+logs is lost, and skips the records its parent had queued before the fork.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request, has_request_context
+
+try:
+    from uwsgidecorators import postfork
+except ImportError:
+    postfork = None
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_logger = logging.getLogger("app.requests")
+
+_listener = {"pid": None, "listener": None}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    one json object per record.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "message": record.getMessage(),
+        }
+        for field in ("request_id", "endpoint", "duration_ms", "status"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    copy request id, endpoint and elapsed time onto the record. runs in the
+    request thread, before the record is handed to the listener thread.
+    """
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get("request_id")
+            record.endpoint = request.endpoint
+            start = g.get("request_start")
+            if start is not None:
+                record.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    keep only a fraction of INFO and DEBUG records for the configured loggers.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        rate = self.rates.get(record.name)
+        return rate is None or random.random() < rate
+
+
+class OwnRecordsFilter(logging.Filter):
+    """
+    only records made in this process: a forked worker's queue starts with
+    a copy of what its parent had not written yet.
+    """
+
+    def filter(self, record):
+        return record.process == os.getpid()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    queue handler that drops records instead of blocking when the queue is full.
+    """
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Format the message in the request thread but keep exc_info for the
+        # listener's formatter; the stdlib version flattens both into msg.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_handler = DroppingQueueHandler(queue.Queue())
+
+
+def _start_listener():
+    """
+    (re)start the listener thread in the current process. threads do not
+    survive a fork, so each worker starts its own right after it.
+    """
+    if _listener["pid"] == os.getpid():
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter())
+    stream.addFilter(OwnRecordsFilter())
+    listener = QueueListener(_handler.queue, stream, respect_handler_level=True)
+    listener.start()
+    _listener["pid"] = os.getpid()
+    _listener["listener"] = listener
+
+
+def _stop_listener():
+    if _listener["pid"] == os.getpid() and _listener["listener"] is not None:
+        _listener["listener"].stop()
+        _listener["pid"] = None
+
+
+def _before_request():
+    g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+
+
+def _after_request(response):
+    if "request_id" in g:
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+    # duration_ms of this record is the whole request (RequestContextFilter).
+    request_logger.info("%s %s %d", request.method, request.path, response.status_code,
+                        extra={"status": response.status_code})
+    return response
+
+
+def configure(level, sampling, queue_size):
+    """
+    route the root logger through the queue handler.
+    """
+    _stop_listener()
+    _handler.queue = queue.Queue(maxsize=queue_size)
+    _handler.filters = []
+    _handler.addFilter(SamplingFilter(sampling))
+    _handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level)
+
+    _listener["pid"] = None
+    _start_listener()
+
+
+atexit.register(_stop_listener)
+# uWSGI forks from C and may not run python's at-fork handlers; a second
+# start in the same process returns at once.
+if postfork is not None:
+    postfork(_start_listener)
+os.register_at_fork(after_in_child=_start_listener)
+
+
+def init_app(app):
+    configure(app.config["LOG_LEVEL"], app.config["LOG_SAMPLING"], app.config["LOG_QUEUE_SIZE"])
+    app.before_request(_before_request)
+    app.after_request(_after_request)
@@ -0,0 +1,119 @@
+"""
+Atom and RSS feeds for posters, trivias and tags.
+
+A feed is rendered once per content version from column-only queries and
+kept gzipped and plain in the response cache. Its ETag depends only on
+the feed and the content version, so a poll that finds nothing new gets
+a 304 before any cache lookup or query.
+"""
+import gzip
+import hashlib
+from datetime import datetime
+from flask import render_template, request, abort, current_app, make_response
+from sqlalchemy import func
+from app import db
+from app.cache import cache, content_version
+from app.metrics import record_cache
+from app.models import Post, PostType, Trivia
+from . import main
+
+_MIMETYPES = {
+    "atom": "application/atom+xml",
+    "rss": "application/rss+xml",
+}
+
+
+def _tagged(column, tag):
+    """
+    column's comma separated list holds tag, in any case, as a whole tag.
+    """
+    # "Derby, UCL " -> ",derby,ucl,", matched by "%,ucl,%" with % and _ escaped.
+    listed = func.lower(func.replace(func.replace(func.trim(column), ", ", ","), " ,", ","))
+    pattern = tag.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return ("," + listed + ",").like("%,{},%".format(pattern), escape="\\")
+
+
+def _poster_entries(tag=None):
+    query = db.session.query(
+        Post.id, Post.header, Post.description, Post.tags, Post.timestamp, Post.url
+    ).filter(Post.post_type == PostType.POSTER)
+    if tag:
+        query = query.filter(_tagged(Post.tags, tag))
+    rows = query.order_by(Post.timestamp.desc()).limit(current_app.config["FEED_SIZE"]).all()
+    return [
+        {"kind": "post", "id": r.id, "title": r.header, "summary": r.description,
+         "tags": r.tags, "updated": r.timestamp, "image": r.url}
+        for r in rows
+    ]
+
+
+def _trivia_entries(tag=None):
+    query = db.session.query(
+        Trivia.id, Trivia.header, Trivia.excerpt, Trivia.tags, Trivia.date
+    ).filter(Trivia.post_type == PostType.TRIVIA)
+    if tag:
+        query = query.filter(_tagged(Trivia.tags, tag))
+    rows = query.order_by(Trivia.date.desc()).limit(current_app.config["FEED_SIZE"]).all()
+    return [
+        {"kind": "trivia", "id": r.id, "title": r.header, "summary": r.excerpt,
+         "tags": r.tags, "updated": r.date, "image": None}
+        for r in rows
+    ]
+
+
+def _build(kind, fmt, tag):
+    if kind == "posters":
+        title, entries = "Tactification posters", _poster_entries()
+    elif kind == "trivias":
+        title, entries = "Tactification trivias", _trivia_entries()
+    else:
+        title = "Tactification: {}".format(tag)
+        entries = _poster_entries(tag) + _trivia_entries(tag)
+        # Undated trivias (Trivia.date is nullable) go last.
+        entries.sort(key=lambda e: (e["updated"] is not None, e["updated"] or datetime.min), reverse=True)
+        entries = entries[:current_app.config["FEED_SIZE"]]
+
+    updated = max((e["updated"] for e in entries if e["updated"]), default=None)
+    body = render_template("{}.xml".format(fmt), title=title, entries=entries,
+                           updated=updated, self_url=request.base_url)
+    body = body.encode("utf-8")
+    return body, gzip.compress(body, 9)
+
+
+def _feed(kind, fmt, tag=None):
+    if fmt not in _MIMETYPES:
+        abort(404)
+
+    key = "feed:{}:{}:{}:{}".format(kind, fmt, tag or "", content_version())
+    etag = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    if etag in request.if_none_match:
+        response = make_response("", 304)
+        response.set_etag(etag)
+        return response
+
+    cached = cache.get(key)
+    record_cache("feeds", cached is not None)
+    if cached is None:
+        cached = _build(kind, fmt, tag)
+        cache.set(key, cached)
+    body, compressed = cached
+
+    response = make_response(body)
+    if "gzip" in request.accept_encodings:
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.mimetype = _MIMETYPES[fmt]
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, max-age={:d}".format(current_app.config["FEED_MAX_AGE"])
+    return response
+
+
+@main.route("/feeds/<any(posters, trivias):kind>.<fmt>", methods=["GET"])
+def feed(kind, fmt):
+    return _feed(kind, fmt)
+
+
+@main.route("/feeds/tags/<tag>.<fmt>", methods=["GET"])
+def tag_feed(tag, fmt):
+    return _feed("tag", fmt, tag.strip().lower())
@@ -8,13 +8,19 @@ import logging
 from queue import Queue
 from urllib.parse import urlparse
 from timeit import default_timer as timer
+from datetime import datetime
 from concurrent import futures
-from flask import render_template, url_for, send_from_directory, request, make_response, session, redirect, jsonify, Markup
+from flask import render_template, url_for, send_from_directory, request, make_response, session, redirect, jsonify
 from flask import send_from_directory
+from sqlalchemy import func
+from sqlalchemy.orm import load_only, undefer
 from app import app, db
 from app.models import Post, PostType, Trivia
+from app import viewcounts, related, storage, hints, onthisday, querycache
 from . import main
 
+logger = logging.getLogger(__name__)
+
 mail_req_q = Queue()
 mailbox_mails = list()
 
@@ -22,22 +28,32 @@ mailbox_mails = list()
 def index():
     app.logger.info('Hello tactification.com')
     page = request.args.get('page', 1, type=int)
-    pagination = Post.query.order_by(Post.timestamp.desc()) \
-        .filter_by(post_type=PostType.POSTER) \
-        .paginate(page=page, per_page=10, error_out=False)
+    # Counted with count(id): Query.count() would wrap a select of every
+    # column, deferred ones too.
+    pagination = querycache.paginate(
+        "posters", "index",
+        Post.query.order_by(Post.timestamp.desc()).filter_by(post_type=PostType.POSTER),
+        db.session.query(func.count(Post.id)).filter_by(post_type=PostType.POSTER),
+        page=page, per_page=10,
+    )
     posts = pagination.items
 
     if not posts:
         return render_template("error.html", "Posters not present")
-
-    trivias = (
-        Trivia.query.order_by(Trivia.date.desc())
+    # The featured poster is the largest paint; fetch it before the html.
+    hints.preload(posts[0].url, "image", fetchpriority="high")
+
+    # The trivia cards show the stored excerpt; the bodies stay deferred.
+    trivias = querycache.objects(
+        "trivias", "latest:6",
+        Trivia.query
+        .order_by(Trivia.date.desc())
         .filter_by(post_type=PostType.TRIVIA)
-        .limit(6)
-        .all()
+        .limit(6),
     )
 
-    return render_template("index.html", posts=posts, pagination=pagination, trivias=trivias)
+    return render_template("index.html", posts=posts, pagination=pagination, trivias=trivias,
+                           on_this_day=onthisday.today(limit=3))
 
 @main.route("/aboutme", methods=["GET"])
 def aboutme():
@@ -65,52 +81,68 @@ def triviasindex():
 
     return render_template("triviaarchive.html", posts = trivias)
 
+@main.route("/onthisday", methods=["GET"])
+def onthisday_page():
+    now = datetime.now()
+    return render_template("onthisday.html", trivias=onthisday.today(now=now), today=now)
+
 @main.route("/videos", methods=["GET"])
 def videos():
     app.logger.info('Hello tactification.com/articles')
 
     return render_template("videos.html")
 
+def _related(model, post_type, item_id, count):
+    """
+    precomputed neighbours in rank order; a random pick until the item has
+    been through app/related.py.
+    """
+    ids = related.lookup(post_type, item_id, count)
+    if not ids:
+        all_ids = querycache.value(
+            querycache.REGIONS[model], "ids:{:d}".format(post_type),
+            lambda: [r[0] for r in db.session.query(model.id).filter_by(post_type=post_type).all()],
+        )
+        ids = sample(all_ids, min(count, len(all_ids)))
+    items = {item.id: item for item in model.query.filter(model.id.in_(ids)).all()}
+    return [items[i] for i in ids if i in items]
+
 @main.route("/post/<int:id>/<string:header>", methods=["GET", "POST"])
 def post(id, header):
     if id < 0:
         return render_template("error.html", "Post not present")
 
-    page = Post.query.get_or_404(id)
+    page = Post.query.options(undefer(Post.body_html)).get_or_404(id)
     if page is None:
         return render_template("error.html", "Post {:s} not present".format(id))
+    viewcounts.record(page.id)
+    hints.preload(page.url, "image", fetchpriority="high")
 
-    all_post_ids = [r[0] for r in db.session.query(Post.id).filter_by(post_type=PostType.POSTER).all()]
-    random_ids = sample(all_post_ids, min(3, len(all_post_ids)))
-    random_posts = Post.query.filter(Post.id.in_(random_ids)).all()
+    # Called from inside a cached fragment, so a hit skips the queries.
+    random_posts = lambda: _related(Post, PostType.POSTER, page.id, 3)
 
-    #Making body markup safe using Markup class from flask.
-    markup = Markup(page.body)
-    return render_template("post.html", post=page, markup=markup, random_posts=random_posts)
+    # body_html was sanitised when the body was written (app/content.py).
+    return render_template("post.html", post=page, random_posts=random_posts)
 
 @main.route("/trivia/<int:id>/<string:header>", methods=["GET", "POST"])
 def trivia(id, header):
     if id < 0:
         return render_template("error.html", "Trivia not present")
 
-    trivia_item = Trivia.query.get_or_404(id)
+    trivia_item = Trivia.query.options(undefer(Trivia.body_html)).get_or_404(id)
     if trivia_item is None:
         return render_template("error.html", "Trivia {:s} not present".format(id))
 
-    # Making body markup safe using Markup class from flask.
-    markup = Markup(trivia_item.body)
-    all_trivia_ids = [r[0] for r in db.session.query(Trivia.id).filter_by(post_type=PostType.TRIVIA).all()]
-    random_ids = sample(all_trivia_ids, min(5, len(all_trivia_ids)))
-    random_posts = Trivia.query.filter(Trivia.id.in_(random_ids)).all()
+    random_posts = lambda: _related(Trivia, PostType.TRIVIA, trivia_item.id, 5)
 
-    return render_template("trivia.html", post=trivia_item,
-                           markup=markup, random_posts=random_posts)
+    # body_html was sanitised when the body was written (app/content.py).
+    return render_template("trivia.html", post=trivia_item, random_posts=random_posts)
     
 @main.route("/download_file/<int:id>/<filename>", methods=["GET"])
 def download_file(id, filename):
-    directory = "{:s}".format(app.config["UPLOAD_FOLDER"])
-    logging.info('path: {:s} filename: {:s}'.format(directory, filename))
-    return send_from_directory(directory, filename)
+    directory, relative = storage.locate(filename)
+    logger.info('path: {:s} filename: {:s}'.format(directory, relative))
+    return send_from_directory(directory, relative)
 
 
 @main.route("/sitemap")
@@ -129,13 +161,13 @@ def sitemap():
     # Static routes with static content
     static_urls = list()
     for key, value in static_url_list.items():
-        print("rule:", key, value)
+        logger.debug("rule: %s %s", key, value)
         url = {"loc": "{}/{}".format(host_base, url_for(value))}
         static_urls.append(url)
 
     # Dynamic routes with dynamic content
     dynamic_urls = list()
-    blog_posts = Post.query.all()
+    blog_posts = Post.query.options(load_only(Post.id, Post.header, Post.timestamp)).all()
     for post in blog_posts:
         url_ext = url_for("main.post", id=post.id, header=post.header)
 
@@ -0,0 +1,137 @@
+"""
+In-process instrumentation exported in Prometheus text format.
+
+Request latency, SQL count/time per request, template render time and
+cache hit/miss counters are collected here. When PROMETHEUS_MULTIPROC_DIR
+is set (see app.ini) every uWSGI worker writes its samples to that
+directory and /metrics aggregates them, so any worker can answer a scrape.
+"""
+import os
+import time
+from flask import g, request, has_request_context, Response
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from prometheus_client import (
+    Counter,
+    Histogram,
+    CollectorRegistry,
+    REGISTRY,
+    CONTENT_TYPE_LATEST,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_LATENCY = Histogram(
+    "tactification_request_latency_seconds",
+    "Time spent handling a request",
+    ["endpoint", "method", "status"],
+)
+SQL_QUERIES = Histogram(
+    "tactification_sql_queries_per_request",
+    "Number of SQL statements executed per request",
+    ["endpoint"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, float("inf")),
+)
+SQL_TIME = Histogram(
+    "tactification_sql_seconds_per_request",
+    "Time spent in SQL statements per request",
+    ["endpoint"],
+)
+TEMPLATE_RENDER = Histogram(
+    "tactification_template_render_seconds",
+    "Time spent rendering a template",
+    ["template"],
+)
+CACHE_REQUESTS = Counter(
+    "tactification_cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ["cache", "result"],
+)
+
+
+def record_cache(cache, hit):
+    """
+    count a cache lookup. hit ratio = hit / (hit + miss) per cache.
+    """
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def _endpoint():
+    # Unmatched urls (404s, scanners) share one label to keep cardinality bounded.
+    return request.endpoint or "unmatched"
+
+
+def _before_request():
+    g.request_start = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+    g.render_time = 0.0
+    g.render_start = []
+
+
+def _after_request(response):
+    start = g.get("request_start")
+    if start is None:
+        return response
+
+    total = time.perf_counter() - start
+    endpoint = _endpoint()
+    REQUEST_LATENCY.labels(endpoint, request.method, response.status_code).observe(total)
+    SQL_QUERIES.labels(endpoint).observe(g.sql_count)
+    SQL_TIME.labels(endpoint).observe(g.sql_time)
+
+    # Durations are in milliseconds, shown under "Timing" in browser devtools.
+    server_timing = 'db;desc="{:d} queries";dur={:.2f}, render;dur={:.2f}, total;dur={:.2f}'
+    response.headers["Server-Timing"] = server_timing.format(
+        g.sql_count, g.sql_time * 1000, g.render_time * 1000, total * 1000
+    )
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+    if has_request_context() and "sql_count" in g:
+        g.sql_count += 1
+        g.sql_time += elapsed
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context() and "render_start" in g:
+        g.render_start.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    if has_request_context() and g.get("render_start"):
+        elapsed = time.perf_counter() - g.render_start.pop()
+        g.render_time += elapsed
+        TEMPLATE_RENDER.labels(template.name or "string").observe(elapsed)
+
+
+def metrics():
+    """
+    Prometheus scrape endpoint.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    """
+    register request hooks, sqlalchemy/template listeners and /metrics.
+    """
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.add_url_rule("/metrics", "metrics", metrics)
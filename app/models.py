@@ -8,9 +8,12 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from itsdangerous import TimedJSONWebSignatureSerializer as Serializer
 from flask import current_app, url_for, Markup
 from flask_login import UserMixin, AnonymousUserMixin
+from sqlalchemy.orm import validates
 from app import db
 from . import login_manager
 
+logger = logging.getLogger(__name__)
+
 _MONTHNAMES = [
     None,
     "Jan",
@@ -35,6 +38,15 @@ class PostType:
     TRIVIA = 0x8
 
 
+class BodyFormat:
+    """
+    how a body is written: Markdown, or the html of posts from before it.
+    """
+
+    MARKDOWN = "markdown"
+    HTML = "html"
+
+
 # pg112
 class Permission:
     """
@@ -151,7 +163,7 @@ class User(db.Model, UserMixin):
         """
         have sufficient permissions
         """
-        print(
+        logger.debug(
             "Permissions: {:d} passed permissions: {:d}".format(
                 self.role.permissions, permissions
             )
@@ -191,23 +203,23 @@ class User(db.Model, UserMixin):
 
     def generate_auth_token(self, expiration):
         """
-        To generate authentication via rest
+        To generate authentication via rest. Bytes, like the JWS tokens
+        it replaced; see app/tokens.py.
         """
-        s = Serializer(current_app.config["SECRET_KEY"], expires_in=expiration)
-        return s.dumps({"id": self.email})
+        from app import tokens
+
+        return tokens.issue(self, expiration).encode("ascii")
 
     @staticmethod
     def verify_auth_token(token):
         """
-        for verification of authentication via rest
+        for verification of authentication via rest: the email of the
+        token's user, or None.
         """
-        s = Serializer(current_app.config["SECRET_KEY"])
-        try:
-            data = s.loads(token)
-        except:
-            return None
+        from app import tokens
 
-        return data["id"]
+        user = tokens.verify(token)
+        return user.email if user is not None else None
 
 
 class AnonymousUser(AnonymousUserMixin):
@@ -241,16 +253,27 @@ class Post(db.Model):
     __tablename__ = "posts"
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
-    body = db.Column(db.Text)
+    # The unbounded text columns are deferred: listings never read them,
+    # detail views ask for them with undefer()/undefer_group("text").
+    body = db.deferred(db.Column(db.Text), group="text")
+    # Rendered from body by app/content.py whenever body is set.
+    body_html = db.deferred(db.Column(db.Text), group="text")
+    excerpt = db.Column(db.String(300))
+    reading_time = db.Column(db.Integer)
+    # A BodyFormat; NULL only on rows older than the column, until
+    # `flask render-bodies` classifies them.
+    body_format = db.Column(db.String(8))
     header = db.Column(db.String(32))
-    description = db.Column(db.Text)
+    description = db.deferred(db.Column(db.Text), group="text")
     author_id = db.Column(db.Integer, db.ForeignKey("users.id"))
     tags = db.Column(db.String(64))
 
     # using flask-uploads
     # This is used for main page
-    doc = db.Column(db.String(64))
+    doc = db.Column(db.String(256), index=True)
     url = db.Column(db.String(64))
+    # sha256 of the file at doc, checked by `flask reconcile-uploads`.
+    checksum = db.Column(db.String(64))
 
     post_type = db.Column(db.Integer)
 
@@ -276,9 +299,16 @@ class Post(db.Model):
         To display the contents of a post.
         '''
         post_info = 'Id: {id} header: {header} path: {path} url: {url}'
-        logging.info(post_info.format(id=self.id, header=self.header, path=self.doc, url=self.url))
+        logger.info(post_info.format(id=self.id, header=self.header, path=self.doc, url=self.url))
         return
 
+def month_day(date):
+    """
+    "MM-DD" of a date, the key of the on this day lookup.
+    """
+    return date.strftime("%m-%d") if date else None
+
+
 class Trivia(db.Model):
     """
     All trivia data is stored here.
@@ -287,12 +317,25 @@ class Trivia(db.Model):
     __tablename__ = "trivias"
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.DateTime, index=True)
-    body = db.Column(db.Text)
+    # Deferred like Post.body, and rendered the same way.
+    body = db.deferred(db.Column(db.Text), group="text")
+    body_html = db.deferred(db.Column(db.Text), group="text")
+    excerpt = db.Column(db.String(300))
+    reading_time = db.Column(db.Integer)
+    body_format = db.Column(db.String(8))
     header = db.Column(db.String(32))
     author_id = db.Column(db.Integer, db.ForeignKey("users.id"))
     tags = db.Column(db.String(64))
     post_type = db.Column(db.Integer)
     url = db.Column(db.String(256))
+    # Derived from date so app/onthisday.py can seek an index instead of
+    # formatting every date. Bulk inserts have to set it themselves.
+    month_day = db.Column(db.String(5), index=True)
+
+    @validates("date")
+    def _sync_month_day(self, key, date):
+        self.month_day = month_day(date)
+        return date
 
     def month_of_date(self, month):
         return _MONTHNAMES[month]
@@ -316,9 +359,32 @@ class Trivia(db.Model):
         To display the contents of a trivia.
         """
         trivia_info = 'Id: {id} header: {header}'
-        logging.info(trivia_info.format(id=self.id, header=self.header))
+        logger.info(trivia_info.format(id=self.id, header=self.header))
         return
 
+class PostView(db.Model):
+    """
+    View counters for posters, written in batches by app/viewcounts.py.
+    `score` is a decayed view count valid at `score_at` (unix time).
+    """
+
+    __tablename__ = "post_views"
+    post_id = db.Column(db.Integer, db.ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    score = db.Column(db.Float, nullable=False, default=0.0)
+    score_at = db.Column(db.Float, nullable=False, default=0.0)
+
+class RelatedItem(db.Model):
+    """
+    Precomputed content-based neighbours (app/related.py). One primary key
+    lookup per page; related_ids is a comma separated list, best first.
+    """
+
+    __tablename__ = "related_items"
+    kind = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+    related_ids = db.Column(db.String(256), nullable=False, default="")
+
 @login_manager.user_loader
 def load_user(user_id):
     """ """
@@ -0,0 +1,90 @@
+"""
+"On this day in football history": trivias whose date falls on today's
+month and day, in any year.
+
+The lookup is an index seek on Trivia.month_day. Results are kept in the
+shared cache until midnight, keyed on the content version, so writes to
+trivias show up at once and the day rolls over on its own.
+"""
+import time
+import logging
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import select, update
+from app import db
+from app.cache import cache, content_version
+from app.metrics import record_cache
+from app.models import Trivia, PostType, month_day
+
+logger = logging.getLogger(__name__)
+
+
+def seconds_until_midnight(now=None):
+    now = now or datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(1, int((midnight - now).total_seconds()))
+
+
+def lookup(key, limit=None):
+    """
+    trivias for an "MM-DD" key, oldest year first, as dicts with id,
+    header, date and excerpt.
+    """
+    query = (
+        select(Trivia.id, Trivia.header, Trivia.date, Trivia.excerpt)
+        .where(Trivia.month_day == key, Trivia.post_type == PostType.TRIVIA)
+        .order_by(Trivia.date)
+        .limit(limit)
+    )
+    return [
+        {"id": row.id, "header": row.header, "date": row.date, "excerpt": row.excerpt}
+        for row in db.session.execute(query)
+    ]
+
+
+def today(limit=None, now=None):
+    """
+    today's trivias, from the cache when it has them.
+    """
+    now = now or datetime.now()
+    key = month_day(now)
+    cache_key = "onthisday:{}:{}:{}".format(key, limit or "", content_version())
+    items = cache.get(cache_key)
+    record_cache("onthisday", items is not None)
+    if items is None:
+        items = lookup(key, limit)
+        cache.set(cache_key, items, ttl=seconds_until_midnight(now))
+    return items
+
+
+def backfill(batch=1000):
+    """
+    fill month_day for trivias written before the column existed.
+    returns the number of rows updated.
+    """
+    updated = 0
+    while True:
+        rows = db.session.execute(
+            select(Trivia.id, Trivia.date)
+            .where(Trivia.month_day.is_(None), Trivia.date.isnot(None))
+            .limit(batch)
+        ).all()
+        if not rows:
+            return updated
+        db.session.execute(
+            update(Trivia), [{"id": row.id, "month_day": month_day(row.date)} for row in rows]
+        )
+        db.session.commit()
+        updated += len(rows)
+        logger.info("backfilled month_day for %d trivias", updated)
+
+
+@click.command("backfill-month-day")
+@click.option("--batch", default=1000, show_default=True, help="Rows updated per transaction.")
+def backfill_month_day_command(batch):
+    """
+    Fill Trivia.month_day where it is missing.
+    """
+    start = time.perf_counter()
+    updated = backfill(batch)
+    click.echo("updated {:d} trivias in {:.1f} s".format(updated, time.perf_counter() - start))
@@ -0,0 +1,136 @@
+"""
+On-demand request profiling.
+
+A request is profiled with cProfile when either
+  * the sample rate set from /auth/profiling is above zero and the request
+    is picked by random sampling, or
+  * it carries an X-Profile header with a token signed on that page.
+Each profile is dumped as <endpoint>-<time>-<pid>.pstats into PROFILE_DIR,
+which is pruned to PROFILE_MAX_FILES. With the rate at zero and no header
+the only per-request work is a header lookup and a clock comparison.
+"""
+import os
+import math
+import time
+import random
+import cProfile
+from flask import g, request, current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+
+PROFILE_HEADER = "X-Profile"
+
+# The sample rate is shared by all workers through a file in PROFILE_DIR;
+# each worker re-reads it at most every _RATE_REFRESH seconds.
+_RATE_FILE = "sample_rate"
+_RATE_REFRESH = 5.0
+_state = {"rate": 0.0, "checked": 0.0}
+
+
+def _serializer(app):
+    return URLSafeTimedSerializer(app.config["SECRET_KEY"], salt="profile")
+
+
+def request_token(app):
+    """
+    token for the X-Profile header. valid for PROFILE_TOKEN_MAX_AGE seconds.
+    """
+    return _serializer(app).dumps("profile")
+
+
+def _token_valid(app, token):
+    try:
+        _serializer(app).loads(token, max_age=app.config["PROFILE_TOKEN_MAX_AGE"])
+    except BadSignature:
+        return False
+    return True
+
+
+def sample_rate(app):
+    now = time.monotonic()
+    if now - _state["checked"] > _RATE_REFRESH:
+        _state["checked"] = now
+        try:
+            with open(os.path.join(app.config["PROFILE_DIR"], _RATE_FILE)) as handle:
+                rate = float(handle.read().strip() or 0)
+            _state["rate"] = rate if math.isfinite(rate) else 0.0
+        except (OSError, ValueError):
+            _state["rate"] = 0.0
+    return _state["rate"]
+
+
+def set_sample_rate(app, rate):
+    """
+    store rate, clamped to [0, 1]. ValueError for anything but a finite number.
+    """
+    rate = float(rate)
+    if not math.isfinite(rate):
+        # nan would pass the clamp and then compare false against every draw.
+        raise ValueError("sample rate must be finite")
+    rate = min(max(rate, 0.0), 1.0)
+    os.makedirs(app.config["PROFILE_DIR"], exist_ok=True)
+    with open(os.path.join(app.config["PROFILE_DIR"], _RATE_FILE), "w") as handle:
+        handle.write(str(rate))
+    _state["rate"] = rate
+    _state["checked"] = time.monotonic()
+    return rate
+
+
+def profiles(app):
+    """
+    saved profiles, newest first.
+    """
+    directory = app.config["PROFILE_DIR"]
+    if not os.path.isdir(directory):
+        return []
+    entries = [entry for entry in os.scandir(directory) if entry.name.endswith(".pstats")]
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    return [
+        {
+            "name": entry.name,
+            "size": entry.stat().st_size,
+            "captured": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.stat().st_mtime)),
+        }
+        for entry in entries
+    ]
+
+
+def _prune(app):
+    for stale in profiles(app)[app.config["PROFILE_MAX_FILES"]:]:
+        try:
+            os.remove(os.path.join(app.config["PROFILE_DIR"], stale["name"]))
+        except OSError:
+            pass
+
+
+def _before_request():
+    app = current_app._get_current_object()
+    token = request.headers.get(PROFILE_HEADER)
+    if token is None:
+        rate = sample_rate(app)
+        if rate <= 0 or random.random() >= rate:
+            return
+    elif not _token_valid(app, token):
+        return
+
+    g.profiler = cProfile.Profile()
+    g.profiler.enable()
+
+
+def _teardown_request(exc):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return
+    profiler.disable()
+
+    app = current_app._get_current_object()
+    os.makedirs(app.config["PROFILE_DIR"], exist_ok=True)
+    filename = "{}-{:d}-{:d}.pstats".format(
+        request.endpoint or "unmatched", int(time.time() * 1000), os.getpid()
+    )
+    profiler.dump_stats(os.path.join(app.config["PROFILE_DIR"], filename))
+    _prune(app)
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
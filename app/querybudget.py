@@ -0,0 +1,74 @@
+"""
+Per-endpoint SQL statement budgets.
+
+Config.QUERY_BUDGETS maps an endpoint to the maximum number of statements
+one request may run; @query_budget(n) on a view overrides it. In debug and
+test mode a request that goes over its budget logs every statement it ran
+and raises QueryBudgetExceeded, so N+1 regressions fail loudly.
+"""
+import logging
+from flask import g, request, has_request_context, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    raised when a request runs more statements than its endpoint allows.
+    """
+
+
+def query_budget(limit):
+    """
+    declare the maximum number of statements for a view.
+    """
+    def decorator(f):
+        f.query_budget = limit
+        return f
+
+    return decorator
+
+
+def budget_for(endpoint):
+    view = current_app.view_functions.get(endpoint)
+    if view is not None and hasattr(view, "query_budget"):
+        return view.query_budget
+    return current_app.config["QUERY_BUDGETS"].get(endpoint)
+
+
+def _enforced(app):
+    enforce = app.config.get("QUERY_BUDGET_ENFORCE")
+    if enforce is None:
+        return app.debug or app.testing
+    return enforce
+
+
+def _before_request():
+    g.query_log = []
+
+
+def _after_request(response):
+    statements = g.get("query_log")
+    if statements is None or not _enforced(current_app):
+        return response
+
+    limit = budget_for(request.endpoint)
+    if limit is None or len(statements) <= limit:
+        return response
+
+    msg = "{} ran {:d} statements, budget is {:d}".format(request.endpoint, len(statements), limit)
+    logging.error(msg)
+    for statement in statements:
+        logging.error("  %s", statement)
+    raise QueryBudgetExceeded(msg)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "query_log" in g:
+        g.query_log.append(statement)
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
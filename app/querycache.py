@@ -0,0 +1,128 @@
+"""
+Query results cached in named regions.
+
+A region (QUERY_CACHE_REGIONS: name -> ttl in seconds) covers the
+queries over one model. Its entries are keyed on a per-region version
+counter held in the shared cache, so invalidating a region is a single
+increment seen by every worker.
+
+Invalidation is driven by the ORM, not by the views: inserts, updates
+and deletes of Post or Trivia, whether flushed from objects or run as
+bulk insert()/update()/delete() statements through a session, mark
+their region on the session, and the region is bumped once that
+session commits. Bumping after the commit, not at flush time, keeps a
+concurrent reader from caching the old rows under the new version.
+Scripts that write through the app's models are covered the same way;
+raw SQL is not.
+
+Cached ORM objects are detached copies. objects() merges them into the
+current session without loading, the pattern of SQLAlchemy's dogpile
+caching example, so they behave like freshly queried rows.
+"""
+import time
+import logging
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app import app, db
+from app.cache import cache
+from app.metrics import record_cache
+from app.models import Post, Trivia
+
+logger = logging.getLogger(__name__)
+
+REGIONS = {Post: "posters", Trivia: "trivias"}
+
+_PENDING = "querycache_regions"
+
+
+def version(region):
+    # Seeded from the clock, like the content version, so a wiped store
+    # never hands out a version that was used for different rows.
+    return cache.backend.counter("region:" + region, int(time.time()))
+
+
+def invalidate(*regions):
+    for region in regions:
+        cache.backend.incr("region:" + region, int(time.time()))
+        logger.debug("query cache region %s invalidated", region)
+
+
+def value(region, key, creator):
+    """
+    creator()'s result, cached in region under key. The result must
+    pickle; use objects() for ORM instances.
+    """
+    ttl = app.config["QUERY_CACHE_REGIONS"][region]
+    cache_key = "query:{}:{}:{}".format(region, version(region), key)
+    result = cache.get(cache_key)
+    record_cache("query:" + region, result is not None)
+    if result is None:
+        result = creator()
+        cache.set(cache_key, result, ttl=ttl)
+    return result
+
+
+def objects(region, key, query):
+    """
+    query.all(), cached, as instances of the current session.
+    """
+    return [db.session.merge(item, load=False) for item in value(region, key, query.all)]
+
+
+class CachedPagination(Pagination):
+    """
+    flask-sqlalchemy pagination over a cached page and a cached count.
+    """
+
+    def _query_items(self):
+        query, region, key = (self._query_args[name] for name in ("query", "region", "key"))
+        offset = (self.page - 1) * self.per_page
+        return objects(region, "{}:page:{:d}:{:d}".format(key, self.page, self.per_page),
+                       query.limit(self.per_page).offset(offset))
+
+    def _query_count(self):
+        count, region, key = (self._query_args[name] for name in ("count_query", "region", "key"))
+        return value(region, "{}:count".format(key), count.scalar)
+
+
+def paginate(region, key, query, count_query, page, per_page):
+    """
+    like query.paginate(), with both the page and the total cached.
+    count_query selects the total, e.g. a count(id).
+    """
+    return CachedPagination(page=page, per_page=per_page, error_out=False,
+                            query=query, count_query=count_query, region=region, key=key)
+
+
+def _mark(session, regions):
+    if session is not None:
+        session.info.setdefault(_PENDING, set()).update(regions)
+
+
+def _after_write(mapper, connection, target):
+    _mark(object_session(target), [REGIONS[mapper.class_]])
+
+
+for _model in REGIONS:
+    for _name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _name, _after_write)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_write(state):
+    # insert()/update()/delete() statements skip the mapper events.
+    if state.is_insert or state.is_update or state.is_delete:
+        _mark(state.session, [REGIONS[m.class_] for m in state.all_mappers if m.class_ in REGIONS])
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    regions = session.info.pop(_PENDING, None)
+    if regions:
+        invalidate(*sorted(regions))
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_PENDING, None)
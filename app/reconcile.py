@@ -0,0 +1,193 @@
+"""
+Cross-check poster files on disk against Post.doc.
+
+Both sides are produced in the same sorted order and merge-joined, so
+neither is ever held in memory: the upload folder is walked with
+os.scandir one directory at a time, and the (id, doc, checksum) rows are
+streamed from the database ordered by doc. Files are checksummed in a
+thread pool with a bounded number of reads in flight.
+
+    orphan   a file no post points to
+    missing  a post whose doc does not exist
+    corrupt  a file whose sha256 differs from Post.checksum
+
+--reclaim deletes orphans older than --min-age seconds; younger ones may
+belong to an upload that has not been committed yet.
+"""
+import os
+import time
+import logging
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+import click
+from sqlalchemy import select, update
+from app import app, db, storage
+from app.models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def walk(root):
+    """
+    absolute paths of poster files under root, in code point order of the
+    full path. Sorting a directory's names with "/" appended to the
+    subdirectories gives the same order as sorting whole paths.
+    """
+    try:
+        with os.scandir(root) as scan:
+            entries = sorted(
+                (entry.name + "/" if entry.is_dir(follow_symlinks=False) else entry.name, entry.path)
+                for entry in scan
+                if not entry.name.startswith(".")
+            )
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    for name, path in entries:
+        if name.endswith("/"):
+            yield from walk(path)
+        elif name.startswith(storage.FILE_PREFIX):
+            yield path
+
+
+def rows(batch=1000):
+    """
+    (id, doc, checksum) of every post with a file, ordered like walk().
+    Streamed over a connection of its own, so the session can commit
+    recorded checksums while the cursor is open.
+    """
+    doc = Post.doc
+    if db.engine.dialect.name == "postgresql":
+        # Byte order, not the locale's collation.
+        doc = doc.collate("C")
+    query = (
+        select(Post.id, Post.doc, Post.checksum)
+        .where(Post.doc.isnot(None))
+        .order_by(doc, Post.id)
+    )
+    with db.engine.connect() as connection:
+        yield from connection.execution_options(yield_per=batch).execute(query)
+
+
+def merge(files, records):
+    """
+    yield (path, on disk, records for path) for every path on either
+    side: no records for an orphan, not on disk for a path that only the
+    database knows.
+    """
+    file = next(files, None)
+    record = next(records, None)
+    while file is not None or record is not None:
+        if record is None or (file is not None and file < record.doc):
+            yield file, True, []
+            file = next(files, None)
+            continue
+        doc, matched = record.doc, []
+        while record is not None and record.doc == doc:
+            matched.append(record)
+            record = next(records, None)
+        on_disk = file == doc
+        if on_disk:
+            file = next(files, None)
+        yield doc, on_disk, matched
+
+
+def _hash(path, expected):
+    try:
+        return path, expected, storage.checksum(path)
+    except OSError:
+        return path, expected, None
+
+
+def reconcile(workers=8, reclaim=False, min_age=3600, record=False, report=None):
+    """
+    walk, compare and report; returns the counts per finding. report is
+    called as report(kind, path, post_ids) for every finding.
+    """
+    root = app.config["UPLOAD_FOLDER"]
+    report = report or (lambda kind, path, ids: logger.info("%s %s %s", kind, path, ids))
+    counts = Counter()
+    now = time.time()
+    missing_checksums = []
+
+    def settle(future):
+        path, expected, actual = future.result()
+        if actual is None:
+            counts["unreadable"] += 1
+            report("unreadable", path, expected[1])
+        elif expected[0] is None:
+            missing_checksums.extend({"id": post_id, "checksum": actual} for post_id in expected[1])
+            counts["recorded"] += len(expected[1])
+        elif actual != expected[0]:
+            counts["corrupt"] += 1
+            report("corrupt", path, expected[1])
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for path, on_disk, matched in merge(walk(root), rows()):
+            ids = [r.id for r in matched]
+            if not matched:
+                counts["orphans"] += 1
+                size, age = _size_and_age(path, now)
+                counts["orphan_bytes"] += size
+                report("orphan", path, ids)
+                if reclaim and age >= min_age and storage.remove(path):
+                    counts["reclaimed"] += 1
+                    counts["reclaimed_bytes"] += size
+                continue
+            # A doc the walk skipped (outside the folder, or not named like
+            # a poster) is checked directly.
+            if not on_disk and not os.path.isfile(path):
+                counts["missing"] += 1
+                report("missing", path, ids)
+                continue
+
+            counts["files"] += 1
+            stored = {r.checksum for r in matched}
+            expected = (stored.pop() if len(stored) == 1 else None, ids)
+            if expected[0] is None and not record:
+                counts["unchecked"] += 1
+                continue
+            pending.append(pool.submit(_hash, path, expected))
+            # Bounded: at most a few reads in flight per worker.
+            while len(pending) > workers * 4:
+                settle(pending.popleft())
+            if len(missing_checksums) >= 500:
+                _record(missing_checksums)
+        while pending:
+            settle(pending.popleft())
+
+    _record(missing_checksums)
+    return counts
+
+
+def _size_and_age(path, now):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0, 0
+    return stat.st_size, now - stat.st_mtime
+
+
+def _record(changes):
+    # Checksums found with --record, written 500 at a time.
+    if changes:
+        db.session.execute(update(Post), list(changes))
+        db.session.commit()
+        del changes[:]
+
+
+@click.command("reconcile-uploads")
+@click.option("--workers", default=8, show_default=True, help="Files checksummed in parallel.")
+@click.option("--reclaim", is_flag=True, help="Delete orphan files.")
+@click.option("--min-age", default=3600, show_default=True,
+              help="Only reclaim orphans older than this many seconds.")
+@click.option("--record", is_flag=True, help="Store checksums for posts that have none.")
+def reconcile_uploads_command(workers, reclaim, min_age, record):
+    """
+    Report orphan, missing and corrupt poster files.
+    """
+    def report(kind, path, ids):
+        click.echo("{:10s} {} {}".format(kind, path, ",".join(str(i) for i in ids)))
+
+    counts = reconcile(workers, reclaim, min_age, record, report)
+    click.echo(" ".join("{} {:d}".format(key, counts[key]) for key in sorted(counts)))
@@ -0,0 +1,677 @@
+"""
+Content-based related posters and trivias.
+
+Each item is a TF-IDF vector over its header, tags, description and body,
+cut to its RELATED_MAX_TERMS strongest terms and L2 normalised, so a dot
+product is the cosine similarity. The full recompute multiplies the
+matrix by its transpose a batch of rows at a time and keeps the top
+RELATED_TOP_K neighbours per row. Neighbour lists go to related_items, so
+a detail page needs one primary key lookup.
+
+The fitted model (vocabulary, idf, matrix and every row's k-th best score)
+is saved under RELATED_DIR. A single create or edit then vectorises just
+that item against the saved vocabulary, scores it against every row with
+one sparse product, and rewrites only the lists it now belongs to. A
+deleted item, or one whose type takes it out of the corpus, leaves the
+model, its own list and every list it was in. Words the vocabulary has
+never seen are ignored until the next full recompute (`flask
+rebuild-related`), as are lists an edited item has dropped out of.
+
+Single changes are appended to a journal beside the saved model rather
+than rewriting it; every worker replays what it has not seen yet, and
+the model is saved whole again after RELATED_JOURNAL_MAX changes.
+model_lock() serialises the changes of concurrent workers. A full
+recompute reads and fits without the lock; items written meanwhile are
+noted in a pending file and applied again to the new model. Until the
+first full recompute there is no model and writes skip all this.
+"""
+import os
+import re
+import fcntl
+import pickle
+import logging
+import threading
+from contextlib import contextmanager
+from collections import Counter
+import click
+import numpy as np
+from scipy import sparse
+from sqlalchemy import or_
+from app import app, db
+from app.models import Post, PostType, Trivia, RelatedItem
+
+logger = logging.getLogger(__name__)
+
+# Field weights: a word in the header or tags says more than one in the body.
+_CORPORA = {
+    "posters": {
+        "model": Post,
+        "post_type": PostType.POSTER,
+        "fields": (("header", 3), ("tags", 3), ("description", 2), ("body", 1)),
+    },
+    "trivias": {
+        "model": Trivia,
+        "post_type": PostType.TRIVIA,
+        "fields": (("header", 3), ("tags", 3), ("body", 1)),
+    },
+}
+
+_MARKUP = re.compile(r"<[^>]+>|&\w+;")
+_TOKEN = re.compile(r"[a-z0-9]{2,}")
+
+STOP_WORDS = frozenset("""
+    about after all also an and any are as at be been but by can could did
+    do does for from had has have he her his how if in into is it its just
+    more most no not of on one only or other our out over she so some such
+    than that the their them then there these they this those to too up us
+    very was we were what when where which while who will with would you your
+""".split())
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+class Model:
+    """
+    a fitted corpus: row i is the item ids[i]. Rows written since the fit
+    sit in overlay, over the fitted matrix or past its end, and rows of
+    items that left the corpus are in removed.
+    """
+
+    def __init__(self, ids, matrix, vocabulary, idf, kth):
+        self.ids = ids
+        self.matrix = matrix
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.kth = kth
+        self.rows = {int(item_id): row for row, item_id in enumerate(ids.tolist())}
+        self.overlay = {}
+        self.removed = set()
+        self.changes = 0
+        self._stacked = None
+
+    def row(self, row):
+        vector = self.overlay.get(row)
+        return vector if vector is not None else self.matrix[row]
+
+    def set_row(self, item_id, vector):
+        """
+        the row of item_id, now holding vector; appended for a new item.
+        """
+        row = self.rows.get(item_id)
+        if row is None:
+            row = self.rows[item_id] = len(self.ids)
+            self.ids = np.append(self.ids, np.int64(item_id))
+            self.kth = np.append(self.kth, np.float32(0))
+        self.overlay[row] = vector
+        self._stacked = None
+        return row
+
+    def remove(self, item_id):
+        row = self.rows.pop(item_id, None)
+        if row is not None:
+            self.removed.add(row)
+            self.overlay.pop(row, None)
+            self._stacked = None
+
+    def similarity(self, vector):
+        """
+        cosine of vector with every row; -1 for removed rows.
+        """
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        scores[:self.matrix.shape[0]] = np.asarray(
+            (self.matrix @ vector.T).todense(), dtype=np.float32
+        ).ravel()
+        if self.overlay:
+            # One product over the written rows, not one per row.
+            if self._stacked is None:
+                rows = np.fromiter(self.overlay, dtype=np.int64, count=len(self.overlay))
+                self._stacked = rows, sparse.vstack(list(self.overlay.values()), format="csr")
+            rows, stacked = self._stacked
+            scores[rows] = np.asarray((stacked @ vector.T).todense(), dtype=np.float32).ravel()
+        if self.removed:
+            scores[list(self.removed)] = -1
+        return scores
+
+    def compacted(self):
+        """
+        the same model with the overlay folded into one matrix.
+        """
+        keep = [row for row in range(len(self.ids)) if row not in self.removed]
+        pieces, start = [], None
+        for row in keep + [None]:
+            # Runs of untouched fitted rows are sliced, not copied row by row.
+            plain = row is not None and row < self.matrix.shape[0] and row not in self.overlay
+            if plain and start is None:
+                start = end = row
+            elif plain and row == end + 1:
+                end = row
+            else:
+                if start is not None:
+                    pieces.append(self.matrix[start:end + 1])
+                    start = None
+                if plain:
+                    start = end = row
+                elif row is not None:
+                    pieces.append(self.overlay[row])
+        matrix = (sparse.vstack(pieces, format="csr") if pieces
+                  else sparse.csr_matrix((0, len(self.vocabulary)), dtype=np.float32))
+        keep = np.asarray(keep, dtype=np.int64)
+        return Model(self.ids[keep], matrix, self.vocabulary, self.idf, self.kth[keep])
+
+
+def tokens(values, weights):
+    """
+    weighted term counts for one item's field values.
+    """
+    counts = Counter()
+    for value, weight in zip(values, weights):
+        if not value:
+            continue
+        for token in _TOKEN.findall(_MARKUP.sub(" ", value.lower())):
+            if token not in STOP_WORDS:
+                counts[token] += weight
+    return counts
+
+
+def vectorize(counts_list, vocabulary=None, idf=None, max_terms=None):
+    """
+    tf-idf csr matrix for a list of term counts. without a vocabulary one
+    is fitted; returns (matrix, vocabulary, idf). max_terms keeps only each
+    item's strongest terms.
+    """
+    fit = vocabulary is None
+    if fit:
+        vocabulary = {}
+    indptr, indices, data = [0], [], []
+    for counts in counts_list:
+        for token, count in counts.items():
+            column = vocabulary.get(token)
+            if column is None:
+                if not fit:
+                    continue
+                column = vocabulary[token] = len(vocabulary)
+            indices.append(column)
+            data.append(count)
+        indptr.append(len(indices))
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32),
+         np.asarray(indptr, dtype=np.int64)),
+        shape=(len(counts_list), len(vocabulary)),
+    )
+    # Sublinear tf: the tenth "goal" matters less than the first.
+    np.log(matrix.data, out=matrix.data)
+    matrix.data += 1
+    if fit:
+        df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        idf = (np.log((1.0 + matrix.shape[0]) / (1.0 + df)) + 1.0).astype(np.float32)
+    matrix.data *= idf[matrix.indices]
+    if max_terms:
+        matrix = strongest(matrix, max_terms)
+    return normalize(matrix), vocabulary, idf
+
+
+def strongest(matrix, max_terms):
+    """
+    keep the max_terms highest weights of every row. Weak terms add little
+    to a cosine but most of the cost: common words are what make the
+    product of two sparse matrices dense.
+    """
+    lengths = np.diff(matrix.indptr)
+    if lengths.max(initial=0) <= max_terms:
+        return matrix
+    rows = np.repeat(np.arange(matrix.shape[0]), lengths)
+    order = np.lexsort((-matrix.data, rows))
+    rank = np.arange(order.size) - np.repeat(matrix.indptr[:-1], lengths)
+    keep = order[rank < max_terms]
+    indptr = np.concatenate(([0], np.cumsum(np.minimum(lengths, max_terms))))
+    return sparse.csr_matrix(
+        (matrix.data[keep], matrix.indices[keep], indptr), shape=matrix.shape
+    )
+
+
+def normalize(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float32).ravel())
+    norms[norms == 0] = 1
+    matrix.data /= np.repeat(norms, np.diff(matrix.indptr))
+    return matrix
+
+
+def top_k(matrix, k, batch):
+    """
+    (neighbour rows, scores) per row, best first, batch rows at a time so
+    only a batch x n dense block is ever held.
+    """
+    n = matrix.shape[0]
+    k = min(k, n - 1)
+    neighbours = np.zeros((n, max(k, 0)), dtype=np.int64)
+    scores = np.zeros((n, max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return neighbours, scores
+
+    transposed = matrix.T.tocsr()
+    for start in range(0, n, batch):
+        stop = min(start + batch, n)
+        block = (matrix[start:stop] @ transposed).toarray()
+        block[np.arange(stop - start), np.arange(start, stop)] = -1
+        _select(block, k, neighbours[start:stop], scores[start:stop])
+    return neighbours, scores
+
+
+def _select(block, k, neighbours, scores):
+    part = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(block, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    neighbours[:] = np.take_along_axis(part, order, axis=1)
+    scores[:] = np.take_along_axis(part_scores, order, axis=1)
+
+
+def _kth(scores, k):
+    # The score a newcomer has to beat to enter a full list; 0 if not full.
+    kth = np.zeros(scores.shape[0], dtype=np.float32)
+    if scores.shape[1] == k:
+        kth[:] = np.maximum(scores[:, -1], 0)
+    return kth
+
+
+def _related_ids(ids, rows, scores):
+    return ",".join(str(ids[row]) for row, score in zip(rows, scores) if score > 0)
+
+
+def _corpus_rows(corpus, item_id=None):
+    model = corpus["model"]
+    columns = [getattr(model, name) for name, _ in corpus["fields"]]
+    query = db.session.query(model.id, *columns).filter(model.post_type == corpus["post_type"])
+    if item_id is not None:
+        query = query.filter(model.id == item_id)
+    return query.order_by(model.id).yield_per(1000)
+
+
+def _model_path(kind):
+    return os.path.join(app.config["RELATED_DIR"], "{}.npz".format(kind))
+
+
+def _journal_path(kind):
+    return os.path.join(app.config["RELATED_DIR"], "{}.journal".format(kind))
+
+
+def _pending_path(kind):
+    return os.path.join(app.config["RELATED_DIR"], "{}.pending".format(kind))
+
+
+@contextmanager
+def model_lock(kind):
+    """
+    exclusive across threads and workers: held while a saved model is
+    read, changed and saved, so concurrent updates cannot lose each other.
+    """
+    path = _model_path(kind) + ".lock"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def save_model(kind, model):
+    """
+    write model in full and empty its journal. returns the compacted model.
+    """
+    model = model.compacted() if model.overlay or model.removed else model
+    path = _model_path(kind)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tokens_by_column = sorted(model.vocabulary, key=model.vocabulary.get)
+    tmp = "{}.{:d}.tmp.npz".format(path[:-4], os.getpid())
+    np.savez(
+        tmp,
+        ids=model.ids,
+        data=model.matrix.data,
+        indices=model.matrix.indices,
+        indptr=model.matrix.indptr,
+        shape=np.asarray(model.matrix.shape),
+        idf=model.idf,
+        kth=model.kth,
+        tokens=np.asarray(tokens_by_column, dtype=str),
+    )
+    os.replace(tmp, path)
+    open(_journal_path(kind), "wb").close()
+    model.changes = 0
+    with _models_lock:
+        _models[path] = (os.stat(path).st_mtime_ns, 0, model)
+    return model
+
+
+def _journal(kind, model, change):
+    """
+    append one change to the saved model's journal and apply it to model.
+    """
+    with open(_journal_path(kind), "ab") as handle:
+        pickle.dump(change, handle, pickle.HIGHEST_PROTOCOL)
+        offset = handle.tell()
+    _apply(model, change)
+    path = _model_path(kind)
+    with _models_lock:
+        _models[path] = (os.stat(path).st_mtime_ns, offset, model)
+
+
+def _apply(model, change):
+    action, item_id, vector, kth = change
+    if action == "set":
+        indices, data = vector
+        model.set_row(item_id, sparse.csr_matrix(
+            (data, indices, np.asarray([0, len(indices)], dtype=np.int64)),
+            shape=(1, len(model.vocabulary)),
+        ))
+    else:
+        model.remove(item_id)
+    for other, value in kth.items():
+        row = model.rows.get(other)
+        if row is not None:
+            model.kth[row] = value
+    model.changes += 1
+
+
+def _replay(kind, model, offset):
+    # Changes other workers journalled since this one last looked.
+    with open(_journal_path(kind), "rb") as handle:
+        handle.seek(offset)
+        while True:
+            try:
+                _apply(model, pickle.load(handle))
+            except EOFError:
+                return handle.tell()
+
+
+def load_model(kind):
+    """
+    the saved model with its journal applied, or None before the first
+    full recompute.
+    """
+    path = _model_path(kind)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    try:
+        size = os.stat(_journal_path(kind)).st_size
+    except FileNotFoundError:
+        size = 0
+    with _models_lock:
+        cached = _models.get(path)
+    if cached and cached[0] == mtime and cached[1] <= size:
+        model = cached[2]
+        if cached[1] < size:
+            offset = _replay(kind, model, cached[1])
+            with _models_lock:
+                _models[path] = (mtime, offset, model)
+        return model
+
+    with np.load(path) as saved:
+        matrix = sparse.csr_matrix(
+            (saved["data"], saved["indices"], saved["indptr"]), shape=tuple(saved["shape"])
+        )
+        vocabulary = {token: column for column, token in enumerate(saved["tokens"].tolist())}
+        model = Model(saved["ids"], matrix, vocabulary, saved["idf"], saved["kth"])
+    offset = _replay(kind, model, 0) if size else 0
+    with _models_lock:
+        _models[path] = (mtime, offset, model)
+    return model
+
+
+def _forget_cached(kind):
+    # A failed update may have changed the cached model; read it again.
+    with _models_lock:
+        _models.pop(_model_path(kind), None)
+
+
+def _store(post_type, lists, replace=True):
+    """
+    write the neighbour lists of the given items, replacing the old ones.
+    """
+    if not lists:
+        return
+    item_ids = list(lists) if replace else []
+    for start in range(0, len(item_ids), 500):
+        chunk = item_ids[start:start + 500]
+        RelatedItem.query.filter(
+            RelatedItem.kind == post_type, RelatedItem.item_id.in_(chunk)
+        ).delete(synchronize_session=False)
+    db.session.execute(
+        RelatedItem.__table__.insert(),
+        [{"kind": post_type, "item_id": item_id, "related_ids": related}
+         for item_id, related in lists.items()],
+    )
+
+
+def _take_pending(kind):
+    # Items written while a full recompute was reading and fitting.
+    try:
+        with open(_pending_path(kind)) as handle:
+            pending = {int(line) for line in handle if line.strip()}
+    except FileNotFoundError:
+        return set()
+    os.remove(_pending_path(kind))
+    return pending
+
+
+def rebuild(kind):
+    """
+    full recompute of one corpus. returns the number of items.
+    """
+    corpus = _CORPORA[kind]
+    weights = [weight for _, weight in corpus["fields"]]
+    # The read and fit below take minutes on a large corpus and run
+    # without the lock; update() notes the items it writes meanwhile in
+    # the pending file, and they are applied again to the new model.
+    with model_lock(kind):
+        open(_pending_path(kind), "w").close()
+    try:
+        ids, counts_list = [], []
+        for row in _corpus_rows(corpus):
+            ids.append(row[0])
+            counts_list.append(tokens(row[1:], weights))
+        ids = np.asarray(ids, dtype=np.int64)
+
+        k = app.config["RELATED_TOP_K"]
+        matrix, vocabulary, idf = vectorize(counts_list, max_terms=app.config["RELATED_MAX_TERMS"])
+        neighbours, scores = top_k(matrix, k, app.config["RELATED_BATCH"])
+    except Exception:
+        with model_lock(kind):
+            _take_pending(kind)
+        raise
+
+    post_type = corpus["post_type"]
+    lists = {int(ids[row]): _related_ids(ids, neighbours[row], scores[row]) for row in range(len(ids))}
+    with model_lock(kind):
+        pending = _take_pending(kind)
+        RelatedItem.query.filter(RelatedItem.kind == post_type).delete(synchronize_session=False)
+        _store(post_type, lists, replace=False)
+        db.session.commit()
+        model = save_model(kind, Model(ids, matrix, vocabulary, idf, _kth(scores, k)))
+        try:
+            for item_id in sorted(pending):
+                _update(kind, item_id, model)
+        except Exception:
+            _forget_cached(kind)
+            raise
+    return len(ids)
+
+
+def update(kind, item_id):
+    """
+    refresh the neighbours of one created, edited or deleted item, and of
+    the items it now ranks for or no longer exists for. does nothing
+    before the first `flask rebuild-related`: a full fit is too slow for a
+    write request, and pages fall back to a random pick until then.
+    """
+    return update_many(kind, [item_id])
+
+
+def update_many(kind, item_ids):
+    """
+    update() for several items under one lock; items gone from the corpus
+    (deleted, or moved to another type) are removed together.
+    """
+    with model_lock(kind):
+        if os.path.exists(_pending_path(kind)):
+            with open(_pending_path(kind), "a") as handle:
+                handle.writelines("{:d}\n".format(item_id) for item_id in item_ids)
+        model = load_model(kind)
+        if model is None:
+            logger.info("no related %s model yet, %d items left to rebuild-related", kind, len(item_ids))
+            return 0
+        try:
+            corpus = _CORPORA[kind]
+            present = {row[0] for row in _corpus_ids(corpus, item_ids)}
+            changed = _remove(kind, [i for i in item_ids if i not in present], model)
+            for item_id in item_ids:
+                if item_id in present:
+                    changed += _update(kind, item_id, model)
+        except Exception:
+            _forget_cached(kind)
+            raise
+        if model.changes > app.config["RELATED_JOURNAL_MAX"]:
+            save_model(kind, model)
+        return changed
+
+
+def _corpus_ids(corpus, item_ids):
+    model = corpus["model"]
+    return db.session.query(model.id).filter(
+        model.post_type == corpus["post_type"], model.id.in_(list(item_ids))
+    ).all()
+
+
+def _remove(kind, item_ids, model):
+    """
+    drop items from the model, their own lists and every list they are in.
+    """
+    if not item_ids:
+        return 0
+    post_type = _CORPORA[kind]["post_type"]
+    gone = {str(item_id) for item_id in item_ids}
+    lists, kth = {}, {}
+    for start in range(0, len(item_ids), 100):
+        chunk = item_ids[start:start + 100]
+        listed = "," + RelatedItem.related_ids + ","
+        holders = db.session.query(RelatedItem.item_id, RelatedItem.related_ids).filter(
+            RelatedItem.kind == post_type,
+            or_(*[listed.like("%,{:d},%".format(item_id)) for item_id in chunk]),
+        )
+        for other, related in holders:
+            if str(other) not in gone:
+                related = lists.get(other, related)
+                lists[other] = ",".join(i for i in related.split(",") if i not in gone)
+                # One short: any positive score may enter the list again.
+                kth[other] = 0.0
+    for start in range(0, len(item_ids), 500):
+        RelatedItem.query.filter(
+            RelatedItem.kind == post_type, RelatedItem.item_id.in_(item_ids[start:start + 500])
+        ).delete(synchronize_session=False)
+    _store(post_type, lists)
+    db.session.commit()
+    for item_id in item_ids:
+        _journal(kind, model, ("remove", item_id, None, kth))
+        kth = {}
+    return len(lists) + len(item_ids)
+
+
+def _update(kind, item_id, model):
+    corpus = _CORPORA[kind]
+    weights = [weight for _, weight in corpus["fields"]]
+    row = _corpus_rows(corpus, item_id).first()
+    if row is None:
+        return _remove(kind, [item_id], model)
+    vector, _, _ = vectorize([tokens(row[1:], weights)], model.vocabulary, model.idf,
+                             app.config["RELATED_MAX_TERMS"])
+
+    # Scored against a copy of the model's rows with this one written in;
+    # the model itself changes only once the lists are committed.
+    index = model.rows.get(item_id, len(model.ids))
+    ids = model.ids if index < len(model.ids) else np.append(model.ids, np.int64(item_id))
+    kth = model.kth.copy() if index < len(model.ids) else np.append(model.kth, np.float32(0))
+    similarity = model.similarity(vector)
+    if index == len(similarity):
+        similarity = np.append(similarity, np.float32(-1))
+    similarity[index] = -1
+
+    def vector_of(row):
+        return vector if row == index else model.row(row)
+
+    k = app.config["RELATED_TOP_K"]
+    lists, changed_kth = {}, {}
+    size = min(k, int((similarity > -1).sum()))
+    if size > 0:
+        neighbours = np.zeros((1, size), dtype=np.int64)
+        scores = np.zeros((1, size), dtype=np.float32)
+        _select(similarity[np.newaxis, :], size, neighbours, scores)
+        lists[item_id] = _related_ids(ids, neighbours[0], scores[0])
+        changed_kth[item_id] = float(_kth(scores, k)[0])
+
+    # Rows whose k-th best this item now beats; their lists get re-ranked.
+    post_type = corpus["post_type"]
+    beaten = np.flatnonzero((similarity > kth) & (similarity > 0))
+    beaten = beaten[beaten != index]
+    if beaten.size:
+        current = dict(
+            db.session.query(RelatedItem.item_id, RelatedItem.related_ids)
+            .filter(RelatedItem.kind == post_type, RelatedItem.item_id.in_(ids[beaten].tolist()))
+            .all()
+        )
+        for row in beaten:
+            other = int(ids[row])
+            candidates = [model.rows[int(i)] for i in (current.get(other) or "").split(",")
+                          if i and int(i) in model.rows and int(i) != item_id]
+            candidates.append(index)
+            candidate_scores = np.asarray(
+                (sparse.vstack([vector_of(c) for c in candidates], format="csr")
+                 @ model.row(row).T).todense(), dtype=np.float32
+            ).ravel()
+            order = np.argsort(-candidate_scores, kind="stable")[:k]
+            lists[other] = _related_ids(ids, np.asarray(candidates)[order], candidate_scores[order])
+            changed_kth[other] = float(_kth(candidate_scores[order][np.newaxis, :], k)[0])
+
+    _store(post_type, lists)
+    db.session.commit()
+    _journal(kind, model, ("set", item_id, (vector.indices, vector.data), changed_kth))
+    return len(lists)
+
+
+def refresh(kind, item_id):
+    """
+    update() for the write views: a failure is logged, never raised, so
+    the edit itself still succeeds.
+    """
+    refresh_many(kind, [item_id])
+
+
+def refresh_many(kind, item_ids):
+    try:
+        update_many(kind, list(item_ids))
+    except Exception:
+        db.session.rollback()
+        logger.exception("related %s update failed for %s", kind, ",".join(map(str, item_ids)))
+
+
+def lookup(post_type, item_id, limit):
+    """
+    stored neighbour ids, best first; empty before the first recompute.
+    """
+    related = db.session.get(RelatedItem, (int(post_type), item_id))
+    if related is None or not related.related_ids:
+        return []
+    return [int(i) for i in related.related_ids.split(",")][:limit]
+
+
+@click.command("rebuild-related")
+@click.option("--kind", type=click.Choice(sorted(_CORPORA)), multiple=True,
+              help="Corpus to rebuild; all of them by default.")
+def rebuild_related_command(kind):
+    """
+    Recompute every related posters/trivias list.
+    """
+    for name in kind or sorted(_CORPORA):
+        click.echo("{}: {:d} items".format(name, rebuild(name)))
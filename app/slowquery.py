@@ -0,0 +1,222 @@
+"""
+Slow-query recorder.
+
+Every statement slower than SLOW_QUERY_THRESHOLD_MS is written as one JSON
+line together with its bound-parameter shapes, the flask endpoint that
+issued it and its query plan. Each uWSGI worker writes and rotates its own
+file, SLOW_QUERY_LOG.<pid>, so rotation never races another process; the
+admin view aggregates over all of them. A plan costs one more statement, so
+each fingerprint is explained at most once per SLOW_QUERY_EXPLAIN_INTERVAL
+seconds in a process, and never when that is None.
+"""
+import os
+import re
+import glob
+import json
+import time
+import hashlib
+import logging
+from logging.handlers import RotatingFileHandler
+from flask import request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("tactification.slowquery")
+
+_settings = {
+    "threshold": None,
+    "explain_interval": None,
+    "path": None,
+    "max_bytes": 0,
+    "backups": 0,
+}
+# the file handler of this process, reopened after a fork.
+_log = {"pid": None, "path": None, "handler": None}
+# fingerprint -> when it was last explained in this process.
+_explained = {}
+
+_EXPLAIN = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))*\s*\)")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|:\w+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement):
+    """
+    normalise literals, placeholders and IN lists so that the same
+    statement with different values gets the same fingerprint.
+    """
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _PLACEHOLDER_LIST.sub("(...)", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12], normalized
+
+
+def parameter_shape(parameters, executemany=False):
+    """
+    types of the bound parameters, never their values.
+    """
+    if executemany:
+        if not parameters:
+            return {"rows": 0}
+        return {"rows": len(parameters), "row": parameter_shape(parameters[0])}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def explain(cursor, dialect, statement, parameters):
+    """
+    query plan for a select, run on a separate dbapi cursor so that it
+    neither disturbs the original result set nor re-enters engine events.
+    """
+    prefix = _EXPLAIN.get(dialect)
+    if prefix is None or not statement.lstrip().upper().startswith("SELECT"):
+        return None
+
+    plan_cursor = cursor.connection.cursor()
+    try:
+        plan_cursor.execute(prefix + statement, parameters)
+        # sqlite returns (id, parent, notused, detail), postgres a single column.
+        return [str(row[-1]) for row in plan_cursor.fetchall()]
+    except Exception as e:
+        return ["explain failed: {}".format(e)]
+    finally:
+        plan_cursor.close()
+
+
+def _explain_due(key):
+    interval = _settings["explain_interval"]
+    if interval is None:
+        return False
+    now = time.monotonic()
+    last = _explained.get(key)
+    if last is not None and now - last < interval:
+        return False
+    _explained[key] = now
+    return True
+
+
+def _handler():
+    """
+    the rotating file of the current process, opened on first use.
+    """
+    pid = os.getpid()
+    if _log["pid"] != pid or _log["path"] != _settings["path"]:
+        # an inherited handler belongs to the parent: drop it without
+        # flushing or closing anything the parent still writes to.
+        logger.handlers = []
+        handler = RotatingFileHandler(
+            "{}.{:d}".format(_settings["path"], pid),
+            maxBytes=_settings["max_bytes"],
+            backupCount=_settings["backups"],
+            delay=True,
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        _log.update(pid=pid, path=_settings["path"], handler=handler)
+    return _log["handler"]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slowquery_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["slowquery_start"].pop()) * 1000
+    threshold = _settings["threshold"]
+    if threshold is None or elapsed_ms < threshold:
+        return
+
+    key, normalized = fingerprint(statement)
+    record = {
+        "time": time.time(),
+        "fingerprint": key,
+        "statement": normalized,
+        "sql": statement,
+        "duration_ms": round(elapsed_ms, 3),
+        "params": parameter_shape(parameters, executemany),
+        "endpoint": request.endpoint if has_request_context() else None,
+        "plan": None,
+    }
+    if not executemany and _explain_due(key):
+        record["plan"] = explain(cursor, conn.dialect.name, statement, parameters)
+    _handler()
+    logger.warning(json.dumps(record))
+
+
+def log_files():
+    """
+    the slow query logs of every worker, past ones included, with their
+    rotated backups.
+    """
+    if _settings["path"] is None:
+        return []
+    return sorted(glob.glob(glob.escape(_settings["path"]) + ".*"))
+
+
+def aggregate():
+    """
+    slow statements grouped by fingerprint, slowest total time first.
+    """
+    stats = {}
+    for path in log_files():
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                entry = stats.setdefault(record["fingerprint"], {
+                    "fingerprint": record["fingerprint"],
+                    "statement": record["statement"],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "endpoints": set(),
+                    "params": record["params"],
+                    "plan": record["plan"],
+                    "last_seen": 0,
+                })
+                entry["count"] += 1
+                entry["total_ms"] += record["duration_ms"]
+                entry["max_ms"] = max(entry["max_ms"], record["duration_ms"])
+                if record["endpoint"]:
+                    entry["endpoints"].add(record["endpoint"])
+                if record["time"] > entry["last_seen"]:
+                    entry["last_seen"] = record["time"]
+                    entry["params"] = record["params"]
+                    # most records skip EXPLAIN; keep the newest plan seen.
+                    if record["plan"] is not None:
+                        entry["plan"] = record["plan"]
+
+    for entry in stats.values():
+        entry["avg_ms"] = entry["total_ms"] / entry["count"]
+        entry["endpoints"] = sorted(entry["endpoints"])
+    return sorted(stats.values(), key=lambda entry: entry["total_ms"], reverse=True)
+
+
+def init_app(app):
+    """
+    configure the per-process logs and attach the engine listeners.
+    """
+    _settings.update(
+        threshold=app.config["SLOW_QUERY_THRESHOLD_MS"],
+        explain_interval=app.config["SLOW_QUERY_EXPLAIN_INTERVAL"],
+        path=app.config["SLOW_QUERY_LOG"],
+        max_bytes=app.config["SLOW_QUERY_LOG_BYTES"],
+        backups=app.config["SLOW_QUERY_LOG_BACKUPS"],
+    )
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
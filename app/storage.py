@@ -0,0 +1,187 @@
+"""
+Poster file layout under UPLOAD_FOLDER.
+
+Files used to sit side by side in one flat directory. With the sharded
+layout a file lives two levels down, in directories named after the
+first hex digits of the sha1 of its name:
+
+    docs/3f/a2/tactification_12poster.webp
+
+so no directory grows past a few hundred entries. The name, and with it
+the /download_file/<id>/<filename> url, is unchanged; only Post.doc moves.
+Lookups fall back to the flat directory until `flask migrate-uploads`
+has moved the old files.
+"""
+import os
+import json
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask import url_for
+from sqlalchemy import update
+from app import app, db
+from app.models import Post
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = ".migrate-uploads.json"
+FILE_PREFIX = "tactification_"
+
+
+def shard(filename):
+    """
+    relative directory of a file in the sharded layout.
+    """
+    digest = hashlib.sha1(filename.encode("utf-8")).hexdigest()
+    levels = [digest[2 * level:2 * level + 2] for level in range(app.config["UPLOAD_SHARD_DEPTH"])]
+    return os.path.join(*levels) if levels else ""
+
+
+def relative_path(filename):
+    if app.config["UPLOAD_LAYOUT"] == "sharded":
+        return os.path.join(shard(filename), filename)
+    return filename
+
+
+def path_for(filename, root=None):
+    """
+    where a new file with this name is stored.
+    """
+    return os.path.join(root or app.config["UPLOAD_FOLDER"], relative_path(filename))
+
+
+def save(storage, filename, root=None):
+    """
+    save an uploaded werkzeug FileStorage; returns its absolute path.
+    """
+    path = path_for(filename, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    storage.save(path)
+    return path
+
+
+def checksum(path, chunk_size=1024 * 1024):
+    """
+    sha256 hex digest of a stored file, read in fixed size chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remove(path):
+    """
+    delete a stored file. a file that is already gone is not an error.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        logger.info("file %s already removed", path)
+        return False
+    return True
+
+
+def locate(filename, root=None):
+    """
+    (directory, relative path) of an existing file: the current layout
+    first, then the legacy flat directory.
+    """
+    root = root or app.config["UPLOAD_FOLDER"]
+    relative = relative_path(filename)
+    if relative != filename and not os.path.isfile(os.path.join(root, relative)):
+        return root, filename
+    return root, relative
+
+
+def _move(post_id, doc, root):
+    filename = os.path.basename(doc)
+    target = path_for(filename, root)
+    if doc == target:
+        return post_id, None, None
+    if os.path.exists(doc):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(doc, target)
+    elif not os.path.exists(target):
+        # Neither here nor there: reported, and the row is left alone.
+        return post_id, None, "missing {}".format(doc)
+    # else: moved by an earlier run that stopped before its commit.
+    return post_id, target, None
+
+
+def _read_checkpoint(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)["last_id"]
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+def _write_checkpoint(path, last_id):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as handle:
+        json.dump({"last_id": last_id}, handle)
+    os.replace(tmp, path)
+
+
+def migrate_uploads(workers=8, batch=500, restart=False, echo=logger.info):
+    """
+    move every poster file into the configured layout and rewrite
+    Post.doc/Post.url, a batch at a time. Each batch is committed before
+    the checkpoint advances, and a file already at its target is taken
+    as moved, so an interrupted run can simply be started again.
+    """
+    root = app.config["UPLOAD_FOLDER"]
+    checkpoint = os.path.join(root, CHECKPOINT)
+    last_id = 0 if restart else _read_checkpoint(checkpoint)
+    moved = missing = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = (
+                db.session.query(Post.id, Post.doc)
+                .filter(Post.id > last_id, Post.doc.isnot(None))
+                .order_by(Post.id)
+                .limit(batch)
+                .all()
+            )
+            if not rows:
+                break
+
+            changes = []
+            for post_id, target, error in pool.map(lambda row: _move(row[0], row[1], root), rows):
+                if error:
+                    missing += 1
+                    echo(error)
+                elif target:
+                    filename = os.path.basename(target)
+                    changes.append({
+                        "id": post_id,
+                        "doc": target,
+                        "url": url_for("main.download_file", id=post_id, filename=filename),
+                    })
+            if changes:
+                db.session.execute(update(Post), changes)
+                db.session.commit()
+            moved += len(changes)
+            last_id = rows[-1][0]
+            _write_checkpoint(checkpoint, last_id)
+
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return {"moved": moved, "missing": missing}
+
+
+@click.command("migrate-uploads")
+@click.option("--workers", default=8, show_default=True, help="Files moved in parallel.")
+@click.option("--batch", default=500, show_default=True, help="Posts per transaction.")
+@click.option("--restart", is_flag=True, help="Ignore the checkpoint of an interrupted run.")
+def migrate_uploads_command(workers, batch, restart):
+    """
+    Move poster files into the UPLOAD_LAYOUT directory layout.
+    """
+    with app.test_request_context():
+        result = migrate_uploads(workers, batch, restart, echo=lambda line: click.echo(line, err=True))
+    click.echo("moved {moved:d} missing {missing:d}".format(**result))
@@ -0,0 +1,436 @@
+"""
+Search-as-you-type suggestions over poster and trivia headers and tags.
+
+Headers and tags are normalised (lowercase, no accents) and joined into
+one string. Every word start in it is a key: the text from that word to
+the end of its header. The keys are kept as an array of offsets sorted
+by their first SUGGEST_KEY_LENGTH characters, so a prefix lookup is a
+binary search plus a short forward scan, with no database work and no
+per-key string objects. Display strings, kinds and ids sit in a list and
+packed arrays beside it (sizes in benchmarks/bench_suggest.py).
+
+Each worker builds its index in full once, on first use. After that it
+follows writes item by item: committing a session that inserted, updated
+or deleted posters or trivias appends the changed (kind, id) pairs to a
+journal in the shared cache, under a sequence number every worker can
+see. A worker behind the journal reads the current header and tags of
+just those items and moves their keys in place. Tags are reference
+counted, so a tag leaves the index with the last item that uses it.
+
+A full rebuild, in a background thread while the old index keeps
+answering, is only the fallback: for bulk statements that may change
+headers or tags without saying which rows, for journal entries already
+evicted, and once removed entries outnumber the live ones.
+"""
+import re
+import time
+import logging
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+from app import app, db
+from app.cache import cache
+from app.models import Post, PostType, Trivia
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("poster", "trivia", "tag")
+_POSTER, _TRIVIA, _TAG = range(len(KINDS))
+_REMOVED = 255
+
+_SOURCES = {
+    _POSTER: (Post, PostType.POSTER),
+    _TRIVIA: (Trivia, PostType.TRIVIA),
+}
+_KIND_OF = {Post: _POSTER, Trivia: _TRIVIA}
+
+_WORD = re.compile(r"\w+")
+
+_SEQUENCE = "suggest:sequence"
+_PENDING = "suggest_changes"
+# Journal entry of a write that did not say which rows it touched.
+_EVERYTHING = "*"
+# Columns an update has to set to change what the index holds.
+_INDEXED = {"header", "tags", "post_type"}
+# Removed entries keep their text in the blob until a rebuild drops them.
+_COMPACT_AFTER = 1000
+
+_state = {"index": None, "sequence": None, "thread": None}
+_lock = threading.Lock()
+_catch_up_lock = threading.Lock()
+
+
+def normalize(text):
+    """
+    lowercase, accents dropped, runs of whitespace collapsed.
+    """
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.lower().split())
+
+
+class Index:
+    """
+    sorted prefix index over (kind, id, text) entries.
+    """
+
+    def __init__(self, entries, key_length=32):
+        self.texts = []
+        self.kinds = bytearray()
+        self.ids = array("l")
+        self.starts = array("l")
+        self.removed = 0
+        # Bookkeeping for put() and drop(), filled by build(): the ref of
+        # each item's header, the normalised tags of each item, the ref and
+        # the number of users of each tag.
+        self.items = {}
+        self.item_tags = {}
+        self.tags = {}
+        self.tag_counts = Counter()
+        self.key_length = key_length
+        normalized, keys, offsets, refs, position = [], [], [], [], 0
+        for kind, item_id, text in entries:
+            ref = len(self.texts)
+            self.texts.append(text)
+            self.kinds.append(kind)
+            self.ids.append(item_id or 0)
+            self.starts.append(position)
+            key = normalize(text)
+            normalized.append(key)
+            for word in _WORD.finditer(key):
+                keys.append(key[word.start():word.start() + key_length])
+                offsets.append(position + word.start())
+                refs.append(ref)
+            position += len(key) + 1
+        # One string for every key; "\0" sorts below any character. Keys are
+        # ordered on their text up to the "\0", then on their offset (the sort
+        # is stable), so an entry appended later never moves an existing key.
+        self.blob = "\0".join(normalized)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        del keys
+        self.offsets = array("l", (offsets[i] for i in order))
+        self.refs = array("l", (refs[i] for i in order))
+
+    def __len__(self):
+        return len(self.texts) - self.removed
+
+    def _first(self, prefix):
+        # bisect_left over the keys; only len(prefix) characters are sliced.
+        low, high, size = 0, len(self.offsets), len(prefix)
+        while low < high:
+            middle = (low + high) // 2
+            offset = self.offsets[middle]
+            if self.blob[offset:offset + size] < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _key(self, offset):
+        key = self.blob[offset:offset + self.key_length]
+        end = key.find("\0")
+        return key if end < 0 else key[:end]
+
+    def _position(self, offset):
+        # bisect_left of (key, offset): the exact slot of a key.
+        low, high, wanted = 0, len(self.offsets), (self._key(offset), offset)
+        while low < high:
+            middle = (low + high) // 2
+            other = self.offsets[middle]
+            if (self._key(other), other) < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _words(self, ref):
+        start = self.starts[ref]
+        end = self.blob.find("\0", start)
+        key = self.blob[start:end if end >= 0 else len(self.blob)]
+        return [start + word.start() for word in _WORD.finditer(key)]
+
+    def add(self, kind, item_id, text):
+        """
+        one more entry; its keys are inserted in order. returns its ref.
+        """
+        ref = len(self.texts)
+        start = len(self.blob) + 1 if self.texts else 0
+        self.texts.append(text)
+        self.kinds.append(kind)
+        self.ids.append(item_id or 0)
+        self.starts.append(start)
+        self.blob = (self.blob + "\0" if start else "") + normalize(text)
+        for offset in self._words(ref):
+            position = self._position(offset)
+            self.offsets.insert(position, offset)
+            self.refs.insert(position, ref)
+        return ref
+
+    def remove(self, ref):
+        """
+        drop an entry's keys. its text stays in the blob until the next
+        full build.
+        """
+        for offset in self._words(ref):
+            position = self._position(offset)
+            if position < len(self.offsets) and self.offsets[position] == offset:
+                del self.offsets[position]
+                del self.refs[position]
+        self.kinds[ref] = _REMOVED
+        self.texts[ref] = None
+        self.removed += 1
+
+    def search(self, prefix, limit=8):
+        """
+        up to limit entries with a word starting with prefix, in key order,
+        as dicts with kind, text and, except for tags, id.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        # Keys are only ordered on their first key_length characters; past
+        # that, matches are picked out of the run that shares them.
+        head = prefix[:self.key_length]
+        found, seen = [], set()
+        position = self._first(head)
+        # Bounded scan: the same entry can appear under several of its words.
+        end = min(len(self.offsets), position + limit * 4)
+        while position < end and len(found) < limit:
+            offset = self.offsets[position]
+            if self.blob[offset:offset + len(head)] != head:
+                break
+            ref = self.refs[position]
+            position += 1
+            if ref in seen or self.blob[offset:offset + len(prefix)] != prefix:
+                continue
+            seen.add(ref)
+            kind = self.kinds[ref]
+            item = {"kind": KINDS[kind], "text": self.texts[ref]}
+            if kind != _TAG:
+                item["id"] = self.ids[ref]
+            found.append(item)
+        return found
+
+    def put(self, kind, item_id, header, tags):
+        """
+        add or replace one poster or trivia and its tags.
+        """
+        self.drop(kind, item_id)
+        if header:
+            self.items[(kind, item_id)] = self.add(kind, item_id, header)
+        names = _tags(tags)
+        for name, tag in names.items():
+            if not self.tag_counts[name]:
+                self.tags[name] = self.add(_TAG, None, tag)
+            self.tag_counts[name] += 1
+        self.item_tags[(kind, item_id)] = tuple(names)
+
+    def drop(self, kind, item_id):
+        """
+        remove one poster or trivia; tags no other item uses go with it.
+        """
+        ref = self.items.pop((kind, item_id), None)
+        if ref is not None:
+            self.remove(ref)
+        for name in self.item_tags.pop((kind, item_id), ()):
+            self.tag_counts[name] -= 1
+            if self.tag_counts[name] <= 0:
+                del self.tag_counts[name]
+                self.remove(self.tags.pop(name))
+
+
+def _tags(tags):
+    # {normalised: as written} of a comma separated tags column.
+    names = {}
+    for tag in (tags or "").split(","):
+        tag = tag.strip()
+        if tag:
+            names.setdefault(normalize(tag), tag)
+    return names
+
+
+def _rows(kind, ids=None):
+    model, post_type = _SOURCES[kind]
+    query = select(model.id, model.header, model.tags).where(model.post_type == post_type)
+    if ids is not None:
+        query = query.where(model.id.in_(ids))
+    return db.session.execute(query)
+
+
+def sequence():
+    """
+    the shared journal's last sequence number.
+    """
+    return cache.backend.counter(_SEQUENCE, int(time.time()))
+
+
+def build(sequence_number=None):
+    """
+    build this worker's index in full now and make it current.
+    """
+    # Read before the rows: a write committed meanwhile is replayed later,
+    # and replaying a change the rows already show is harmless.
+    sequence_number = sequence() if sequence_number is None else sequence_number
+    rows = [(kind, row) for kind in _SOURCES for row in _rows(kind)]
+    entries = [(kind, item_id, header) for kind, (item_id, header, _) in rows if header]
+    item_tags, names = {}, {}
+    for kind, (item_id, _, tags) in rows:
+        own = _tags(tags)
+        item_tags[(kind, item_id)] = tuple(own)
+        for name, tag in own.items():
+            names.setdefault(name, tag)
+    index = Index(entries + [(_TAG, None, tag) for tag in names.values()],
+                  current_app.config["SUGGEST_KEY_LENGTH"])
+    index.items = {(kind, item_id): ref for ref, (kind, item_id, _) in enumerate(entries)}
+    index.item_tags = item_tags
+    index.tags = {name: len(entries) + position for position, name in enumerate(names)}
+    index.tag_counts = Counter(name for own in item_tags.values() for name in own)
+    with _lock:
+        _state["index"], _state["sequence"] = index, sequence_number
+    logger.info("suggest index built: %d entries, %d keys", len(index), len(index.offsets))
+    return index
+
+
+def _rebuild_in_background():
+    with app.app_context():
+        try:
+            # Writes that land during a build are replayed by the next lookup.
+            build()
+        except Exception:
+            logger.exception("suggest index rebuild failed")
+
+
+def _start_rebuild():
+    with _lock:
+        thread = _state["thread"]
+        if thread and thread.is_alive():
+            return
+        thread = _state["thread"] = threading.Thread(
+            target=_rebuild_in_background, name="suggest-rebuild", daemon=True
+        )
+        thread.start()
+
+
+def _changes(first, last):
+    """
+    the (kind, id) pairs journalled from first to last, or None when an
+    entry is missing or asks for everything.
+    """
+    changed = set()
+    for number in range(first, last + 1):
+        entry = cache.get("suggest:change:{:d}".format(number))
+        if entry is None or entry == _EVERYTHING:
+            return None
+        changed.update((kind, item_id) for kind, item_id in entry)
+    return changed
+
+
+def catch_up(current):
+    """
+    apply the journal up to the current sequence number to this worker's
+    index, or fall back to a background rebuild.
+    """
+    with _catch_up_lock:
+        applied = _state["sequence"]
+        if applied == current or _state["index"] is None:
+            return
+        thread = _state["thread"]
+        if thread and thread.is_alive():
+            return
+        changed = None
+        if applied < current <= applied + current_app.config["SUGGEST_JOURNAL_MAX"]:
+            changed = _changes(applied + 1, current)
+        if changed is None:
+            _start_rebuild()
+            return
+
+        rows = {}
+        for kind in _SOURCES:
+            ids = [item_id for changed_kind, item_id in changed if changed_kind == kind]
+            if ids:
+                rows.update(((kind, row.id), row) for row in _rows(kind, ids))
+        index = _state["index"]
+        with _lock:
+            for kind, item_id in changed:
+                row = rows.get((kind, item_id))
+                if row is None:
+                    index.drop(kind, item_id)
+                else:
+                    index.put(kind, item_id, row.header, row.tags)
+            _state["sequence"] = current
+        logger.debug("suggest index caught up to %d: %d items", current, len(changed))
+        if index.removed > max(len(index), _COMPACT_AFTER):
+            _start_rebuild()
+
+
+def index():
+    """
+    this worker's index; built on first use, then kept up to date.
+    """
+    if _state["index"] is None:
+        return build()
+    current = sequence()
+    if current != _state["sequence"]:
+        catch_up(current)
+    return _state["index"]
+
+
+def search(prefix, limit):
+    if not normalize(prefix):
+        return []
+    found = index()
+    # Lookups are microseconds; holding the lock keeps them off a half-applied update.
+    with _lock:
+        return found.search(prefix, limit)
+
+
+def _mark(session, changes):
+    if session is not None:
+        session.info.setdefault(_PENDING, set()).update(changes)
+
+
+def _after_write(mapper, connection, target):
+    _mark(object_session(target), [(_KIND_OF[mapper.class_], target.id)])
+
+
+for _model in _KIND_OF:
+    for _name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _name, _after_write)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_write(state):
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    kinds = [_KIND_OF[mapper.class_] for mapper in state.all_mappers if mapper.class_ in _KIND_OF]
+    if not kinds:
+        return
+    rows = state.parameters
+    if state.is_update and isinstance(rows, list) and rows:
+        # update(Model) with one dict per row, by primary key: the
+        # backfills, which leave headers and tags alone, say which rows.
+        if not _INDEXED.intersection(rows[0]):
+            return
+        _mark(state.session, [(kind, row["id"]) for kind in kinds for row in rows])
+        return
+    # Other statements do not say which rows they touched.
+    _mark(state.session, [_EVERYTHING])
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    changes = session.info.pop(_PENDING, None)
+    if not changes:
+        return
+    number = cache.backend.incr(_SEQUENCE, int(time.time()))
+    entry = _EVERYTHING if _EVERYTHING in changes else sorted(changes)
+    cache.set("suggest:change:{:d}".format(number), entry, ttl=app.config["SUGGEST_JOURNAL_TTL"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,206 @@
+"""
+Bearer tokens for the json api.
+
+A token is
+
+    at1.<kid>.<claims>.<signature>
+
+claims is the base64url of "user id:permissions:expiry:email" and
+signature the first 16 bytes of an HMAC-SHA256 over everything before it,
+base64url too. kid names the key that signed it. The first key of
+API_TOKEN_KEYS signs new tokens and every listed key verifies, so a key is
+rotated by putting a new one first and dropping the old one once its
+tokens have expired. Without API_TOKEN_KEYS, SECRET_KEY is key "0".
+
+Verified tokens are kept in a per-process LRU of API_TOKEN_CACHE_SIZE
+entries until they expire, so a repeated token costs a dict lookup. The
+permissions travel in the token: the api authenticates a request with
+no database query, and a role change reaches a token when it is renewed.
+
+Tokens from the old itsdangerous JWS format are accepted while
+API_TOKEN_LEGACY is on and itsdangerous still ships the serializer
+(it is gone from 2.1). They carry only the email, so the first use of
+each one reads the user's role; after that it is cached like any other.
+Turn API_TOKEN_LEGACY off once the longest-lived legacy token has
+expired.
+"""
+import hmac
+import time
+import base64
+import hashlib
+import binascii
+import threading
+from collections import OrderedDict
+from flask import current_app, g, request
+from flask_login import UserMixin
+from app import login_manager
+from app.metrics import record_cache
+
+try:
+    from itsdangerous import TimedJSONWebSignatureSerializer
+except ImportError:
+    TimedJSONWebSignatureSerializer = None
+
+PREFIX = "at1"
+SIGNATURE_BYTES = 16
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_keys = {"source": None, "signing": None, "keys": {}}
+
+
+class TokenUser(UserMixin):
+    """
+    the user a token was issued to, as far as the api needs to know.
+    """
+
+    def __init__(self, id, email, permissions, expires):
+        self.id = id
+        self.email = email
+        self.permissions = permissions
+        self.expires = expires
+
+    def can(self, permissions):
+        return bool(self.permissions & permissions)
+
+    def is_administrator(self):
+        from app.models import Permission
+
+        return self.can(Permission.ADMINISTER)
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def keys():
+    """
+    (signing kid, {kid: hmac key}), parsed again only when the config changes.
+    """
+    source = current_app.config["API_TOKEN_KEYS"] or "0:" + (current_app.config["SECRET_KEY"] or "")
+    if source != _keys["source"]:
+        parsed = OrderedDict()
+        for entry in source.split(","):
+            kid, _, secret = entry.strip().partition(":")
+            if not kid or "." in kid or not secret:
+                raise ValueError("API_TOKEN_KEYS entries are kid:secret, kid without dots")
+            # Derived, so the api key differs from other uses of the same secret.
+            parsed[kid] = hmac.new(secret.encode("utf-8"), b"api-token", hashlib.sha256).digest()
+        with _lock:
+            _keys.update(source=source, signing=next(iter(parsed)), keys=parsed)
+            # Tokens of a dropped key must stop working now, not when they expire.
+            _cache.clear()
+    return _keys["signing"], _keys["keys"]
+
+
+def _sign(key, message):
+    return hmac.new(key, message.encode("ascii"), hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def issue(user, expiration):
+    """
+    a token for user, valid for expiration seconds.
+    """
+    kid, secrets = keys()
+    permissions = user.role.permissions if user.role else 0
+    claims = "{:d}:{:d}:{:d}:{}".format(user.id, permissions or 0, int(time.time()) + expiration, user.email)
+    message = "{}.{}.{}".format(PREFIX, kid, _b64encode(claims.encode("utf-8")))
+    return "{}.{}".format(message, _b64encode(_sign(secrets[kid], message)))
+
+
+def _decode(token):
+    message, _, signature = token.rpartition(".")
+    prefix, kid, claims = (message.split(".") + [None, None])[:3]
+    key = keys()[1].get(kid)
+    if prefix != PREFIX or key is None:
+        return None
+    try:
+        if not hmac.compare_digest(_b64decode(signature), _sign(key, message)):
+            return None
+        id, permissions, expires, email = _b64decode(claims).decode("utf-8").split(":", 3)
+        return TokenUser(int(id), email, int(permissions), int(expires))
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+def _decode_legacy(token):
+    if TimedJSONWebSignatureSerializer is None or not current_app.config["API_TOKEN_LEGACY"]:
+        return None
+    from app.models import User
+
+    serializer = TimedJSONWebSignatureSerializer(current_app.config["SECRET_KEY"])
+    try:
+        data, header = serializer.loads(token, return_header=True)
+    except Exception:
+        return None
+    # Confirmation tokens are signed the same way; they have no "id".
+    email = data.get("id") if isinstance(data, dict) else None
+    if not email:
+        return None
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        return None
+    return TokenUser(user.id, user.email, user.role.permissions if user.role else 0, int(header["exp"]))
+
+
+def _remember(token, user):
+    with _lock:
+        _cache[token] = user
+        _cache.move_to_end(token)
+        while len(_cache) > current_app.config["API_TOKEN_CACHE_SIZE"]:
+            _cache.popitem(last=False)
+
+
+def verify(token):
+    """
+    the TokenUser of a valid, unexpired token, else None.
+    """
+    if isinstance(token, bytes):
+        token = token.decode("ascii", "replace")
+    keys()
+    now = time.time()
+    with _lock:
+        user = _cache.get(token)
+        if user is not None:
+            _cache.move_to_end(token)
+    record_cache("api-token", user is not None)
+    if user is None:
+        user = _decode(token) if token.startswith(PREFIX + ".") else _decode_legacy(token)
+        if user is not None and user.expires > now:
+            _remember(token, user)
+    elif user.expires <= now:
+        with _lock:
+            _cache.pop(token, None)
+    return user if user is not None and user.expires > now else None
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+def from_request():
+    """
+    the TokenUser of the request's `Authorization: Bearer` header, once per
+    request.
+    """
+    if "token_user" not in g:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        ok = scheme.lower() == "bearer" and token.strip()
+        g.token_user = verify(token.strip()) if ok else None
+    return g.token_user
+
+
+def _load_user_from_request(req):
+    # Session pages keep their cookie login; a bearer token counts on the api only.
+    if req.blueprint != "api":
+        return None
+    return from_request()
+
+
+def init_app(app):
+    login_manager.request_loader(_load_user_from_request)
@@ -0,0 +1,161 @@
+"""
+Write-behind poster view counters and the "most read this week" ranking.
+
+main.post only bumps an in-process counter. A daemon thread per worker
+flushes the pending counts every VIEW_FLUSH_INTERVAL seconds as one
+batched upsert into post_views, so readers never wait on the database
+writer lock. The same thread then reloads the ranking, which templates
+read from memory without running a query.
+
+Scores decay with a half-life of VIEW_HALF_LIFE seconds (a week by
+default). The decay is applied inside the upsert, so concurrent flushes
+from several workers stay correct. On sqlite the upsert relies on the
+power() function and WAL mode app/database.py sets up.
+"""
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import Counter
+from sqlalchemy import func
+from sqlalchemy.dialects import sqlite, postgresql
+from app import app, db
+from app.models import Post, PostType, PostView
+
+logger = logging.getLogger(__name__)
+
+_pending = Counter()
+_lock = threading.Lock()
+_ranking = {"posts": []}
+_flusher = {"pid": None}
+
+_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def record(post_id):
+    """
+    count one view. no i/o on the request path.
+    """
+    with _lock:
+        _pending[post_id] += 1
+    _ensure_flusher()
+
+
+def most_read():
+    """
+    cached top posters: dicts with id, header and url.
+    """
+    _ensure_flusher()
+    return _ranking["posts"]
+
+
+def _decay(half_life, now, column_at):
+    return func.power(0.5, (now - column_at) / half_life)
+
+
+def flush():
+    """
+    write pending counts in one upsert and reload the ranking. returns
+    the number of posters written.
+    """
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+
+    half_life = app.config["VIEW_HALF_LIFE"]
+    now = time.time()
+    if batch:
+        # Posters deleted since they were viewed would fail the foreign key
+        # and, re-queued, every later flush with it: their counts are dropped.
+        existing = {
+            post_id for (post_id,) in db.session.query(Post.id).filter(Post.id.in_(list(batch)))
+        }
+        gone = [post_id for post_id in batch if post_id not in existing]
+        if gone:
+            logger.info("dropping view counts of deleted posters %s", gone)
+            batch = {post_id: count for post_id, count in batch.items() if post_id in existing}
+    if batch:
+        insert = _INSERTS[db.engine.dialect.name]
+        stmt = insert(PostView)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PostView.post_id],
+            set_={
+                "views": PostView.views + stmt.excluded.views,
+                "score": PostView.score * _decay(half_life, now, PostView.score_at) + stmt.excluded.score,
+                "score_at": stmt.excluded.score_at,
+            },
+        )
+        rows = [
+            {"post_id": post_id, "views": count, "score": float(count), "score_at": now}
+            for post_id, count in batch.items()
+        ]
+        try:
+            db.session.execute(stmt, rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Put the counts back so the next flush retries them.
+            with _lock:
+                _pending.update(batch)
+            raise
+
+    load_ranking(now)
+    return len(batch)
+
+
+def load_ranking(now=None):
+    now = now or time.time()
+    decayed = PostView.score * _decay(app.config["VIEW_HALF_LIFE"], now, PostView.score_at)
+    rows = (
+        db.session.query(Post.id, Post.header, Post.url)
+        .join(PostView, PostView.post_id == Post.id)
+        .filter(Post.post_type == PostType.POSTER)
+        .order_by(decayed.desc())
+        .limit(app.config["MOST_READ_SIZE"])
+        .all()
+    )
+    _ranking["posts"] = [{"id": r.id, "header": r.header, "url": r.url} for r in rows]
+    return _ranking["posts"]
+
+
+def _run(interval):
+    while True:
+        with app.app_context():
+            try:
+                flush()
+            except Exception:
+                logger.exception("view counter flush failed")
+        time.sleep(interval)
+
+
+def _ensure_flusher():
+    # One flusher per process; threads do not survive uWSGI's fork.
+    if _flusher["pid"] == os.getpid():
+        return
+    interval = app.config["VIEW_FLUSH_INTERVAL"]
+    if not interval:
+        return
+    with _lock:
+        # Two first requests can get here together; one of them starts it.
+        if _flusher["pid"] == os.getpid():
+            return
+        _flusher["pid"] = os.getpid()
+        threading.Thread(target=_run, args=(interval,), name="viewcounts", daemon=True).start()
+
+
+def _flush_at_exit():
+    if _flusher["pid"] == os.getpid():
+        with app.app_context():
+            flush()
+
+
+atexit.register(_flush_at_exit)
+
+
+@app.context_processor
+def inject_most_read():
+    return {"most_read": most_read()}
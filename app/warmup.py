@@ -0,0 +1,135 @@
+"""
+Warm a worker up before it serves traffic.
+
+Under uWSGI the warm-up runs in every worker right after the fork, before
+the worker starts accepting requests; elsewhere wsgi.py starts it in a
+background thread. Not the app factory: cli commands and db_migrate.py
+create the app too, and must not query tables while they change. It
+
+    compiles every template,
+    opens WARMUP_CONNECTIONS pooled database connections and runs a query
+        on each,
+    requests WARMUP_URLS through the app, which reads the hot pages of
+        the database into the page cache and fills the query, fragment
+        and response caches,
+    builds the in-process suggestion index.
+
+GET /ready answers 503 until the warm-up of the worker that serves it
+has finished, then 200. A failed step is logged and skipped; a cold
+worker is slower, not broken.
+
+WARMUP_URLS are requested as http://localhost/: only list pages whose
+cached output does not contain absolute urls (feeds and the sitemap do).
+"""
+import os
+import time
+import logging
+import threading
+from flask import jsonify
+from sqlalchemy import text
+from app import db
+
+logger = logging.getLogger(__name__)
+
+try:
+    from uwsgidecorators import postfork
+except ImportError:
+    postfork = None
+
+_state = {"pid": None, "ready": False, "seconds": None, "steps": {}}
+
+
+def compile_templates(app):
+    names = [n for n in app.jinja_env.list_templates() if n.endswith((".html", ".xml"))]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def prime_connections(app):
+    with app.app_context():
+        count = app.config["WARMUP_CONNECTIONS"]
+        connections = []
+        try:
+            for engine in db.engines.values():
+                for _ in range(count):
+                    connection = engine.connect()
+                    connection.execute(text("SELECT 1"))
+                    connections.append(connection)
+        finally:
+            # Back to the pool, still open.
+            for connection in connections:
+                connection.close()
+        return len(connections)
+
+
+def request_pages(app):
+    client = app.test_client()
+    for url in app.config["WARMUP_URLS"]:
+        response = client.get(url)
+        if response.status_code >= 500:
+            raise RuntimeError("{} answered {:d}".format(url, response.status_code))
+    return len(app.config["WARMUP_URLS"])
+
+
+def build_indexes(app):
+    from app import suggest
+
+    with app.app_context():
+        return len(suggest.build())
+
+
+STEPS = (
+    ("templates", compile_templates),
+    ("connections", prime_connections),
+    ("pages", request_pages),
+    ("indexes", build_indexes),
+)
+
+
+def warm(app):
+    """
+    run every step and mark this process ready; returns seconds per step.
+    """
+    _state.update(pid=os.getpid(), ready=False, steps={})
+    start = time.perf_counter()
+    for name, step in STEPS:
+        step_start = time.perf_counter()
+        try:
+            done = step(app)
+        except Exception:
+            logger.exception("warm-up step %s failed", name)
+            continue
+        _state["steps"][name] = round(time.perf_counter() - step_start, 4)
+        logger.info("warm-up %s: %s in %.3f s", name, done, _state["steps"][name])
+    _state["seconds"] = round(time.perf_counter() - start, 4)
+    _state["ready"] = True
+    logger.info("worker %d warm in %.3f s", os.getpid(), _state["seconds"])
+    return dict(_state["steps"])
+
+
+def ready():
+    return _state["ready"] and _state["pid"] == os.getpid()
+
+
+def readiness():
+    if not ready():
+        return jsonify(status="warming"), 503
+    return jsonify(status="ready", seconds=_state["seconds"], steps=_state["steps"])
+
+
+def start(app):
+    """
+    warm in the background, once per process; for servers without a
+    post-fork hook. Call it from the serving entry point only.
+    """
+    if postfork is not None or not app.config["WARMUP"] or _state["pid"] == os.getpid():
+        return
+    _state["pid"] = os.getpid()
+    threading.Thread(target=warm, args=(app,), name="warmup", daemon=True).start()
+
+
+def init_app(app):
+    app.add_url_rule("/ready", "ready", readiness)
+    if postfork is not None and app.config["WARMUP"]:
+        postfork(lambda: warm(app))
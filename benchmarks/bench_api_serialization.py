@@ -0,0 +1,49 @@
+"""
+Serialization cost of a 10k-item api page.
+
+Compares the api's compact encoding with indented json, which is what
+jsonify emits here because JSONIFY_PRETTYPRINT_REGULAR is on.
+
+    APP_PATH=/var/www/app python benchmarks/bench_api_serialization.py
+"""
+import gzip
+import json
+import timeit
+from datetime import datetime, timedelta
+from app.api.views import dumps, serialize
+
+ITEMS = 10000
+NAMES = ["id", "header", "tags", "timestamp", "url"]
+
+
+def rows(count):
+    base = datetime(2020, 1, 1)
+    return [
+        (i, "Poster header {:d}".format(i), "tactics,history", base + timedelta(hours=i),
+         "/download_file/{:d}/tactification_{:d}poster.webp".format(i, i))
+        for i in range(count)
+    ]
+
+
+def pretty(items):
+    return json.dumps(items, indent=2, default=str).encode("utf-8")
+
+
+def main():
+    data = rows(ITEMS)
+    compact = dumps({"items": serialize(data, NAMES), "next": None})
+    indented = pretty({"items": serialize(data, NAMES), "next": None})
+
+    for label, fn in [
+        ("compact", lambda: dumps({"items": serialize(data, NAMES), "next": None})),
+        ("pretty", lambda: pretty({"items": serialize(data, NAMES), "next": None})),
+    ]:
+        best = min(timeit.repeat(fn, number=5, repeat=3)) / 5
+        print("{:8s} {:7.2f} ms/page".format(label, best * 1000))
+
+    for label, body in [("compact", compact), ("pretty", indented)]:
+        print("{:8s} {:7d} bytes raw {:7d} bytes gzip".format(label, len(body), len(gzip.compress(body, 5))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Bulk trivia ingestion throughput (validation + one-transaction insert).
+
+Runs against the configured database and deletes its rows afterwards.
+
+    APP_PATH=/var/www/app python benchmarks/bench_bulk_ingest.py [items]
+"""
+import sys
+import time
+from app import create_app, db
+from app.ingest import ingest
+from app.models import Trivia
+
+TAG = "bench-ingest"
+
+
+def items(count):
+    return [
+        {"header": "Trivia {:d}".format(i), "body": "On this day ... {:d}".format(i),
+         "tags": TAG, "date": "2001-{:02d}-{:02d}".format(i % 12 + 1, i % 28 + 1)}
+        for i in range(count)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    app = create_app()
+    with app.test_request_context():
+        db.create_all()
+        payload = items(count)
+        start = time.perf_counter()
+        result = ingest(payload)
+        elapsed = time.perf_counter() - start
+        Trivia.query.filter_by(tags=TAG).delete()
+        db.session.commit()
+
+    print("{:d} items inserted in {:.3f} s: {:.0f} items/s".format(
+        result["inserted"], elapsed, result["inserted"] / elapsed))
+
+
+if __name__ == "__main__":
+    main()
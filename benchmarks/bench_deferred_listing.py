@@ -0,0 +1,62 @@
+"""
+Memory and time of listing 10k posters with and without the deferred
+text columns.
+
+Inserts N posters with a few KB of body and description, then loads
+them the way postindex does (text deferred) and with
+undefer_group("text") (what every listing did before). Runs against the
+configured database and deletes its rows afterwards.
+
+    APP_PATH=/var/www/app PYTHONPATH=. python benchmarks/bench_deferred_listing.py [rows]
+"""
+import sys
+import time
+import tracemalloc
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import undefer_group
+from app import create_app, db
+from app.models import Post, PostType
+
+ROWS = 10000
+HEADER = "bench-deferred"
+
+
+def measure(label, query):
+    db.session.expunge_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    posts = query.all()
+    elapsed = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{:10s} {:6d} rows  {:7.1f} ms  held {:6.1f} MB  peak {:6.1f} MB".format(
+        label, len(posts), elapsed * 1000, size / 2 ** 20, peak / 2 ** 20))
+    del posts
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        body = "<p>{}</p>".format("A long tactical breakdown. " * 150)
+        db.session.execute(insert(Post), [
+            {"header": HEADER, "body": body, "description": body[:1000], "tags": "bench",
+             "post_type": PostType.POSTER}
+            for _ in range(rows)
+        ])
+        db.session.commit()
+        try:
+            listing = Post.query.filter_by(header=HEADER).order_by(Post.timestamp.desc())
+            # Twice each; the first round warms the statement cache.
+            for _ in range(2):
+                measure("deferred", listing)
+                measure("undeferred", listing.options(undefer_group("text")))
+        finally:
+            db.session.rollback()
+            db.session.execute(delete(Post).where(Post.header == HEADER))
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Concurrent editor sessions against SQLite and PostgreSQL.
+
+Forks N editor processes, like uWSGI workers, each running write
+sessions in a loop: insert a trivia, edit it, read it back, commit.
+Reports sessions per second, p50/p95 session latency and failed
+sessions (sqlite's "database is locked"). Without a url it runs against
+a scratch sqlite file; pass DATABASE_URL-style urls to compare.
+
+    APP_PATH=/var/www/app PYTHONPATH=. python benchmarks/bench_editor_writes.py \\
+        [editors] [sessions] [url ...]
+"""
+import os
+import sys
+import time
+import tempfile
+import multiprocessing
+from sqlalchemy import create_engine, delete, insert, select, update
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.config import engine_options
+from app.models import Trivia
+
+EDITORS = 8
+SESSIONS = 200
+HEADER = "bench-editor"
+
+
+def editor(url, sessions, results):
+    engine = create_engine(url, **engine_options(url))
+    trivias = Trivia.__table__
+    latencies, failures = [], 0
+    for number in range(sessions):
+        start = time.perf_counter()
+        try:
+            with engine.begin() as connection:
+                trivia_id = connection.execute(
+                    insert(trivias).values(header=HEADER, body="draft", tags="bench")
+                ).inserted_primary_key[0]
+                connection.execute(
+                    update(trivias)
+                    .where(trivias.c.id == trivia_id)
+                    .values(body="edit {:d} by {:d}".format(number, os.getpid()))
+                )
+                connection.execute(select(trivias.c.body).where(trivias.c.id == trivia_id)).scalar()
+        except OperationalError:
+            failures += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    engine.dispose()
+    results.put((latencies, failures))
+
+
+def run(url, editors, sessions):
+    engine = create_engine(url, **engine_options(url))
+    db.metadata.create_all(engine)
+    results = multiprocessing.get_context("fork").Queue()
+    start = time.perf_counter()
+    workers = [
+        multiprocessing.get_context("fork").Process(target=editor, args=(url, sessions, results))
+        for _ in range(editors)
+    ]
+    for worker in workers:
+        worker.start()
+    latencies, failures = [], 0
+    for _ in workers:
+        done, failed = results.get()
+        latencies.extend(done)
+        failures += failed
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    with engine.begin() as connection:
+        connection.execute(delete(Trivia.__table__).where(Trivia.__table__.c.header == HEADER))
+    engine.dispose()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] if latencies else 0
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+    print("{:10s} {:8.0f} sessions/s  p50 {:6.1f} ms  p95 {:6.1f} ms  failed {:d}".format(
+        engine.dialect.name, len(latencies) / elapsed, p50 * 1000, p95 * 1000, failures))
+
+
+def main():
+    editors = int(sys.argv[1]) if len(sys.argv) > 1 else EDITORS
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else SESSIONS
+    urls = sys.argv[3:]
+    print("{:d} editors x {:d} sessions".format(editors, sessions))
+    with tempfile.TemporaryDirectory() as scratch:
+        for url in urls or ["sqlite:///" + os.path.join(scratch, "bench.sqlite")]:
+            run(url, editors, sessions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Request time of the index and a poster page with template fragments
+cached and with every fragment rendered.
+
+"uncached" swaps the fragment store for one that never hits; the query
+cache stays on in both rounds, so the difference is template work plus
+the related-items queries a cached sidebar skips. Runs against the
+configured database and deletes its rows afterwards.
+
+    APP_PATH=/var/www/app PYTHONPATH=. python benchmarks/bench_fragments.py [requests]
+"""
+import sys
+import time
+import statistics
+from sqlalchemy import delete
+from app import create_app, db
+from app.cache import cache
+from app.models import Post, PostType
+
+HEADER = "bench-fragment"
+
+
+class NoStore:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+
+def timed(client, url, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        client.get(url)
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    app = create_app()
+    app.config["VIEW_FLUSH_INTERVAL"] = 0
+    with app.app_context():
+        db.create_all()
+        posts = [Post(header=HEADER, body="<p>body</p>" * 200, tags="bench", url="/static/x.webp",
+                      post_type=PostType.POSTER) for _ in range(30)]
+        db.session.add_all(posts)
+        db.session.commit()
+        post_url = "/post/{:d}/{}".format(posts[0].id, HEADER)
+
+    client = app.test_client()
+    try:
+        for url in ("/", post_url):
+            app.jinja_env.fragment_cache = NoStore()
+            uncached = timed(client, url, count)
+            app.jinja_env.fragment_cache = cache
+            client.get(url)
+            cached = timed(client, url, count)
+            print("{:32s} uncached {:6.2f} ms  cached {:6.2f} ms".format(url, uncached, cached))
+    finally:
+        app.jinja_env.fragment_cache = cache
+        with app.app_context():
+            db.session.execute(delete(Post).where(Post.header == HEADER))
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
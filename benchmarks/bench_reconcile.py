@@ -0,0 +1,81 @@
+"""
+Memory and throughput of the reconcile walk/merge/checksum pipeline.
+
+Creates N small poster files in a sharded temp folder and feeds the
+merge a sorted stream of fake rows (every other file has one), the way
+`flask reconcile-uploads` streams them from the database. Peak RSS
+should stay flat as N grows.
+
+    APP_PATH=/var/www/app PYTHONPATH=. python benchmarks/bench_reconcile.py [files]
+"""
+import os
+import sys
+import time
+import shutil
+import hashlib
+import resource
+import tempfile
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+from app import app, storage
+from app.reconcile import walk, merge, _hash
+
+FILES = 200000
+WORKERS = 8
+
+Row = namedtuple("Row", "id doc checksum")
+
+
+def populate(root, count):
+    with app.app_context():
+        for i in range(count):
+            path = storage.path_for("{}{:d}.webp".format(storage.FILE_PREFIX, i), root)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as handle:
+                handle.write(b"x" * 512)
+
+
+def records(root):
+    # Sorted by doc, like the real query; built lazily from the walk itself.
+    digest = hashlib.sha256(b"x" * 512).hexdigest()
+    for index, path in enumerate(walk(root)):
+        if index % 2 == 0:
+            yield Row(index, path, digest)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else FILES
+    root = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        populate(root, count)
+        print("created {:d} files in {:.1f} s".format(count, time.perf_counter() - start))
+
+        base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        orphans = checked = 0
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            pending = deque()
+            for path, on_disk, matched in merge(walk(root), records(root)):
+                if not matched:
+                    orphans += 1
+                    continue
+                pending.append(pool.submit(_hash, path, (matched[0].checksum, [matched[0].id])))
+                while len(pending) > WORKERS * 4:
+                    pending.popleft().result()
+                    checked += 1
+            while pending:
+                pending.popleft().result()
+                checked += 1
+        elapsed = time.perf_counter() - start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print("checked {:d} orphans {:d} in {:.1f} s ({:.0f} files/s)".format(
+            checked, orphans, elapsed, count / elapsed))
+        print("peak rss {:.1f} MB, growth during reconcile {:.1f} MB".format(
+            peak / 1024, (peak - base_rss) / 1024))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
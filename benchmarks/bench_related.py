@@ -0,0 +1,79 @@
+"""
+Full related-items recompute at 100k posters, and one incremental update.
+
+Synthetic posters draw words from a Zipf-distributed vocabulary, which is
+roughly how real text spreads over terms. Only the vectorising and the
+batched top-k are timed; writing the lists is one executemany insert.
+
+    APP_PATH=/var/www/app PYTHONPATH=. python benchmarks/bench_related.py [posters]
+"""
+import sys
+import time
+import numpy as np
+from app import related
+
+POSTERS = 100000
+VOCABULARY = 50000
+TOP_K = 10
+MAX_TERMS = 32
+BATCH = 256
+
+
+def corpus(count, seed=7):
+    rng = np.random.default_rng(seed)
+    words = np.array(["w{:d}".format(i) for i in range(VOCABULARY)])
+    weights = [3, 3, 2, 1]
+    lengths = [6, 3, 25, 300]
+    for _ in range(count):
+        fields = [
+            " ".join(words[np.minimum(rng.zipf(1.3, size=length), VOCABULARY) - 1])
+            for length in lengths
+        ]
+        yield related.tokens(fields, weights)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else POSTERS
+
+    start = time.perf_counter()
+    counts = list(corpus(count))
+    generated = time.perf_counter()
+    matrix, vocabulary, idf = related.vectorize(counts, max_terms=MAX_TERMS)
+    vectorized = time.perf_counter()
+    neighbours, scores = related.top_k(matrix, TOP_K, BATCH)
+    done = time.perf_counter()
+
+    print("{:d} posters, {:d} terms, {:d} non-zeros".format(count, len(vocabulary), matrix.nnz))
+    print("tokenize   {:8.2f} s".format(generated - start))
+    print("vectorize  {:8.2f} s".format(vectorized - generated))
+    print("top-k      {:8.2f} s  ({:.2f} ms per poster)".format(
+        done - vectorized, (done - vectorized) * 1000 / count))
+
+    # What update() does for one edit: vectorise against the saved vocabulary
+    # and score the item against every row.
+    vector, _, _ = related.vectorize(counts[:1], vocabulary, idf, MAX_TERMS)
+    start = time.perf_counter()
+    for _ in range(20):
+        similarity = (matrix @ vector.T).toarray().ravel()
+        np.argpartition(-similarity, TOP_K)[:TOP_K]
+    print("one update {:8.2f} ms".format((time.perf_counter() - start) * 1000 / 20))
+
+    # The same with a full journal of written rows over the fitted matrix,
+    # and the whole save that folds them in.
+    model = related.Model(np.arange(count, dtype=np.int64), matrix, vocabulary, idf,
+                          np.zeros(count, dtype=np.float32))
+    for item_id in range(0, count, max(1, count // 500)):
+        model.set_row(item_id, vector)
+    model.similarity(vector)
+    start = time.perf_counter()
+    for _ in range(20):
+        model.similarity(vector)
+    print("with {:d} journalled rows {:8.2f} ms".format(
+        len(model.overlay), (time.perf_counter() - start) * 1000 / 20))
+    start = time.perf_counter()
+    model.compacted()
+    print("compact    {:8.2f} ms".format((time.perf_counter() - start) * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Cost of rendering a Markdown body, and backfill throughput by workers.
+
+First times content.fields() on a typical body, the work a detail page
+would repeat on every request if bodies were rendered when read. Then
+inserts N trivias, clears their derived columns and times
+content.backfill() with 1 and with W rendering processes. Runs against
+the configured database and deletes its rows afterwards.
+
+    APP_PATH=/var/www/app PYTHONPATH=. python benchmarks/bench_render.py [rows] [workers]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import delete, insert, update
+from app import create_app, db, content
+from app.models import PostType, Trivia
+
+ROWS = 5000
+HEADER = "bench-render"
+
+BODY = """## The final
+
+In the **{n:d}th minute** the keeper came up for a corner, and the
+header that followed is still [talked about](https://example.com/{n:d}).
+
+* three substitutions
+* two red cards
+* one trophy
+
+> It was the loudest I have ever heard the stadium.
+
+""" * 4
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+
+    start = time.perf_counter()
+    for n in range(500):
+        content.fields(BODY.format(n=n))
+    print("render     {:7.3f} ms per body ({:d} chars)".format(
+        (time.perf_counter() - start) * 2, len(BODY.format(n=0))))
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(Trivia), [
+            {"header": HEADER, "body": BODY.format(n=n), "tags": "bench",
+             "date": datetime(2024, 1, 1), "post_type": PostType.TRIVIA}
+            for n in range(rows)
+        ])
+        db.session.commit()
+        try:
+            for count in (1, workers):
+                db.session.execute(update(Trivia).where(Trivia.header == HEADER).values(body_html=None))
+                db.session.commit()
+                start = time.perf_counter()
+                updated = content.backfill(workers=count)
+                elapsed = time.perf_counter() - start
+                print("backfill   {:d} workers {:6d} rows {:7.2f} s {:8.0f} rows/s".format(
+                    count, updated, elapsed, updated / elapsed))
+        finally:
+            db.session.execute(delete(Trivia).where(Trivia.header == HEADER))
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
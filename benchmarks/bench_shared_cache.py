@@ -0,0 +1,83 @@
+"""
+Shared cache: hit latency per backend and memory as workers are added.
+
+Each worker warms the same 200 renderings of 40KB (about a feed each).
+With the per-process cache every worker holds its own copy; with the
+shared store they are written once and read by all. uWSGI's cache2 can
+only be measured inside uWSGI; its memory is the fixed size set in
+app.ini, whatever the worker count.
+
+    APP_PATH=/var/www/app PYTHONPATH=. python benchmarks/bench_shared_cache.py
+"""
+import os
+import tempfile
+import timeit
+import multiprocessing
+from app.cache import SimpleCache, SqliteCache
+
+ENTRIES = 200
+SIZE = 40 * 1024
+WORKERS = (1, 2, 4, 8)
+
+
+def rss_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def warm(store):
+    for i in range(ENTRIES):
+        key = "feed:{:d}".format(i)
+        if store.get(key) is None:
+            store.set(key, (os.urandom(SIZE), os.urandom(SIZE // 4)))
+
+
+def worker(make_store, queue):
+    store = make_store()
+    before = rss_kb()
+    warm(store)
+    for i in range(ENTRIES):
+        store.get("feed:{:d}".format(i))
+    queue.put(rss_kb() - before)
+
+
+def memory(make_store, workers):
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    processes = [context.Process(target=worker, args=(make_store, queue)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    growth = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return sum(growth)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+
+    def backends(name):
+        path = os.path.join(directory, name)
+        return [
+            ("local", lambda: SimpleCache(ENTRIES * 2)),
+            ("sqlite", lambda: SqliteCache(path, ENTRIES * 2)),
+        ]
+
+    for label, make_store in backends("latency.sqlite"):
+        store = make_store()
+        warm(store)
+        best = min(timeit.repeat(lambda: store.get("feed:7"), number=2000, repeat=5)) / 2000
+        print("{:7s} hit {:7.1f} us".format(label, best * 1e6))
+
+    # A fresh store per worker count, so the first worker always pays the warm-up.
+    for workers in WORKERS:
+        for label, make_store in backends("workers-{:d}.sqlite".format(workers)):
+            total = memory(make_store, workers)
+            print("{:7s} {:d} workers: rss growth {:7.1f} MB total".format(label, workers, total / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Memory, build time and lookup latency of the suggestion index.
+
+Builds app/suggest.py's Index over N synthetic headers (six to ten words
+from a football vocabulary, plus a few hundred tags) and times lookups
+for 1-6 character prefixes of real words, then the in-place add and
+remove a write applies.
+
+    APP_PATH=/var/www/app PYTHONPATH=. python benchmarks/bench_suggest.py [headers]
+"""
+import sys
+import time
+import random
+import tracemalloc
+from app.suggest import Index
+
+HEADERS = 100000
+LOOKUPS = 20000
+UPDATES = 1000
+
+WORDS = """
+    barcelona madrid liverpool milan inter juventus ajax bayern dortmund
+    porto benfica celtic napoli roma arsenal chelsea united city atletico
+    pressing counter press high line low block false nine inverted fullback
+    overlap underlap halfspace rondo gegenpress catenaccio totaal voetbal
+    final semi quarter derby clasico comeback penalty shootout treble
+    tactics breakdown shape midfield diamond back three wingback libero
+""".split()
+
+
+def headers(count, rng):
+    for i in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(6, 10))]
+        yield i % 2, i + 1, " ".join(words).capitalize() + " {:d}".format(1950 + i % 75)
+    for i in range(300):
+        yield 2, None, "{}-{:d}".format(rng.choice(WORDS), i)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else HEADERS
+    rng = random.Random(7)
+    entries = list(headers(count, rng))
+
+    start = time.perf_counter()
+    index = Index(entries)
+    elapsed = time.perf_counter() - start
+
+    # Measured on a second build; tracing slows the build down several times.
+    del index
+    tracemalloc.start()
+    index = Index(entries)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{:d} entries, {:d} keys, built in {:.2f} s".format(len(index), len(index.offsets), elapsed))
+    print("index {:.1f} MB (peak while building {:.1f} MB)".format(size / 2 ** 20, peak / 2 ** 20))
+
+    prefixes = [rng.choice(WORDS)[:rng.randint(1, 6)] for _ in range(LOOKUPS)]
+    latencies = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.search(prefix, 8)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print("lookup p50 {:.1f} us  p99 {:.1f} us  max {:.1f} us".format(
+        latencies[len(latencies) // 2] * 1e6, latencies[int(len(latencies) * 0.99)] * 1e6,
+        latencies[-1] * 1e6))
+
+    updates = list(headers(UPDATES, rng))[:UPDATES]
+    start = time.perf_counter()
+    refs = [index.add(kind, item_id, text) for kind, item_id, text in updates]
+    added = time.perf_counter() - start
+    start = time.perf_counter()
+    for ref in refs:
+        index.remove(ref)
+    removed = time.perf_counter() - start
+    print("add {:.0f} us  remove {:.0f} us per entry".format(added / UPDATES * 1e6, removed / UPDATES * 1e6))
+
+
+if __name__ == "__main__":
+    main()
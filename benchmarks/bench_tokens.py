@@ -0,0 +1,58 @@
+"""
+Api token verifications per second: the old JWS tokens, the compact HMAC
+tokens of app/tokens.py uncached, and repeated tokens from the LRU.
+
+"jws + user" is what every api request used to do: verify the JWS token
+and look the user up by email. Runs against the configured database and
+deletes its user afterwards.
+
+    APP_PATH=/var/www/app PYTHONPATH=. python benchmarks/bench_tokens.py [seconds]
+"""
+import sys
+import time
+import warnings
+from itsdangerous import TimedJSONWebSignatureSerializer
+from app import create_app, db, tokens
+from app.models import Role, User
+
+EMAIL = "bench-tokens@example.com"
+
+
+def rate(label, function, seconds):
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(200):
+            function()
+        calls += 200
+    elapsed = time.perf_counter() - start
+    print("{:14s} {:10.0f} verifications/s  {:7.2f} us each".format(label, calls / elapsed, elapsed / calls * 1e6))
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    warnings.simplefilter("ignore", DeprecationWarning)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if Role.query.count() == 0:
+            Role.insert_roles()
+        user = User(email=EMAIL, username="bench", role=Role.query.filter_by(name="Administrator").first())
+        db.session.add(user)
+        db.session.commit()
+        try:
+            serializer = TimedJSONWebSignatureSerializer(app.config["SECRET_KEY"], expires_in=3600)
+            legacy = serializer.dumps({"id": EMAIL})
+            token = tokens.issue(user, 3600)
+            print("token length   jws {:d}, hmac {:d}".format(len(legacy), len(token)))
+
+            rate("jws", lambda: serializer.loads(legacy), seconds)
+            rate("jws + user", lambda: User.query.filter_by(email=serializer.loads(legacy)["id"]).first(), seconds)
+            rate("hmac", lambda: tokens._decode(token), seconds)
+            rate("hmac, cached", lambda: tokens.verify(token), seconds)
+        finally:
+            db.session.delete(db.session.get(User, user.id))
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Read latency of main.post with write-behind view counting on and off.
+
+Requests one poster in alternating rounds with counting off and on
+while the flusher upserts every 50 ms, and reports the median of the
+per-round p50/p95. Runs against the configured database and deletes
+its rows afterwards.
+
+    APP_PATH=/var/www/app python benchmarks/bench_view_counters.py [requests]
+"""
+import sys
+import time
+import statistics
+from app import create_app, db, viewcounts
+from app.models import Post, PostType, PostView
+
+ROUNDS = 6
+
+
+def run(client, url, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        client.get(url)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    app = create_app()
+    app.config["VIEW_FLUSH_INTERVAL"] = 0.05
+    with app.app_context():
+        db.create_all()
+        post = Post(header="bench", body="body", post_type=PostType.POSTER)
+        db.session.add(post)
+        db.session.commit()
+        post_id = post.id
+    url = "/post/{:d}/bench".format(post_id)
+
+    client = app.test_client()
+    record = viewcounts.record
+    results = {"off": [], "on": []}
+    try:
+        run(client, url, count // ROUNDS)
+        for _ in range(ROUNDS):
+            viewcounts.record = lambda post_id: None
+            results["off"].append(run(client, url, count // ROUNDS))
+            viewcounts.record = record
+            results["on"].append(run(client, url, count // ROUNDS))
+    finally:
+        viewcounts.record = record
+        with app.app_context():
+            viewcounts.flush()
+            views = db.session.get(PostView, post_id).views
+            PostView.query.filter_by(post_id=post_id).delete()
+            Post.query.filter_by(id=post_id).delete()
+            db.session.commit()
+
+    for mode in ("off", "on"):
+        p50 = statistics.median(r[0] for r in results[mode])
+        p95 = statistics.median(r[1] for r in results[mode])
+        print("counting {:3s}  p50 {:.2f} ms  p95 {:.2f} ms".format(mode, p50 * 1000, p95 * 1000))
+    print("{:d} views flushed".format(views))
+
+
+if __name__ == "__main__":
+    main()
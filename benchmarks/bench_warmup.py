@@ -0,0 +1,71 @@
+"""
+First-request latency of a fresh worker with and without the warm-up.
+
+Each round starts a new python process (a stand-in for a new uWSGI
+worker), optionally runs app/warmup.py, then times the first request to
+each url. The shared response cache is wiped before every round, so the
+cold rounds pay for it like a fresh deploy. Runs against the configured
+database and deletes its rows afterwards.
+
+    APP_PATH=/var/www/app PYTHONPATH=. python benchmarks/bench_warmup.py [rounds]
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+from sqlalchemy import delete
+from app import create_app, db
+from app.cache import cache
+from app.models import Post, PostType
+
+HEADER = "bench-warmup"
+
+CHILD = """
+import json, sys, time
+from app import create_app, warmup
+app = create_app()
+if sys.argv[1] == "warm":
+    warmup.warm(app)
+client = app.test_client()
+times = {}
+for url in sys.argv[2:]:
+    start = time.perf_counter()
+    client.get(url)
+    times[url] = (time.perf_counter() - start) * 1000
+print(json.dumps(times))
+"""
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        posts = [Post(header=HEADER, body="<p>body</p>" * 100, tags="bench", url="/static/x.webp",
+                      post_type=PostType.POSTER) for _ in range(50)]
+        db.session.add_all(posts)
+        db.session.commit()
+        urls = ["/", "/post/{:d}/{}".format(posts[0].id, HEADER), "/api/v1/suggest?q=ben"]
+
+    env = dict(os.environ, WARMUP="0", LOG_LEVEL="WARNING")
+    try:
+        for mode in ("cold", "warm"):
+            samples = {url: [] for url in urls}
+            for _ in range(rounds):
+                with app.app_context():
+                    cache.clear()
+                output = subprocess.run([sys.executable, "-c", CHILD, mode] + urls, env=env,
+                                        check=True, capture_output=True, text=True).stdout
+                for url, ms in json.loads(output.strip().splitlines()[-1]).items():
+                    samples[url].append(ms)
+            for url in urls:
+                print("{:5s} {:32s} first request {:7.2f} ms".format(mode, url, statistics.median(samples[url])))
+    finally:
+        with app.app_context():
+            db.session.execute(delete(Post).where(Post.header == HEADER))
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
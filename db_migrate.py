@@ -2,6 +2,7 @@ import os
 import sys
 from flask_migrate import Migrate, init, migrate, upgrade
 from app import create_app, db
+from app import content, onthisday
 
 """
 This script applies model changes using Flask-Migrate.
@@ -9,7 +10,14 @@ It initializes the migrations repo if missing, then runs migrate + upgrade.
 """
 
 app = create_app()
-migrate_ext = Migrate(app, db)
+# Batch mode lets sqlite alter tables by copying them; on postgres it is
+# plain ALTER TABLE, so the same migrations run on both.
+migrate_ext = Migrate(
+    app,
+    db,
+    render_as_batch=True,
+    compare_type=True,
+)
 
 
 def ensure_repo():
@@ -23,6 +31,9 @@ def main():
         ensure_repo()
         migrate(message=message)
         upgrade()
+        # Derived columns the new schema expects to be filled.
+        onthisday.backfill()
+        content.backfill(workers=os.cpu_count() or 1)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
+import logging
 from app import create_app
 
-print("manage")
+logging.info("manage")
 
 app = create_app()
@@ -7,4 +7,10 @@ app="docker.tactification"
 docker build --build-arg SECRET_KEY=$1 -t ${app} .
 
 # Dev container keeps volume-mounted uploads/db for persistence.
+# To keep the database out of the uploads volume, add for example
+#   -v tactification-db:/var/www/db -e DATABASE_PATH=/var/www/db/tactification.data.sqlite
+# after moving the existing tactification.data.sqlite there, or point the app
+# at PostgreSQL with
+#   -e DATABASE_URL=postgresql://tactification:secret@db/tactification
+# (pool per worker: DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE).
 docker run -d -p 80:80 -v insidecode:/var/www/app/docs ${app}
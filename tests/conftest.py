@@ -1,14 +1,26 @@
 import os
-import pytest
-from app import create_app, db
-from app.models import Role
+import tempfile
 
 # Ensure a default path exists before the app module is imported anywhere else.
 os.environ.setdefault("APP_PATH", "/var/www/app")
+# Tests warm explicitly (test_warmup.py), not in a background thread.
+os.environ["WARMUP"] = "0"
+# The fixture drops every table, so never run against the DATABASE_URL of
+# the shell: a throwaway sqlite file, or TEST_DATABASE_URL (test_matrix.sh).
+# The engine is created on import, so it has to be set first.
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or "sqlite:///" + os.path.join(
+    tempfile.mkdtemp(prefix="tactification-tests-"), "test.sqlite"
+)
+
+import pytest
+from app import create_app, db
+from app.models import Role
+from app.cache import cache, bump_content_version
+from app import viewcounts, suggest, tokens
 
 
 @pytest.fixture
-def app_instance(monkeypatch):
+def app_instance(monkeypatch, tmp_path_factory):
     """
     Create a fresh Flask app and database for each test.
     """
@@ -16,6 +28,8 @@ def app_instance(monkeypatch):
     monkeypatch.setenv("APP_PATH", app_path)
 
     app = create_app()
+    # Per-test stores, kept out of the tmp_path that tests use themselves.
+    state_dir = tmp_path_factory.mktemp("state")
     upload_dir = os.path.join(app_path, "docs")
     os.makedirs(upload_dir, exist_ok=True)
 
@@ -23,9 +37,12 @@ def app_instance(monkeypatch):
         {
             "TESTING": True,
             "WTF_CSRF_ENABLED": False,
-            "SQLALCHEMY_DATABASE_URI": "sqlite:////var/www/app/docs/tactification.data.sqlite",
             "SECRET_KEY": "test-secret",
             "SERVER_NAME": "localhost",
+            "VIEW_FLUSH_INTERVAL": 0,
+            "RELATED_DIR": str(state_dir / "related"),
+            "CACHE_BACKEND": "sqlite",
+            "CACHE_PATH": str(state_dir / "cache.sqlite"),
         }
     )
 
@@ -33,6 +50,16 @@ def app_instance(monkeypatch):
         db.drop_all()
         db.create_all()
         Role.insert_roles()
+    # The database was recreated behind the cache's back.
+    cache.clear()
+    bump_content_version()
+    viewcounts._pending.clear()
+    viewcounts._ranking["posts"] = []
+    if suggest._state["thread"] is not None:
+        suggest._state["thread"].join()
+    suggest._state.update(index=None, sequence=None, thread=None)
+    # User ids are reused by the new database.
+    tokens.clear()
 
     yield app
 
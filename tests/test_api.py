@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import Post, PostType, Trivia
+
+
+def seed_posters(count):
+    base = datetime(2024, 1, 1)
+    posts = [
+        Post(body="body {:d}".format(i), header="Poster {:d}".format(i), description="desc",
+             tags="tag", post_type=PostType.POSTER, timestamp=base + timedelta(days=i // 2))
+        for i in range(count)
+    ]
+    db.session.add_all(posts)
+    db.session.commit()
+
+
+def test_poster_list_walks_all_pages_with_cursor(client, app_instance):
+    with app_instance.app_context():
+        seed_posters(7)
+
+    seen = []
+    url = "/api/v1/posters?limit=3"
+    while url:
+        data = client.get(url).get_json()
+        assert len(data["items"]) <= 3
+        seen.extend(item["id"] for item in data["items"])
+        url = "/api/v1/posters?limit=3&cursor={}".format(data["next"]) if data["next"] else None
+
+    # Newest first, ties on timestamp broken by id, nothing repeated or skipped.
+    assert sorted(seen) == list(range(1, 8))
+    assert len(set(seen)) == 7
+    assert seen == [7, 6, 5, 4, 3, 2, 1]
+
+
+def test_cursor_walks_past_rows_without_a_date(client, app_instance):
+    with app_instance.app_context():
+        db.session.add_all([
+            Trivia(header="T{:d}".format(i), body="b", tags="t", post_type=PostType.TRIVIA,
+                   date=datetime(2024, 1, i + 1) if i % 2 else None)
+            for i in range(7)
+        ])
+        db.session.commit()
+
+    seen = []
+    url = "/api/v1/trivias?limit=2"
+    while url:
+        data = client.get(url).get_json()
+        seen.extend(item["id"] for item in data["items"])
+        url = "/api/v1/trivias?limit=2&cursor={}".format(data["next"]) if data["next"] else None
+
+    # Dated trivias newest first, then undated ones by id.
+    assert seen == [6, 4, 2, 7, 5, 3, 1]
+
+
+def test_fields_projection_skips_heavy_columns(client, app_instance):
+    with app_instance.app_context():
+        seed_posters(1)
+
+    item = client.get("/api/v1/posters").get_json()["items"][0]
+    assert "body" not in item and "description" not in item
+
+    item = client.get("/api/v1/posters?fields=header,body").get_json()["items"][0]
+    assert set(item) == {"id", "header", "body"}
+
+    assert client.get("/api/v1/posters?fields=password_hash").status_code == 400
+    assert client.get("/api/v1/posters?cursor=not-a-cursor").status_code == 400
+
+
+def test_detail_etag_and_304(client, app_instance):
+    with app_instance.app_context():
+        seed_posters(1)
+        trivia = Trivia(body="b", header="T", tags="t", post_type=PostType.TRIVIA,
+                        date=datetime(2024, 1, 2))
+        db.session.add(trivia)
+        db.session.commit()
+        trivia_id = trivia.id
+
+    response = client.get("/api/v1/posters/1")
+    assert response.status_code == 200
+    assert b": " not in response.data and b", " not in response.data
+    etag = response.headers["ETag"]
+
+    cached = client.get("/api/v1/posters/1", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    assert client.get("/api/v1/trivias/{:d}".format(trivia_id)).get_json()["date"] == "2024-01-02T00:00:00"
+    assert client.get("/api/v1/trivias").get_json()["items"][0]["id"] == trivia_id
+    assert client.get("/api/v1/posters/999").status_code == 404
+
+
+def _token(app_instance, role="Administrator"):
+    from tests.test_models import create_user
+
+    with app_instance.app_context():
+        user = create_user("{}@example.com".format(role.lower()), role)
+        return user.generate_auth_token(expiration=600).decode("ascii")
+
+
+def test_bulk_trivias_single_transaction_with_item_errors(client, app_instance):
+    token = _token(app_instance)
+    items = [
+        {"header": "One", "body": "b", "tags": "t", "date": "2024-05-01"},
+        {"header": "", "body": "b", "tags": "t", "date": "2024-05-02"},
+        {"header": "Three", "body": "b", "tags": "t", "date": "not-a-date"},
+        {"header": "Four", "body": "b", "tags": "t", "date": "2024-05-04", "url": "https://example.com"},
+    ]
+    body = "\n".join(__import__("json").dumps(item) for item in items)
+    response = client.post("/api/v1/trivias/bulk", data=body,
+                           headers={"Authorization": "Bearer " + token},
+                           content_type="application/x-ndjson")
+    assert response.status_code == 201
+    result = response.get_json()
+    assert result["inserted"] == 2
+    assert [error["index"] for error in result["errors"]] == [1, 2]
+    assert "header" in result["errors"][0]["errors"]
+
+    with app_instance.app_context():
+        headers = {t.header for t in Trivia.query.all()}
+    assert headers == {"One", "Four"}
+
+
+def test_bulk_trivias_requires_writer_token(client, app_instance):
+    payload = '[{"header": "x", "body": "b", "tags": "t", "date": "2024-05-01"}]'
+    assert client.post("/api/v1/trivias/bulk", data=payload).status_code == 401
+    assert client.post("/api/v1/trivias/bulk", data=payload,
+                       headers={"Authorization": "Bearer junk"}).status_code == 401
+
+    token = _token(app_instance, role="User")
+    assert client.post("/api/v1/trivias/bulk", data=payload,
+                       headers={"Authorization": "Bearer " + token}).status_code == 403
+
+
+def test_ingest_trivias_cli(app_instance, tmp_path):
+    source = tmp_path / "trivias.json"
+    source.write_text('[{"header": "Cli", "body": "b", "tags": "t", "date": "2024-06-01"}, {"header": "Bad"}]')
+
+    result = app_instance.test_cli_runner().invoke(args=["ingest-trivias", str(source)])
+    assert result.exit_code == 0
+    assert "inserted 1 rejected 1" in result.output
+    with app_instance.app_context():
+        assert Trivia.query.filter_by(header="Cli").count() == 1
+
+
+def test_ingest_trivias_cli_reports_the_bad_line(app_instance, tmp_path):
+    source = tmp_path / "trivias.jsonl"
+    source.write_text('\n{"header": "One", "body": "b", "tags": "t", "date": "2024-06-01"}\n{"header": "Two",\n')
+
+    result = app_instance.test_cli_runner().invoke(args=["ingest-trivias", str(source)])
+    assert result.exit_code == 2
+    assert "line 3 column" in result.output
+    assert "Traceback" not in result.output
+
+    source.write_text('[\n  {"header": "One"},\n  {"header": }\n]')
+    result = app_instance.test_cli_runner().invoke(args=["ingest-trivias", str(source)])
+    assert result.exit_code == 2 and "line 3 column 14" in result.output
+    with app_instance.app_context():
+        assert Trivia.query.count() == 0
@@ -0,0 +1,60 @@
+import os
+from app import assets
+
+
+def test_minify_keeps_strings_and_drops_whitespace():
+    css = """
+    /* nav */
+    .a > .b ,  .c:hover {
+      color : #fff ;
+      background: url("data:image/svg+xml,%3csvg x='0 0' /%3e");
+    }
+    """
+    assert assets.minify(css) == \
+        ".a>.b,.c:hover{color:#fff;background:url(\"data:image/svg+xml,%3csvg x='0 0' /%3e\")}"
+
+
+def test_critical_keeps_matching_rules_and_media_blocks():
+    css = ".hero{a:1}.card{b:2}@media (max-width:10px){.hero .x{c:3}.card{d:4}}"
+    assert assets.critical(css, (".hero",)) == ".hero{a:1}@media (max-width:10px){.hero .x{c:3}}"
+
+
+def test_static_urls_are_fingerprinted(app_instance):
+    with app_instance.test_request_context():
+        url = assets.asset_url("css/site.css")
+        assert url.startswith("dist/css/site.") and url.endswith(".css")
+        assert os.path.isfile(os.path.join(app_instance.static_folder, url))
+
+        from flask import url_for
+        assert url_for("static", filename="css/site.css") == "/static/" + url
+        assert url_for("static", filename="unknown.css") == "/static/unknown.css"
+
+
+def test_bundle_name_changes_with_content(app_instance, tmp_path, monkeypatch):
+    static = tmp_path / "static"
+    (static / "css").mkdir(parents=True)
+    for name in ("nav", "footer", "index"):
+        (static / "css" / (name + ".css")).write_text(".%s { color: red; }" % name)
+    monkeypatch.setattr(app_instance, "static_folder", str(static))
+    monkeypatch.setattr(assets, "_manifest", {})
+    monkeypatch.setattr(assets, "_critical", {})
+
+    first = assets.build(app_instance)["css/site.css"]
+    (static / "css" / "index.css").write_text(".index { color: blue; }")
+    second = assets.build(app_instance)["css/site.css"]
+
+    assert first != second
+    with open(str(static / second)) as bundle:
+        assert bundle.read() == ".nav{color:red}.footer{color:red}.index{color:blue}"
+
+
+def test_pages_inline_critical_css_and_load_the_bundle(client, app_instance):
+    from tests.test_main import seed_content
+    with app_instance.app_context():
+        seed_content()
+
+    html = client.get("/").get_data(as_text=True)
+    assert "<style>.nav-sporty{" in html
+    assert ".hero-pitch{" in html
+    assert 'href="/static/{}" as="style"'.format(assets.asset_url("css/site.css")) in html
+    assert "css/index.css" not in html
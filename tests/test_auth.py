@@ -283,6 +283,33 @@ def test_trivia_crud_flow(client, app_instance):
         assert TriviaModel.query.get(trivia_id) is None
 
 
+def test_content_version_is_bumped_after_the_related_lists(client, app_instance, monkeypatch):
+    from app import related
+    from app.cache import content_version
+
+    _login_as_admin(client, app_instance)
+    seen = []
+    refresh = related.refresh
+
+    def recording_refresh(kind, item_id):
+        refresh(kind, item_id)
+        seen.append(content_version())
+
+    monkeypatch.setattr(related, "refresh", recording_refresh)
+    trivia_data = {"header": "Trivia", "body": "Facts", "tags": "tag", "date": "2024-01-01"}
+    client.post("/auth/writetrivias", data=trivia_data)
+    with app_instance.app_context():
+        from app.models import Trivia as TriviaModel
+
+        trivia_id = TriviaModel.query.filter_by(header="Trivia").first().id
+    client.post(f"/auth/edittrivias/{trivia_id}", data=dict(trivia_data, body="More facts"))
+    client.get(f"/auth/deletetrivias/{trivia_id}")
+
+    versions = seen + [content_version()]
+    assert len(seen) == 3
+    assert all(before < after for before, after in zip(versions, versions[1:]))
+
+
 def test_form_show_helpers(app_instance):
     with app_instance.test_request_context("/"):
         poster_form = PosterEditForm(
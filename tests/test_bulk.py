@@ -0,0 +1,104 @@
+import os
+from datetime import datetime
+import pytest
+from app import db, bulk, storage
+from app.cache import content_version
+from app.models import Post, PostType, PostView, Trivia
+from tests.test_api import _token
+from tests.test_auth import _login_as_admin
+
+
+def _posters(root, count):
+    ids = []
+    for i in range(count):
+        post = Post(header="Poster {:d}".format(i), body="b", tags="old", post_type=PostType.POSTER)
+        db.session.add(post)
+        db.session.commit()
+        post.doc = os.path.join(root, "{}{:d}.png".format(storage.FILE_PREFIX, post.id))
+        with open(post.doc, "wb") as handle:
+            handle.write(b"poster")
+        db.session.add(PostView(post_id=post.id, views=1))
+        db.session.commit()
+        ids.append(post.id)
+    return ids
+
+
+def test_bulk_delete_is_one_transaction_and_one_bump(app_instance, tmp_path):
+    with app_instance.app_context():
+        ids = _posters(str(tmp_path), 3)
+        version = content_version()
+
+        assert bulk.apply("posters", "delete", ids[:2]) == 2
+        bulk.drain()
+
+        assert content_version() == version + 1
+        assert [p.id for p in Post.query.all()] == ids[2:]
+        assert [v.post_id for v in PostView.query.all()] == ids[2:]
+        assert sorted(os.listdir(str(tmp_path))) == ["{}{:d}.png".format(storage.FILE_PREFIX, ids[2])]
+
+
+def test_bulk_retag_and_change_type(app_instance, tmp_path):
+    with app_instance.app_context():
+        ids = _posters(str(tmp_path), 2)
+        db.session.add(Trivia(header="T", body="b", tags="old", date=datetime(2024, 1, 1),
+                              post_type=PostType.TRIVIA))
+        db.session.commit()
+
+        assert bulk.apply("posters", "retag", ids, tags=" ucl ") == 2
+        assert bulk.apply("trivias", "retag", [1], tags="ucl") == 1
+        assert {p.tags for p in Post.query.all()} | {t.tags for t in Trivia.query.all()} == {"ucl"}
+
+        assert bulk.apply("posters", "change_type", ids[:1], post_type=PostType.BLOG) == 1
+        assert db.session.get(Post, ids[0]).post_type == PostType.BLOG
+
+
+@pytest.mark.parametrize("kind, action, ids, options", [
+    ("posters", "explode", [1], {}),
+    ("videos", "delete", [1], {}),
+    ("posters", "delete", [], {}),
+    ("posters", "retag", [1], {"tags": " "}),
+    ("trivias", "change_type", [1], {"post_type": PostType.POSTER}),
+    ("posters", "delete", ["x"], {}),
+])
+def test_invalid_batches_write_nothing(app_instance, tmp_path, kind, action, ids, options):
+    with app_instance.app_context():
+        _posters(str(tmp_path), 1)
+        version = content_version()
+        with pytest.raises(bulk.BulkError):
+            bulk.apply(kind, action, ids, **options)
+        assert Post.query.count() == 1
+        assert content_version() == version
+
+
+def test_bulk_admin_view(client, app_instance, tmp_path):
+    _login_as_admin(client, app_instance)
+    with app_instance.app_context():
+        ids = _posters(str(tmp_path), 3)
+
+    listing = client.get("/auth/bulk")
+    assert listing.status_code == 200
+    assert b"Poster 2" in listing.data
+
+    response = client.post("/auth/bulk?kind=posters",
+                           data={"action": "retag", "tags": "derby", "post_type": PostType.POSTER,
+                                 "ids": [str(i) for i in ids[:2]]})
+    assert response.status_code == 302
+    with app_instance.app_context():
+        assert [p.tags for p in Post.query.order_by(Post.id)] == ["derby", "derby", "old"]
+
+
+def test_bulk_api(client, app_instance, tmp_path):
+    token = _token(app_instance)
+    headers = {"Authorization": "Bearer " + token}
+    with app_instance.app_context():
+        ids = _posters(str(tmp_path), 2)
+
+    response = client.post("/api/v1/bulk", json={"kind": "posters", "action": "delete", "ids": ids},
+                           headers=headers)
+    assert response.get_json() == {"changed": 2}
+    bulk.drain()
+    assert os.listdir(str(tmp_path)) == []
+
+    assert client.post("/api/v1/bulk", json={"kind": "posters", "action": "delete", "ids": "1"},
+                       headers=headers).status_code == 400
+    assert client.post("/api/v1/bulk", json={"kind": "posters", "action": "delete", "ids": [1]}).status_code == 401
@@ -0,0 +1,63 @@
+import multiprocessing
+import pytest
+from app.cache import SqliteCache, SimpleCache, make_backend, cache, content_version, bump_content_version
+
+
+def test_sqlite_cache_roundtrip_ttl_and_eviction(tmp_path, monkeypatch):
+    store = SqliteCache(str(tmp_path / "cache.sqlite"), max_items=2)
+    monkeypatch.setattr(SqliteCache, "_PRUNE_EVERY", 1)
+
+    store.set("a", {"body": b"x"})
+    assert store.get("a") == {"body": b"x"}
+    assert store.get("missing") is None
+
+    store.set("expired", 1, ttl=-1)
+    assert store.get("expired") is None
+
+    store.set("b", 2)
+    store.set("c", 3)
+    assert store.get("a") is None
+    assert (store.get("b"), store.get("c")) == (2, 3)
+
+    store.clear()
+    assert store.get("b") is None
+
+
+def _bump_in_child(path, queue):
+    store = SqliteCache(path)
+    store.set("from-child", "hello")
+    queue.put(store.incr("version", 100))
+
+
+def test_sqlite_cache_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    store = SqliteCache(path)
+    assert store.counter("version", 100) == 100
+
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    child = context.Process(target=_bump_in_child, args=(path, queue))
+    child.start()
+    child.join(10)
+
+    assert queue.get(timeout=1) == 101
+    assert store.counter("version", 100) == 101
+    assert store.get("from-child") == "hello"
+
+
+def test_backend_selection(app_instance):
+    config = dict(app_instance.config)
+    assert isinstance(make_backend(dict(config, CACHE_BACKEND="auto")), SqliteCache)
+    assert isinstance(make_backend(dict(config, CACHE_BACKEND="local")), SimpleCache)
+    with pytest.raises(ValueError):
+        make_backend(dict(config, CACHE_BACKEND="memcached"))
+
+
+def test_content_version_bumps_are_visible_to_a_fresh_backend(app_instance):
+    before = content_version()
+    assert bump_content_version() == before + 1
+
+    # What another worker sees: its own connection to the same store.
+    other = SqliteCache(app_instance.config["CACHE_PATH"])
+    assert other.counter("content_version", 0) == before + 1
+    assert isinstance(cache.backend, SqliteCache)
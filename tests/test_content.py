@@ -0,0 +1,172 @@
+from datetime import datetime
+from sqlalchemy import update
+from app import db, content
+from app.cache import content_version
+from app.ingest import validate_trivias
+from app.models import BodyFormat, Post, PostType, Trivia
+from tests.test_auth import _login_as_admin
+
+
+def test_markdown_is_rendered_and_sanitised():
+    html = content.render("# Derby\n\nA *late* [goal](javascript:alert(1))<script>x()</script>")
+    assert "<h1>Derby</h1>" in html
+    assert "<em>late</em>" in html
+    assert "javascript" not in html and "<script" not in html
+
+
+def test_legacy_html_is_only_sanitised():
+    html = content.render('<div onclick="x()">    <b>kept</b>\n\n    as html</div>', BodyFormat.HTML)
+    assert html == "<div>    <b>kept</b>\n\n    as html</div>"
+    assert content.render("<b>a</b> *b*", BodyFormat.HTML) == "<b>a</b> *b*"
+
+
+def test_markdown_that_starts_with_html_is_rendered(app_instance):
+    with app_instance.app_context():
+        trivia = Trivia(header="T", body="<kbd>Esc</kbd> ends the *match*", tags="t",
+                        date=datetime(2024, 1, 1), post_type=PostType.TRIVIA)
+        db.session.add(trivia)
+        db.session.commit()
+        assert trivia.body_format == BodyFormat.MARKDOWN
+        assert trivia.body_html == "<p><kbd>Esc</kbd> ends the <em>match</em></p>"
+
+
+def test_body_format_is_honoured_in_any_order(app_instance):
+    with app_instance.app_context():
+        first = Post(header="P", body="<b>a</b> *b*", body_format=BodyFormat.HTML)
+        second = Post(header="P", body_format=BodyFormat.HTML, body="<b>a</b> *b*")
+        db.session.add_all([first, second])
+        db.session.commit()
+        assert first.body_html == second.body_html == "<b>a</b> *b*"
+
+        first.body_format = BodyFormat.MARKDOWN
+        db.session.commit()
+        assert db.session.get(Post, first.id).body_html == "<p><b>a</b> <em>b</em></p>"
+
+
+def test_backfill_classifies_rows_from_before_body_format(app_instance):
+    with app_instance.app_context():
+        legacy = Post(header="P", body="<p>old</p> *kept*", body_format=BodyFormat.HTML)
+        new = Post(header="P", body="*new*")
+        db.session.add_all([legacy, new])
+        db.session.commit()
+        db.session.execute(update(Post).values(body_format=None, body_html=None))
+        db.session.commit()
+        db.session.expire_all()
+
+        assert content.backfill() == 2
+        assert content.backfill() == 0
+        legacy, new = db.session.get(Post, legacy.id), db.session.get(Post, new.id)
+        assert (legacy.body_format, legacy.body_html) == (BodyFormat.HTML, "<p>old</p> *kept*")
+        assert (new.body_format, new.body_html) == (BodyFormat.MARKDOWN, "<p><em>new</em></p>")
+
+        # an edit keeps the stored format, whatever the new body starts with.
+        new.body = "<kbd>x</kbd> *y*"
+        legacy.body = "plain *text*"
+        db.session.commit()
+        assert new.body_html == "<p><kbd>x</kbd> <em>y</em></p>"
+        assert legacy.body_html == "plain *text*"
+
+
+def test_unclassified_rows_are_classified_when_edited(app_instance):
+    with app_instance.app_context():
+        post = Post(header="P", body="x")
+        db.session.add(post)
+        db.session.commit()
+        db.session.execute(update(Post).values(body_format=None))
+        db.session.commit()
+        db.session.expire_all()
+
+        post = db.session.get(Post, post.id)
+        post.body = "<p>old</p> *kept*"
+        db.session.commit()
+        db.session.expire_all()
+        post = db.session.get(Post, post.id)
+        assert (post.body_format, post.body_html) == (BodyFormat.HTML, "<p>old</p> *kept*")
+
+
+def test_excerpt_and_reading_time():
+    fields = content.fields("**Bold** start. " + "word " * 450)
+    assert fields["excerpt"].startswith("Bold start. word")
+    assert len(fields["excerpt"]) <= content.EXCERPT_LENGTH
+    assert fields["excerpt"].endswith("…")
+    assert fields["reading_time"] == 3
+    assert content.fields("")["reading_time"] == 1
+
+
+def test_setting_body_stores_the_derived_columns(app_instance):
+    with app_instance.app_context():
+        trivia = Trivia(header="T", body="Won *5-0*", tags="t", date=datetime(2024, 1, 1),
+                        post_type=PostType.TRIVIA)
+        db.session.add(trivia)
+        db.session.commit()
+        assert trivia.body_html == "<p>Won <em>5-0</em></p>"
+        assert trivia.excerpt == "Won 5-0"
+
+        trivia.body = "Lost"
+        db.session.commit()
+        assert db.session.get(Trivia, trivia.id).excerpt == "Lost"
+
+
+def test_views_serve_the_stored_html(client, app_instance):
+    _login_as_admin(client, app_instance)
+    response = client.post("/auth/writetrivias", data={
+        "header": "Trivia", "body": "First **final**", "tags": "tag", "date": "2024-01-01",
+    })
+    assert response.status_code == 302
+
+    with app_instance.app_context():
+        trivia = Trivia.query.filter_by(header="Trivia").one()
+        assert (trivia.excerpt, trivia.reading_time) == ("First final", 1)
+    page = client.get("/trivia/{:d}/Trivia".format(trivia.id))
+    assert b"First <strong>final</strong>" in page.data
+    assert b'content="First final"' in page.data
+
+
+def test_ingested_rows_are_rendered(app_instance):
+    with app_instance.test_request_context():
+        rows, errors = validate_trivias([{"header": "T", "body": "_x_", "tags": "t", "date": "2024-01-01"}])
+    assert errors == []
+    assert rows[0]["body_html"] == "<p><em>x</em></p>"
+    assert rows[0]["body_format"] == BodyFormat.MARKDOWN
+
+
+def test_backfill_renders_in_parallel(app_instance):
+    with app_instance.app_context():
+        db.session.add_all(
+            [Post(header="P", body="*p{:d}*".format(i), post_type=PostType.POSTER) for i in range(5)]
+        )
+        db.session.commit()
+        db.session.execute(update(Post).values(body_html=None, excerpt=None, reading_time=None))
+        db.session.commit()
+        version = content_version()
+
+        assert content.backfill(batch=2, workers=2) == 5
+        assert content.backfill(batch=2, workers=2) == 0
+        assert content_version() == version + 1
+        assert sorted(p.body_html for p in Post.query.all()) == ["<p><em>p{:d}</em></p>".format(i) for i in range(5)]
+
+
+def test_legacy_embeds_and_layout_survive():
+    html = content.render(
+        '<p class="lead" style="color: red; position: fixed">Kick-off</p>'
+        '<iframe width="560" src="https://www.youtube.com/embed/abc" allowfullscreen></iframe>'
+        '<iframe src="https://evil.example/embed"></iframe>'
+        '<blockquote class="twitter-tweet"><p>Goal</p></blockquote>'
+        '<script async src="https://platform.twitter.com/widgets.js"></script>',
+        BodyFormat.HTML,
+    )
+    assert '<p class="lead" style="color:red">Kick-off</p>' in html
+    assert '<iframe width="560" src="https://www.youtube.com/embed/abc"' in html
+    assert "evil.example" not in html
+    assert '<blockquote class="twitter-tweet"><p>Goal</p></blockquote>' in html
+    assert "<script" not in html
+
+
+def test_tweets_load_the_widget_script(client, app_instance):
+    with app_instance.app_context():
+        trivia = Trivia(header="T", body='<blockquote class="twitter-tweet">x</blockquote>', tags="t",
+                        date=datetime(2024, 1, 1), post_type=PostType.TRIVIA)
+        db.session.add(trivia)
+        db.session.commit()
+        trivia_id = trivia.id
+    assert b"platform.twitter.com/widgets.js" in client.get("/trivia/{:d}/T".format(trivia_id)).data
@@ -0,0 +1,64 @@
+import os
+from sqlalchemy import create_engine, text
+from app import db
+from app.database import ensure_sqlite_dir
+from app.config import database_url, engine_options
+
+
+def test_database_url_from_environment(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    assert database_url("sqlite:////tmp/x.sqlite") == "sqlite:////tmp/x.sqlite"
+
+    monkeypatch.setenv("DATABASE_URL", "postgres://u:p@db/tactification")
+    assert database_url("sqlite:////tmp/x.sqlite") == "postgresql://u:p@db/tactification"
+
+
+def test_sqlite_directory_is_created(tmp_path):
+    ensure_sqlite_dir("sqlite:///" + str(tmp_path / "state" / "db.sqlite"))
+    assert (tmp_path / "state").is_dir()
+    ensure_sqlite_dir("sqlite://")
+    ensure_sqlite_dir("postgresql://u:p@db/tactification")
+
+
+def test_default_database_is_outside_the_package():
+    from app import config
+
+    assert not config.Config.DATABASE_PATH.startswith(config.basedir + os.sep)
+
+
+def test_postgres_pool_options(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "2")
+    options = engine_options("postgresql://u:p@db/tactification")
+    assert options["pool_size"] == 3
+    assert options["max_overflow"] == 2
+    assert options["pool_pre_ping"] is True
+    assert "pool_size" not in engine_options("sqlite:////tmp/x.sqlite")
+
+
+def test_forked_child_gets_a_fresh_pool(app_instance):
+    with app_instance.app_context():
+        pool = db.engine.pool
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            fresh = db.engine.pool is not pool
+            os.write(write, b"1" if fresh else b"0")
+            os._exit(0)
+        os.close(write)
+        os.waitpid(pid, 0)
+        assert os.read(read, 1) == b"1"
+        assert db.engine.pool is pool
+        os.close(read)
+
+
+def test_connection_setup_is_limited_to_the_app_engine(app_instance, tmp_path):
+    with app_instance.app_context():
+        if db.engine.dialect.name == "sqlite":
+            with db.engine.connect() as connection:
+                assert connection.execute(text("SELECT power(2, 3)")).scalar() == 8
+
+    other = create_engine("sqlite:///" + str(tmp_path / "other.sqlite"))
+    with other.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+    other.dispose()
@@ -0,0 +1,38 @@
+import re
+import pytest
+from sqlalchemy import event
+from app import db
+from tests.test_main import seed_content
+
+HEAVY = re.compile(r"\b(posts\.body|posts\.body_html|posts\.description|trivias\.body|trivias\.body_html)\b")
+
+
+def _heavy_columns(app_instance, client, url):
+    selected = set()
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selected.update(HEAVY.findall(statement))
+
+    with app_instance.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", collect)
+    try:
+        assert client.get(url).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", collect)
+    return selected
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("/", set()),
+    ("/postindex", set()),
+    ("/triviasindex", set()),
+    ("/sitemap.xml", set()),
+    ("/post/1/Header", {"posts.body_html"}),
+    ("/trivia/1/Trivia", {"trivias.body_html"}),
+])
+def test_only_detail_views_load_text_columns(client, app_instance, url, expected):
+    with app_instance.app_context():
+        seed_content()
+    assert _heavy_columns(app_instance, client, url) == expected
@@ -0,0 +1,105 @@
+import gzip
+from datetime import datetime
+from xml.etree import ElementTree
+from flask import g
+from app import db
+from app.cache import bump_content_version
+from app.models import Post, PostType, Trivia
+from tests.test_main import seed_content
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+def test_atom_and_rss_feeds(client, app_instance):
+    with app_instance.app_context():
+        seed_content()
+
+    atom = client.get("/feeds/posters.atom")
+    assert atom.status_code == 200
+    assert atom.mimetype == "application/atom+xml"
+    titles = [e.text for e in ElementTree.fromstring(atom.data).iter(ATOM + "title")]
+    assert "Header" in titles
+
+    rss = client.get("/feeds/trivias.rss")
+    assert rss.mimetype == "application/rss+xml"
+    assert [e.text for e in ElementTree.fromstring(rss.data).iter("title")][1] == "Trivia"
+
+    assert client.get("/feeds/posters.json").status_code == 404
+
+
+def test_tag_feed_mixes_posters_and_trivias(client, app_instance):
+    with app_instance.app_context():
+        seed_content()
+
+    feed = ElementTree.fromstring(client.get("/feeds/tags/TAG.atom").data)
+    titles = [e.find(ATOM + "title").text for e in feed.iter(ATOM + "entry")]
+    assert titles == ["Trivia", "Header"]
+
+    empty = ElementTree.fromstring(client.get("/feeds/tags/ta.atom").data)
+    assert list(empty.iter(ATOM + "entry")) == []
+
+
+def test_unchanged_feed_is_a_304_without_queries(client, app_instance):
+    with app_instance.app_context():
+        seed_content()
+
+    first = client.get("/feeds/posters.atom")
+    etag = first.headers["ETag"].strip('"')
+
+    with app_instance.test_client() as fresh:
+        cached = fresh.get("/feeds/posters.atom", headers={"If-None-Match": '"{}"'.format(etag)})
+        assert cached.status_code == 304
+        assert g.sql_count == 0
+
+    bump_content_version()
+    changed = client.get("/feeds/posters.atom", headers={"If-None-Match": '"{}"'.format(etag)})
+    assert changed.status_code == 200
+
+
+def test_gzip_feed(client, app_instance):
+    with app_instance.app_context():
+        seed_content()
+
+    plain = client.get("/feeds/posters.rss")
+    compressed = client.get("/feeds/posters.rss", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+
+
+def test_tag_feed_matches_whole_tags_before_the_limit(client, app_instance, monkeypatch):
+    monkeypatch.setitem(app_instance.config, "FEED_SIZE", 2)
+    with app_instance.app_context():
+        db.session.add_all([
+            Post(header="Near miss {:d}".format(i), body="b", tags="derby2, a_b", post_type=PostType.POSTER,
+                 timestamp=datetime(2024, 2, i + 1))
+            for i in range(3)
+        ] + [
+            Post(header="Derby", body="b", tags="Final, DERBY ", post_type=PostType.POSTER,
+                 timestamp=datetime(2024, 1, 1)),
+            Post(header="Wildcards", body="b", tags="100%", post_type=PostType.POSTER,
+                 timestamp=datetime(2024, 1, 2)),
+        ])
+        db.session.commit()
+
+    def titles(tag):
+        feed = ElementTree.fromstring(client.get("/feeds/tags/{}.atom".format(tag)).data)
+        return [e.find(ATOM + "title").text for e in feed.iter(ATOM + "entry")]
+
+    # The three newer "derby2" posters no longer fill the limit.
+    assert titles("derby") == ["Derby"]
+    assert titles("axb") == []
+    assert titles("a_b")[0].startswith("Near miss")
+    assert titles("100%25") == ["Wildcards"]
+    assert titles("1%25") == []
+
+
+def test_tag_feed_with_an_undated_trivia(client, app_instance):
+    with app_instance.app_context():
+        seed_content()
+        db.session.add(Trivia(header="Undated", body="b", tags="tag", post_type=PostType.TRIVIA, date=None))
+        db.session.commit()
+
+    response = client.get("/feeds/tags/tag.atom")
+    assert response.status_code == 200
+    feed = ElementTree.fromstring(response.data)
+    assert [e.find(ATOM + "title").text for e in feed.iter(ATOM + "entry")] == ["Trivia", "Header", "Undated"]
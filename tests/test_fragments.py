@@ -0,0 +1,41 @@
+from flask import g
+from app.cache import SimpleCache, bump_content_version
+from app.metrics import CACHE_REQUESTS
+from tests.test_main import seed_content
+
+TEMPLATE = '{% cache "card:" ~ id, 60 %}<b>{{ renders() }}</b>{% endcache %}'
+
+
+def test_fragment_is_cached_until_the_content_version_moves(app_instance, monkeypatch):
+    monkeypatch.setattr(app_instance.jinja_env, "fragment_cache", SimpleCache())
+    calls = []
+
+    def renders():
+        calls.append(1)
+        return len(calls)
+
+    template = app_instance.jinja_env.from_string(TEMPLATE)
+    hits = CACHE_REQUESTS.labels(cache="fragment:card", result="hit")
+    before = hits._value.get()
+    with app_instance.app_context():
+        assert template.render(id=1, renders=renders) == "<b>1</b>"
+        assert template.render(id=1, renders=renders) == "<b>1</b>"
+        assert template.render(id=2, renders=renders) == "<b>2</b>"
+        bump_content_version()
+        assert template.render(id=1, renders=renders) == "<b>3</b>"
+    assert hits._value.get() == before + 1
+
+
+def test_cached_related_fragment_skips_its_queries(client, app_instance):
+    with app_instance.app_context():
+        post, _ = seed_content()
+        url = "/post/{:d}/{}".format(post.id, post.header)
+
+    with app_instance.test_client() as first:
+        first.get(url)
+        cold = g.sql_count
+    with app_instance.test_client() as second:
+        page = second.get(url)
+        warm = g.sql_count
+    assert b"More Posts" in page.data
+    assert warm < cold
@@ -0,0 +1,47 @@
+import pytest
+from app import db, assets
+from app.hints import BOOTSTRAP_CSS
+from tests.test_main import seed_content
+
+HERO = "/download_file/{id}/tactification_{id}hero.webp"
+
+
+@pytest.fixture
+def seeded(app_instance):
+    with app_instance.app_context():
+        post, trivia = seed_content()
+        post.url = HERO.format(id=post.id)
+        db.session.commit()
+        return {"post": post.id, "trivia": trivia.id}
+
+
+def _links(response):
+    return [link.strip() for link in response.headers.get("Link", "").split(",") if link.strip()]
+
+
+@pytest.mark.parametrize("path, hero", [
+    ("/", True),
+    ("/post/{post}/Header", True),
+    ("/trivia/{trivia}/Trivia", False),
+    ("/postindex", False),
+    ("/aboutme", False),
+])
+def test_html_routes_preload_css_and_hero(client, seeded, path, hero):
+    response = client.get(path.format(**seeded))
+    assert response.status_code == 200
+    links = _links(response)
+
+    bundle = "</static/{}>; rel=preload; as=style".format(assets.asset_url("css/site.css"))
+    assert links[:2] == [bundle, "<{}>; rel=preload; as=style".format(BOOTSTRAP_CSS)]
+    hero_link = "<{}>; rel=preload; as=image; fetchpriority=high".format(HERO.format(id=seeded["post"]))
+    assert (hero_link in links) is hero
+
+
+@pytest.mark.parametrize("path", [
+    "/feeds/posters.atom",
+    "/api/v1/posters",
+    "/sitemap.xml",
+    "/post/999/missing",
+])
+def test_other_responses_have_no_preloads(client, seeded, path):
+    assert "Link" not in client.get(path).headers
@@ -0,0 +1,86 @@
+import json
+import logging
+from app import logconfig
+from app.models import Permission
+from tests.test_models import create_user
+
+
+def _record(name="app", level=logging.INFO, msg="hello"):
+    return logging.LogRecord(name, level, __file__, 1, msg, None, None)
+
+
+def test_json_formatter_includes_request_fields(app_instance):
+    handler_filter = logconfig.RequestContextFilter()
+    with app_instance.test_request_context("/aboutme", headers={"X-Request-ID": "abc"}):
+        app_instance.preprocess_request()
+        record = _record()
+        handler_filter.filter(record)
+
+    entry = json.loads(logconfig.JsonFormatter().format(record))
+    assert entry["message"] == "hello"
+    assert entry["request_id"] == "abc"
+    assert entry["endpoint"] == "main.aboutme"
+    assert entry["duration_ms"] >= 0
+
+
+def test_sampling_filter_only_samples_info():
+    sampler = logconfig.SamplingFilter({"app": 0.0})
+    assert sampler.filter(_record()) is False
+    assert sampler.filter(_record(level=logging.WARNING)) is True
+    assert sampler.filter(_record(name="other")) is True
+
+
+def test_full_queue_drops_instead_of_blocking():
+    import queue
+
+    handler = logconfig.DroppingQueueHandler(queue.Queue(maxsize=1))
+    handler.emit(_record())
+    handler.emit(_record())
+    assert handler.dropped == 1
+
+
+def test_request_id_is_echoed(client):
+    response = client.get("/aboutme", headers={"X-Request-ID": "req-1"})
+    assert response.headers["X-Request-ID"] == "req-1"
+    assert client.get("/aboutme").headers["X-Request-ID"]
+
+
+def test_can_does_not_print(app_instance, capsys):
+    with app_instance.app_context():
+        user = create_user("quiet@example.com", "User")
+        user.can(Permission.COMMENT)
+    assert capsys.readouterr().out == ""
+
+
+def test_forked_worker_starts_its_listener_on_the_same_queue():
+    import os
+
+    logconfig._start_listener()
+    queue = logconfig._handler.queue
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        started = logconfig._listener["pid"] == os.getpid()
+        kept = logconfig._handler.queue is queue
+        os.write(write, b"1" if started and kept else b"0")
+        os._exit(0)
+    os.close(write)
+    os.waitpid(pid, 0)
+    assert os.read(read, 1) == b"1"
+    os.close(read)
+
+
+def test_parent_records_are_not_written_again_by_a_worker():
+    record = _record()
+    assert logconfig.OwnRecordsFilter().filter(record) is True
+    record.process += 1
+    assert logconfig.OwnRecordsFilter().filter(record) is False
+
+
+def test_each_request_logs_its_total_duration(client, caplog):
+    with caplog.at_level(logging.INFO, logger="app.requests"):
+        client.get("/aboutme")
+    record = [r for r in caplog.records if r.name == "app.requests"][-1]
+    assert record.getMessage() == "GET /aboutme 200"
+    assert record.status == 200
+    assert record.duration_ms >= 0
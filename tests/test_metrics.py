@@ -0,0 +1,37 @@
+from tests.test_main import seed_content
+
+
+def test_server_timing_header(client, app_instance):
+    with app_instance.app_context():
+        seed_content()
+
+    response = client.get("/")
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    assert "db;" in timing
+    assert "render;dur=" in timing
+    assert "total;dur=" in timing
+
+
+def test_metrics_endpoint_exports_prometheus_text(client, app_instance):
+    with app_instance.app_context():
+        seed_content()
+
+    client.get("/")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.data.decode()
+    assert 'tactification_request_latency_seconds_count{endpoint="main.index"' in body
+    assert 'tactification_sql_queries_per_request_count{endpoint="main.index"}' in body
+    assert 'tactification_template_render_seconds_count{template="index.html"}' in body
+
+
+def test_record_cache_counts_hits_and_misses(app_instance):
+    from app.metrics import CACHE_REQUESTS, record_cache
+
+    hits = CACHE_REQUESTS.labels(cache="test", result="hit")
+    before = hits._value.get()
+    record_cache("test", True)
+    record_cache("test", False)
+    assert hits._value.get() == before + 1
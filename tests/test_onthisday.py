@@ -0,0 +1,86 @@
+from datetime import datetime
+from flask import g
+from sqlalchemy import update
+from app import db, onthisday
+from app.cache import bump_content_version
+from app.ingest import ingest
+from app.models import Trivia, PostType
+from tests.test_auth import _login_as_admin
+from tests.test_main import seed_content
+
+
+def _trivia(header, date):
+    trivia = Trivia(header=header, body="body", tags="tag", date=date, post_type=PostType.TRIVIA)
+    db.session.add(trivia)
+    db.session.commit()
+    return trivia
+
+
+def test_month_day_follows_date(client, app_instance):
+    _login_as_admin(client, app_instance)
+    client.post("/auth/writetrivias", data={"header": "Final", "body": "b", "tags": "t", "date": "1999-05-26"})
+    with app_instance.app_context():
+        trivia = Trivia.query.filter_by(header="Final").one()
+        assert trivia.month_day == "05-26"
+        trivia_id = trivia.id
+
+    client.post("/auth/edittrivias/{:d}".format(trivia_id),
+                data={"header": "Final", "body": "b", "tags": "t", "date": "2005-05-25"})
+    with app_instance.app_context():
+        assert db.session.get(Trivia, trivia_id).month_day == "05-25"
+
+
+def test_ingested_trivias_get_month_day(app_instance):
+    with app_instance.test_request_context():
+        ingest([{"header": "Bulk", "body": "b", "tags": "t", "date": "1966-07-30"}])
+        assert Trivia.query.filter_by(header="Bulk").one().month_day == "07-30"
+
+
+def test_onthisday_page_and_widget(client, app_instance):
+    now = datetime.now()
+    with app_instance.app_context():
+        seed_content()
+        _trivia("Then", now.replace(year=1972))
+        _trivia("Earlier", now.replace(year=1956))
+        _trivia("Other day", datetime(1972, now.month % 12 + 1, 15))
+
+    page = client.get("/onthisday")
+    assert page.status_code == 200
+    text = page.get_data(as_text=True)
+    assert text.index("Earlier") < text.index("Then")
+    assert "Other day" not in text
+
+    assert "1972: Then" in client.get("/").get_data(as_text=True)
+
+
+def test_onthisday_is_cached_until_content_changes(client, app_instance):
+    with app_instance.app_context():
+        _trivia("Then", datetime.now().replace(year=1972))
+
+    client.get("/onthisday")
+    with app_instance.test_client() as fresh:
+        fresh.get("/onthisday")
+        assert g.sql_count == 0
+
+    with app_instance.app_context():
+        _trivia("Later", datetime.now().replace(year=1980))
+    bump_content_version()
+    assert "Later" in client.get("/onthisday").get_data(as_text=True)
+
+
+def test_seconds_until_midnight():
+    assert onthisday.seconds_until_midnight(datetime(2024, 1, 1, 23, 59, 0)) == 60
+    assert onthisday.seconds_until_midnight(datetime(2024, 1, 1, 0, 0, 0)) == 24 * 3600
+
+
+def test_backfill_fills_missing_month_days(app_instance):
+    with app_instance.app_context():
+        first = _trivia("Old", datetime(1958, 6, 29)).id
+        second = _trivia("Older", datetime(1930, 7, 30)).id
+        db.session.execute(update(Trivia).values(month_day=None))
+        db.session.commit()
+
+        assert onthisday.backfill(batch=1) == 2
+        assert db.session.get(Trivia, first).month_day == "06-29"
+        assert db.session.get(Trivia, second).month_day == "07-30"
+        assert onthisday.backfill() == 0
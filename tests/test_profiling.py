@@ -0,0 +1,60 @@
+import os
+from app import profiling
+from tests.test_auth import _login_as_admin
+from tests.test_main import seed_content
+
+
+def _profile_dir(app_instance, tmp_path, monkeypatch):
+    monkeypatch.setitem(app_instance.config, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setitem(profiling._state, "rate", 0.0)
+    monkeypatch.setitem(profiling._state, "checked", 0.0)
+    return tmp_path
+
+
+def test_disabled_profiling_writes_nothing(client, app_instance, tmp_path, monkeypatch):
+    directory = _profile_dir(app_instance, tmp_path, monkeypatch)
+    with app_instance.app_context():
+        seed_content()
+
+    assert client.get("/").status_code == 200
+    assert list(directory.iterdir()) == []
+
+
+def test_signed_header_profiles_single_request(client, app_instance, tmp_path, monkeypatch):
+    directory = _profile_dir(app_instance, tmp_path, monkeypatch)
+    with app_instance.app_context():
+        seed_content()
+
+    token = profiling.request_token(app_instance)
+    client.get("/", headers={profiling.PROFILE_HEADER: "forged"})
+    assert list(directory.iterdir()) == []
+
+    client.get("/", headers={profiling.PROFILE_HEADER: token})
+    names = [path.name for path in directory.iterdir()]
+    assert len(names) == 1
+    assert names[0].startswith("main.index-")
+
+
+def test_sample_rate_and_bounded_directory(client, app_instance, tmp_path, monkeypatch):
+    directory = _profile_dir(app_instance, tmp_path, monkeypatch)
+    monkeypatch.setitem(app_instance.config, "PROFILE_MAX_FILES", 2)
+    profiling.set_sample_rate(app_instance, 1)
+
+    for _ in range(4):
+        client.get("/aboutme")
+    assert len([p for p in directory.iterdir() if p.suffix == ".pstats"]) == 2
+
+
+def test_profiling_page_is_admin_only(client, app_instance, tmp_path, monkeypatch):
+    _profile_dir(app_instance, tmp_path, monkeypatch)
+    assert client.get("/auth/profiling").status_code == 302
+
+    _login_as_admin(client, app_instance)
+    assert client.get("/auth/profiling").status_code == 200
+    assert client.post("/auth/profiling", data={"rate": "0.5"}).status_code == 302
+    assert profiling.sample_rate(app_instance) == 0.5
+    assert (tmp_path / "sample_rate").read_text() == "0.5"
+
+    for bad in ("nan", "inf", "-inf", "half"):
+        assert client.post("/auth/profiling", data={"rate": bad}).status_code == 400
+    assert profiling.sample_rate(app_instance) == 0.5
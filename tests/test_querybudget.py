@@ -0,0 +1,77 @@
+import io
+import pytest
+from app.querybudget import QueryBudgetExceeded, query_budget, budget_for
+from tests.test_auth import _login_as_admin
+from tests.test_main import seed_content
+
+
+def test_every_route_has_a_budget(app_instance):
+    budgets = app_instance.config["QUERY_BUDGETS"]
+    endpoints = {
+        rule.endpoint
+        for rule in app_instance.url_map.iter_rules()
+        if rule.endpoint.startswith(("main.", "auth.", "api."))
+    }
+    assert endpoints - set(budgets) == set()
+
+
+def test_decorator_overrides_config(app_instance):
+    @query_budget(7)
+    def view():
+        return "ok"
+
+    with app_instance.test_request_context("/"):
+        app_instance.view_functions["test.budget"] = view
+        try:
+            assert budget_for("test.budget") == 7
+        finally:
+            del app_instance.view_functions["test.budget"]
+
+
+def test_exceeding_budget_raises(client, app_instance, monkeypatch):
+    with app_instance.app_context():
+        seed_content()
+
+    monkeypatch.setitem(app_instance.config["QUERY_BUDGETS"], "main.index", 1)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/")
+
+
+def test_public_routes_within_budget(client, app_instance):
+    with app_instance.app_context():
+        post, trivia = seed_content()
+        post_id, trivia_id = post.id, trivia.id
+
+    for url in ["/", "/aboutme", "/postindex", "/triviasindex", "/videos",
+                f"/post/{post_id}/Header", f"/trivia/{trivia_id}/Trivia", "/sitemap.xml"]:
+        assert client.get(url).status_code == 200
+
+
+def test_auth_routes_within_budget(client, app_instance):
+    with app_instance.app_context():
+        post, trivia = seed_content()
+        post_id, trivia_id = post.id, trivia.id
+    _login_as_admin(client, app_instance)
+
+    # Logged-in pages pay for the session user on top of the view's queries.
+    for url in ["/", f"/post/{post_id}/Header", f"/trivia/{trivia_id}/Trivia", "/sitemap.xml",
+                "/auth/writeposters", f"/auth/editposters/{post_id}", "/auth/writetrivias",
+                f"/auth/edittrivias/{trivia_id}", "/auth/slowqueries"]:
+        assert client.get(url).status_code == 200
+
+    assert client.post(
+        "/auth/writeposters",
+        data={"header": "Poster", "desc": "Caption", "body": "Body", "tags": "tag",
+              "poster": (io.BytesIO(b"poster"), "poster.png")},
+        content_type="multipart/form-data",
+    ).status_code == 302
+    assert client.post(
+        "/auth/writetrivias",
+        data={"header": "T", "body": "B", "tags": "t", "date": "2024-01-01"},
+    ).status_code == 302
+    assert client.post(
+        f"/auth/edittrivias/{trivia_id}",
+        data={"header": "T2", "body": "B", "tags": "t", "date": "2024-01-01"},
+    ).status_code == 302
+    assert client.get(f"/auth/deletetrivias/{trivia_id}").status_code == 302
+    assert client.get("/auth/logout").status_code == 302
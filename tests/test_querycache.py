@@ -0,0 +1,62 @@
+from datetime import datetime
+from flask import g
+from sqlalchemy import update
+from app import db, querycache
+from app.models import Post, PostType, Trivia
+from tests.test_main import seed_content
+
+
+def test_index_queries_come_from_the_cache(client, app_instance):
+    with app_instance.app_context():
+        seed_content()
+
+    client.get("/")
+    with app_instance.test_client() as fresh:
+        assert b"Header" in fresh.get("/").data
+        assert g.sql_count == 0
+
+
+def test_orm_writes_invalidate_their_region_on_commit(client, app_instance):
+    with app_instance.app_context():
+        seed_content()
+    client.get("/")
+
+    # A script writing through the models, outside any view.
+    with app_instance.app_context():
+        posters, trivias = querycache.version("posters"), querycache.version("trivias")
+        db.session.add(Post(header="Fresh", body="b", post_type=PostType.POSTER,
+                            timestamp=datetime(2025, 1, 1)))
+        db.session.flush()
+        assert querycache.version("posters") == posters
+        db.session.commit()
+        assert querycache.version("posters") == posters + 1
+        assert querycache.version("trivias") == trivias
+
+    assert b"Fresh" in client.get("/").data
+
+
+def test_bulk_statements_invalidate_and_rollbacks_do_not(app_instance):
+    with app_instance.app_context():
+        seed_content()
+        trivias = querycache.version("trivias")
+        db.session.execute(update(Trivia).values(tags="ucl"))
+        db.session.commit()
+        assert querycache.version("trivias") == trivias + 1
+
+        db.session.execute(update(Trivia).values(tags="rolled back"))
+        db.session.rollback()
+        assert querycache.version("trivias") == trivias + 1
+
+
+def test_value_is_cached_per_region_version(app_instance):
+    calls = []
+
+    def creator():
+        calls.append(1)
+        return len(calls)
+
+    with app_instance.app_context():
+        assert querycache.value("posters", "k", creator) == 1
+        assert querycache.value("posters", "k", creator) == 1
+        querycache.invalidate("posters")
+        assert querycache.value("posters", "k", creator) == 2
@@ -0,0 +1,65 @@
+import os
+from app import db, storage
+from app.models import Post, PostType
+from app.reconcile import walk, reconcile
+
+
+def _post(doc, checksum=None):
+    post = Post(header="Header", body="body", description="desc", tags="tag",
+                post_type=PostType.POSTER, doc=doc, checksum=checksum)
+    db.session.add(post)
+    db.session.commit()
+    return post.id
+
+
+def _file(path, content=b"poster", age=0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as handle:
+        handle.write(content)
+    if age:
+        stamp = os.path.getmtime(path) - age
+        os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_walk_yields_files_in_full_path_order(tmp_path):
+    root = str(tmp_path)
+    paths = [
+        _file(os.path.join(root, "tactification_1.png")),
+        _file(os.path.join(root, "tactification_1", "tactification_2.png")),
+        _file(os.path.join(root, "ab", "cd", "tactification_3.png")),
+        _file(os.path.join(root, "a", "tactification_4.png")),
+    ]
+    _file(os.path.join(root, "tactification.data.sqlite"))
+
+    assert list(walk(root)) == sorted(paths)
+
+
+def test_reconcile_reports_and_reclaims(app_instance, tmp_path, monkeypatch):
+    monkeypatch.setitem(app_instance.config, "UPLOAD_FOLDER", str(tmp_path))
+    found = []
+    with app_instance.app_context():
+        good = _file(storage.path_for("tactification_1good.png"), b"good")
+        _post(good, storage.checksum(good))
+        bad = _file(storage.path_for("tactification_2bad.png"), b"changed")
+        bad_id = _post(bad, "0" * 64)
+        gone_id = _post(storage.path_for("tactification_3gone.png"))
+        unchecked = _file(storage.path_for("tactification_4new.png"), b"new")
+        unchecked_id = _post(unchecked)
+        old_orphan = _file(storage.path_for("tactification_5old.png"), b"x" * 10, age=7200)
+        new_orphan = _file(storage.path_for("tactification_6new.png"), b"y")
+
+        counts = reconcile(workers=2, reclaim=True, min_age=3600, record=True,
+                           report=lambda kind, path, ids: found.append((kind, path, ids)))
+
+        assert sorted(found) == sorted([
+            ("corrupt", bad, [bad_id]),
+            ("missing", storage.path_for("tactification_3gone.png"), [gone_id]),
+            ("orphan", old_orphan, []),
+            ("orphan", new_orphan, []),
+        ])
+        assert counts["reclaimed"] == 1 and counts["reclaimed_bytes"] == 10
+        assert not os.path.exists(old_orphan)
+        assert os.path.exists(new_orphan)
+        assert counts["recorded"] == 1
+        assert db.session.get(Post, unchecked_id).checksum == storage.checksum(unchecked)
@@ -0,0 +1,202 @@
+import os
+from datetime import datetime
+from app import bulk, db, related
+from app.models import Post, PostType, Trivia, RelatedItem
+
+
+def _poster(header, tags, body):
+    post = Post(header=header, description=header, tags=tags, body=body,
+                post_type=PostType.POSTER, timestamp=datetime(2024, 1, 1))
+    db.session.add(post)
+    db.session.commit()
+    return post.id
+
+
+def _seed():
+    return {
+        "cruyff": _poster("Cruyff and total football", "ajax,netherlands",
+                          "Total football at Ajax: every player could play every position."),
+        "ajax": _poster("Ajax of the seventies", "ajax,netherlands",
+                        "Michels built total football at Ajax around Cruyff."),
+        "catenaccio": _poster("Inter and catenaccio", "inter,italy",
+                              "Herrera's Inter defended deep with a libero behind the line."),
+        "libero": _poster("The libero in Italy", "italy,defence",
+                          "Catenaccio needs a libero sweeping behind the defensive line."),
+    }
+
+
+def test_top_k_orders_neighbours_by_similarity():
+    docs = [
+        related.tokens(["pressing high line"], [1]),
+        related.tokens(["high pressing game"], [1]),
+        related.tokens(["deep block counter"], [1]),
+    ]
+    matrix, vocabulary, idf = related.vectorize(docs)
+    neighbours, scores = related.top_k(matrix, 2, batch=2)
+
+    assert neighbours[0].tolist() == [1, 2]
+    assert neighbours[1][0] == 0
+    assert scores[0][0] > 0 and scores[0][1] == 0
+    assert "pressing" in vocabulary and len(idf) == len(vocabulary)
+
+
+def test_rebuild_stores_ranked_lists(app_instance):
+    with app_instance.app_context():
+        ids = _seed()
+        assert related.rebuild("posters") == 4
+
+        assert related.lookup(PostType.POSTER, ids["cruyff"], 3)[0] == ids["ajax"]
+        assert related.lookup(PostType.POSTER, ids["libero"], 3)[0] == ids["catenaccio"]
+        assert RelatedItem.query.count() == 4
+
+
+def test_post_page_shows_related_posters(client, app_instance):
+    with app_instance.app_context():
+        ids = _seed()
+        related.rebuild("posters")
+
+    response = client.get("/post/{:d}/Cruyff".format(ids["cruyff"]))
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    assert "Ajax of the seventies" in html
+    # Nothing in common with Cruyff, so it is not offered as related.
+    assert "Inter and catenaccio" not in html
+
+
+def test_update_adds_new_item_to_neighbour_lists(app_instance, monkeypatch):
+    monkeypatch.setitem(app_instance.config, "RELATED_TOP_K", 1)
+    with app_instance.app_context():
+        ids = _seed()
+        related.rebuild("posters")
+
+        new_id = _poster("Cruyff at Ajax", "ajax,netherlands,cruyff",
+                         "Cruyff and Michels: total football at Ajax.")
+        related.update("posters", new_id)
+
+        assert related.lookup(PostType.POSTER, new_id, 1)[0] in (ids["cruyff"], ids["ajax"])
+        assert related.lookup(PostType.POSTER, ids["cruyff"], 1) == [new_id]
+        assert related.lookup(PostType.POSTER, ids["libero"], 1) == [ids["catenaccio"]]
+
+
+def test_writing_a_trivia_builds_its_neighbours(app_instance):
+    with app_instance.app_context():
+        first = Trivia(header="Maracanazo", tags="brazil,uruguay", body="Uruguay won in 1950.",
+                       post_type=PostType.TRIVIA, date=datetime(2024, 1, 1))
+        second = Trivia(header="Uruguay 1950", tags="uruguay", body="Ghiggia scored the winner.",
+                        post_type=PostType.TRIVIA, date=datetime(2024, 1, 2))
+        db.session.add_all([first, second])
+        db.session.commit()
+
+        # No saved model yet: writes leave the fit to `flask rebuild-related`.
+        related.refresh("trivias", second.id)
+        assert related.load_model("trivias") is None
+        assert related.lookup(PostType.TRIVIA, first.id, 5) == []
+
+        related.rebuild("trivias")
+        third = Trivia(header="Ghiggia", tags="uruguay", body="Ghiggia silenced the Maracana in 1950.",
+                       post_type=PostType.TRIVIA, date=datetime(2024, 1, 3))
+        db.session.add(third)
+        db.session.commit()
+        related.refresh("trivias", third.id)
+        assert third.id in related.lookup(PostType.TRIVIA, second.id, 5)
+
+
+def test_concurrent_updates_are_both_kept(app_instance):
+    import threading
+
+    with app_instance.app_context():
+        ids = _seed()
+        related.rebuild("posters")
+        new_ids = [_poster("Cruyff {:d}".format(i), "ajax", "Total football at Ajax.") for i in range(2)]
+
+    def update(item_id):
+        with app_instance.app_context():
+            related.update("posters", item_id)
+
+    threads = [threading.Thread(target=update, args=(item_id,)) for item_id in new_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app_instance.app_context():
+        saved = set(related.load_model("posters").ids.tolist())
+    assert saved == set(ids.values()) | set(new_ids)
+
+
+def test_update_rescores_an_edited_item(app_instance):
+    with app_instance.app_context():
+        ids = _seed()
+        related.rebuild("posters")
+
+        post = db.session.get(Post, ids["libero"])
+        post.header, post.tags = "Ajax and Cruyff", "ajax,netherlands"
+        post.body = post.description = "Total football at Ajax."
+        db.session.commit()
+        related.update("posters", ids["libero"])
+
+        assert related.lookup(PostType.POSTER, ids["libero"], 3)[0] in (ids["cruyff"], ids["ajax"])
+        assert ids["catenaccio"] not in related.lookup(PostType.POSTER, ids["libero"], 3)
+
+
+def test_edits_made_during_a_rebuild_are_kept(app_instance, monkeypatch):
+    with app_instance.app_context():
+        ids = _seed()
+        related.rebuild("posters")
+        fit = related.top_k
+
+        def top_k_with_a_concurrent_write(*args, **kwargs):
+            # A write lands after the rebuild has read the corpus.
+            post = db.session.get(Post, ids["libero"])
+            post.header, post.tags = "Ajax and Cruyff", "ajax,netherlands"
+            post.body = post.description = "Total football at Ajax."
+            db.session.commit()
+            related.update("posters", ids["libero"])
+            return fit(*args, **kwargs)
+
+        monkeypatch.setattr(related, "top_k", top_k_with_a_concurrent_write)
+        related.rebuild("posters")
+
+        assert related.lookup(PostType.POSTER, ids["libero"], 3)[0] in (ids["cruyff"], ids["ajax"])
+
+
+def test_single_writes_are_journalled_not_saved_whole(app_instance, monkeypatch):
+    monkeypatch.setitem(app_instance.config, "RELATED_JOURNAL_MAX", 2)
+    with app_instance.app_context():
+        ids = _seed()
+        related.rebuild("posters")
+        path = related._model_path("posters")
+        saved = os.stat(path).st_mtime_ns
+
+        new_id = _poster("Cruyff at Ajax", "ajax,cruyff", "Cruyff and Michels at Ajax.")
+        related.update("posters", new_id)
+        assert os.stat(path).st_mtime_ns == saved
+        # Another worker replays the journal over the saved model.
+        related._models.clear()
+        assert new_id in related.load_model("posters").rows
+
+        for _ in range(2):
+            related.update("posters", new_id)
+        assert os.stat(related._journal_path("posters")).st_size == 0
+        related._models.clear()
+        model = related.load_model("posters")
+        assert model.matrix.shape[0] == len(ids) + 1 and not model.overlay
+
+
+def test_deleted_and_retyped_items_leave_the_lists(app_instance):
+    with app_instance.app_context():
+        ids = _seed()
+        related.rebuild("posters")
+        assert ids["ajax"] in related.lookup(PostType.POSTER, ids["cruyff"], 3)
+
+        db.session.delete(db.session.get(Post, ids["ajax"]))
+        db.session.commit()
+        related.refresh("posters", ids["ajax"])
+        assert ids["ajax"] not in related.lookup(PostType.POSTER, ids["cruyff"], 3)
+        assert db.session.get(RelatedItem, (PostType.POSTER, ids["ajax"])) is None
+        assert ids["ajax"] not in related.load_model("posters").rows
+
+        bulk.apply("posters", "change_type", [ids["catenaccio"]], post_type=PostType.BLOG)
+        assert ids["catenaccio"] not in related.lookup(PostType.POSTER, ids["libero"], 3)
+        bulk.apply("posters", "change_type", [ids["catenaccio"]], post_type=PostType.POSTER)
+        assert related.lookup(PostType.POSTER, ids["libero"], 3)[0] == ids["catenaccio"]
@@ -0,0 +1,104 @@
+import os
+import pytest
+from app import slowquery
+from tests.test_auth import _login_as_admin, create_user
+from tests.test_main import seed_content
+
+
+@pytest.fixture
+def slow_log(monkeypatch, tmp_path):
+    """
+    slow query logs under tmp_path, with every slow statement explained.
+    """
+    monkeypatch.setitem(slowquery._settings, "path", str(tmp_path / "slow.log"))
+    monkeypatch.setitem(slowquery._settings, "explain_interval", 0)
+    monkeypatch.setattr(slowquery, "_explained", {})
+    # restored with the rest when the test ends.
+    monkeypatch.setitem(slowquery._settings, "threshold", None)
+    return tmp_path / "slow.log"
+
+
+def test_fingerprint_ignores_literals_and_in_lists():
+    first, normalized = slowquery.fingerprint(
+        "SELECT * FROM posts WHERE id IN (?, ?, ?) AND header = 'a'"
+    )
+    second, _ = slowquery.fingerprint("SELECT *  FROM posts WHERE id IN (?) AND header = 'bb'")
+    assert first == second
+    assert "IN (...)" in normalized
+
+
+def test_parameter_shape_hides_values():
+    assert slowquery.parameter_shape((1, "x")) == ["int", "str"]
+    assert slowquery.parameter_shape({"id": 1}) == {"id": "int"}
+    assert slowquery.parameter_shape([(1,), (2,)], executemany=True) == {"rows": 2, "row": ["int"]}
+
+
+def test_slow_statements_are_recorded_with_plan(client, app_instance, slow_log):
+    with app_instance.app_context():
+        seed_content()
+
+    slowquery._settings["threshold"] = 0
+    client.get("/")
+    slowquery._settings["threshold"] = None
+
+    assert slowquery.log_files() == ["{}.{:d}".format(slow_log, os.getpid())]
+    statements = slowquery.aggregate()
+    index_statements = [s for s in statements if "main.index" in s["endpoints"]]
+    assert index_statements
+    assert any(s["plan"] for s in index_statements)
+
+
+def test_each_worker_writes_its_own_log(client, app_instance, slow_log):
+    with app_instance.app_context():
+        seed_content()
+
+    slowquery._settings["threshold"] = 0
+    client.get("/")
+    pid = os.fork()
+    if pid == 0:
+        client.get("/postindex")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    slowquery._settings["threshold"] = None
+
+    expected = ["{}.{:d}".format(slow_log, p) for p in (os.getpid(), pid)]
+    assert slowquery.log_files() == sorted(expected)
+    endpoints = set()
+    for statement in slowquery.aggregate():
+        endpoints.update(statement["endpoints"])
+    assert {"main.index", "main.postindex"} <= endpoints
+
+
+def test_explain_is_rate_limited_per_statement(client, app_instance, slow_log, monkeypatch):
+    with app_instance.app_context():
+        seed_content()
+    monkeypatch.setitem(slowquery._settings, "explain_interval", 3600)
+    explained = []
+    monkeypatch.setattr(slowquery, "explain", lambda *args: explained.append(args[2]) or ["plan"])
+
+    slowquery._settings["threshold"] = 0
+    client.get("/postindex")
+    client.get("/postindex?page=1")
+    slowquery._settings["threshold"] = None
+    assert explained
+    assert len(explained) == len({slowquery.fingerprint(s)[0] for s in explained})
+    assert sum(s["count"] for s in slowquery.aggregate()) > len(explained)
+
+    explained.clear()
+    slowquery._explained.clear()
+    monkeypatch.setitem(slowquery._settings, "explain_interval", None)
+    slowquery._settings["threshold"] = 0
+    client.get("/postindex?page=2")
+    slowquery._settings["threshold"] = None
+    assert explained == []
+
+
+def test_slowqueries_view_is_admin_only(client, app_instance, slow_log):
+    with app_instance.app_context():
+        create_user("user@example.com", "User")
+    client.post("/auth/login", data={"email": "user@example.com", "password": "secret"})
+    assert client.get("/auth/slowqueries").status_code == 403
+
+    client.get("/auth/logout")
+    _login_as_admin(client, app_instance)
+    assert client.get("/auth/slowqueries").status_code == 200
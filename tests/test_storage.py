@@ -0,0 +1,81 @@
+import os
+from app import db, storage
+from app.models import Post, PostType
+from app.storage import migrate_uploads
+
+
+def _flat_poster(root, name, content=b"poster"):
+    post = Post(header="Header", body="body", description="desc", tags="tag",
+                post_type=PostType.POSTER)
+    db.session.add(post)
+    db.session.commit()
+    filename = "tactification_{:d}{}".format(post.id, name)
+    post.doc = os.path.join(root, filename)
+    post.url = "/legacy/{}".format(filename)
+    with open(post.doc, "wb") as handle:
+        handle.write(content)
+    db.session.commit()
+    return post.id, filename
+
+
+def test_sharded_paths(app_instance, tmp_path, monkeypatch):
+    with app_instance.app_context():
+        path = storage.path_for("tactification_1poster.png", str(tmp_path))
+        shard = os.path.relpath(os.path.dirname(path), str(tmp_path))
+        assert len(shard.split(os.sep)) == 2
+        assert path == storage.path_for("tactification_1poster.png", str(tmp_path))
+
+        monkeypatch.setitem(app_instance.config, "UPLOAD_LAYOUT", "flat")
+        assert storage.path_for("a.png", str(tmp_path)) == os.path.join(str(tmp_path), "a.png")
+
+
+def test_download_file_finds_sharded_and_flat_files(client, app_instance, tmp_path, monkeypatch):
+    monkeypatch.setitem(app_instance.config, "UPLOAD_FOLDER", str(tmp_path))
+    with app_instance.app_context():
+        sharded = storage.path_for("new.txt")
+    os.makedirs(os.path.dirname(sharded))
+    with open(sharded, "w") as handle:
+        handle.write("sharded")
+    with open(os.path.join(str(tmp_path), "old.txt"), "w") as handle:
+        handle.write("flat")
+
+    assert client.get("/download_file/1/new.txt").data == b"sharded"
+    assert client.get("/download_file/2/old.txt").data == b"flat"
+    assert client.get("/download_file/3/none.txt").status_code == 404
+
+
+def test_migrate_uploads_moves_files_and_rewrites_rows(app_instance, tmp_path, monkeypatch):
+    monkeypatch.setitem(app_instance.config, "UPLOAD_FOLDER", str(tmp_path))
+    with app_instance.test_request_context():
+        first_id, first = _flat_poster(str(tmp_path), "a.png", b"first")
+        second_id, second = _flat_poster(str(tmp_path), "b.png", b"second")
+
+        # An earlier run moved the second file but died before committing.
+        target = storage.path_for(second)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(os.path.join(str(tmp_path), second), target)
+
+        assert migrate_uploads(workers=2, batch=1) == {"moved": 2, "missing": 0}
+
+        for post_id, filename, content in [(first_id, first, b"first"), (second_id, second, b"second")]:
+            post = db.session.get(Post, post_id)
+            assert post.doc == storage.path_for(filename)
+            assert post.url == "/download_file/{:d}/{}".format(post_id, filename)
+            with open(post.doc, "rb") as handle:
+                assert handle.read() == content
+        assert not os.path.exists(os.path.join(str(tmp_path), first))
+
+        # Nothing left to do, and no checkpoint left behind.
+        assert migrate_uploads() == {"moved": 0, "missing": 0}
+        assert not os.path.exists(os.path.join(str(tmp_path), storage.CHECKPOINT))
+
+
+def test_migrate_uploads_resumes_from_checkpoint(app_instance, tmp_path, monkeypatch):
+    monkeypatch.setitem(app_instance.config, "UPLOAD_FOLDER", str(tmp_path))
+    with app_instance.test_request_context():
+        first_id, first = _flat_poster(str(tmp_path), "a.png")
+        _flat_poster(str(tmp_path), "b.png")
+        storage._write_checkpoint(os.path.join(str(tmp_path), storage.CHECKPOINT), first_id)
+
+        assert migrate_uploads() == {"moved": 1, "missing": 0}
+        assert db.session.get(Post, first_id).doc == os.path.join(str(tmp_path), first)
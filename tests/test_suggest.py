@@ -0,0 +1,99 @@
+from sqlalchemy import update
+from app import db, suggest
+from app.models import Post, PostType, Trivia
+from tests.test_api import seed_posters
+
+
+def test_index_matches_word_prefixes_without_accents():
+    index = suggest.Index([
+        (0, 1, "Atlético's low block"),
+        (1, 2, "The Bernabéu comeback"),
+        (2, None, "Atletico"),
+    ])
+    assert index.search("atle") == [
+        {"kind": "tag", "text": "Atletico"},
+        {"kind": "poster", "text": "Atlético's low block", "id": 1},
+    ]
+    assert index.search("BLOCK") == [{"kind": "poster", "text": "Atlético's low block", "id": 1}]
+    assert index.search("bernabeu com") == [{"kind": "trivia", "text": "The Bernabéu comeback", "id": 2}]
+    assert index.search("zz") == []
+    assert len(index.search("t", limit=1)) == 1
+
+
+def test_suggest_endpoint(client, app_instance):
+    with app_instance.app_context():
+        seed_posters(3)
+
+    items = client.get("/api/v1/suggest?q=post").get_json()["items"]
+    assert [item["id"] for item in items] == [1, 2, 3]
+    tags = client.get("/api/v1/suggest?q=ta").get_json()["items"]
+    assert tags == [{"kind": "tag", "text": "tag"}]
+    assert client.get("/api/v1/suggest?q=").get_json()["items"] == []
+    assert client.get("/api/v1/suggest?q=post&limit=0").status_code == 400
+
+
+def test_writes_update_the_index_in_place(client, app_instance):
+    with app_instance.app_context():
+        seed_posters(1)
+    assert client.get("/api/v1/suggest?q=final").get_json()["items"] == []
+
+    with app_instance.app_context():
+        trivia = Trivia(header="Final in Istanbul", body="b", tags="ucl, tag", post_type=PostType.TRIVIA)
+        db.session.add(trivia)
+        db.session.commit()
+        trivia_id = trivia.id
+    assert client.get("/api/v1/suggest?q=final").get_json()["items"] == [
+        {"kind": "trivia", "text": "Final in Istanbul", "id": trivia_id},
+    ]
+    assert client.get("/api/v1/suggest?q=ucl").get_json()["items"] == [{"kind": "tag", "text": "ucl"}]
+
+    with app_instance.app_context():
+        trivia = db.session.get(Trivia, trivia_id)
+        trivia.header, trivia.tags = "Miracle of Istanbul", "tag"
+        db.session.commit()
+    assert client.get("/api/v1/suggest?q=final").get_json()["items"] == []
+    assert client.get("/api/v1/suggest?q=miracle").get_json()["items"][0]["id"] == trivia_id
+    # ucl had one user; tag is still on the poster once the trivia is gone.
+    assert client.get("/api/v1/suggest?q=ucl").get_json()["items"] == []
+    with app_instance.app_context():
+        db.session.delete(db.session.get(Trivia, trivia_id))
+        db.session.commit()
+    assert client.get("/api/v1/suggest?q=istanbul").get_json()["items"] == []
+    assert client.get("/api/v1/suggest?q=ta").get_json()["items"] == [{"kind": "tag", "text": "tag"}]
+    # Every change was applied item by item.
+    assert suggest._state["thread"] is None
+
+
+def test_bulk_writes_rebuild_the_index(client, app_instance):
+    with app_instance.app_context():
+        seed_posters(2)
+    assert len(client.get("/api/v1/suggest?q=post").get_json()["items"]) == 2
+
+    # Columns the index does not hold: nothing to do.
+    with app_instance.app_context():
+        db.session.execute(update(Post), [{"id": 1, "description": "d"}])
+        db.session.commit()
+    client.get("/api/v1/suggest?q=post")
+    assert suggest._state["thread"] is None
+
+    with app_instance.app_context():
+        db.session.execute(update(Post).where(Post.id == 1).values(header="Derby"))
+        db.session.commit()
+    # The old index answers while the new one is built.
+    client.get("/api/v1/suggest?q=post")
+    suggest._state["thread"].join()
+    assert client.get("/api/v1/suggest?q=derby").get_json()["items"] == [
+        {"kind": "poster", "text": "Derby", "id": 1},
+    ]
+
+
+def test_removed_keys_leave_the_others_in_order():
+    index = suggest.Index([(0, 1, "Red card"), (0, 2, "Red wall")])
+    ref = index.add(0, 3, "Redemption")
+    index.add(1, 4, "Card trick")
+    index.remove(0)
+    assert [item["id"] for item in index.search("red")] == [2, 3]
+    assert [item["id"] for item in index.search("card")] == [4]
+    assert len(index) == 3
+    keys = [(index._key(offset), offset) for offset in index.offsets]
+    assert keys == sorted(keys) and ref == 2
@@ -0,0 +1,98 @@
+import pytest
+from flask_login import current_user
+from itsdangerous import TimedJSONWebSignatureSerializer
+from sqlalchemy import event
+from app import db, tokens
+from app.models import Permission, User
+from tests.test_models import create_user
+
+
+def _user(app_instance, role="Administrator"):
+    user = create_user("{}@example.com".format(role.lower()), role)
+    return db.session.get(User, user.id)
+
+
+def test_round_trip_and_tampering(app_instance):
+    with app_instance.app_context():
+        user = _user(app_instance)
+        token = tokens.issue(user, 60)
+        assert token.startswith("at1.0.") and len(token) < 100
+
+        verified = tokens.verify(token)
+        assert (verified.id, verified.email) == (user.id, user.email)
+        assert verified.is_administrator() and verified.can(Permission.WRITE_ARTICLES)
+        assert User.verify_auth_token(token.encode("ascii")) == user.email
+
+        prefix, kid, claims, signature = token.split(".")
+        forged = tokens._b64encode("{:d}:255:9999999999:{}".format(user.id, user.email).encode())
+        for bad in (".".join([prefix, kid, forged, signature]), token[:-2] + "AA", "at1.9." + claims + "." + signature,
+                    "junk", ""):
+            assert tokens.verify(bad) is None
+        assert tokens.verify(tokens.issue(user, -1)) is None
+
+
+def test_key_rotation(app_instance, monkeypatch):
+    with app_instance.app_context():
+        user = _user(app_instance)
+        monkeypatch.setitem(app_instance.config, "API_TOKEN_KEYS", "old:first-secret")
+        old = tokens.issue(user, 60)
+        assert tokens.verify(old) is not None
+
+        monkeypatch.setitem(app_instance.config, "API_TOKEN_KEYS", "new:second-secret,old:first-secret")
+        new = tokens.issue(user, 60)
+        assert new.split(".")[1] == "new"
+        assert tokens.verify(old) is not None and tokens.verify(new) is not None
+
+        # Dropping a key revokes its tokens even though they were cached.
+        monkeypatch.setitem(app_instance.config, "API_TOKEN_KEYS", "new:second-secret")
+        assert tokens.verify(old) is None
+        assert tokens.verify(new) is not None
+
+        monkeypatch.setitem(app_instance.config, "API_TOKEN_KEYS", "a.b:secret")
+        with pytest.raises(ValueError):
+            tokens.issue(user, 60)
+
+
+def test_cache_is_bounded(app_instance, monkeypatch):
+    monkeypatch.setitem(app_instance.config, "API_TOKEN_CACHE_SIZE", 2)
+    with app_instance.app_context():
+        user = _user(app_instance)
+        issued = [tokens.issue(user, 60 + i) for i in range(3)]
+        for token in issued:
+            tokens.verify(token)
+        assert list(tokens._cache) == issued[1:]
+
+
+def test_legacy_tokens_until_switched_off(app_instance, monkeypatch):
+    with app_instance.app_context():
+        user = _user(app_instance)
+        serializer = TimedJSONWebSignatureSerializer(app_instance.config["SECRET_KEY"], expires_in=60)
+        legacy = serializer.dumps({"id": user.email})
+        assert User.verify_auth_token(legacy) == user.email
+        assert User.verify_auth_token(user.generate_confirmation_token()) is None
+
+        tokens.clear()
+        monkeypatch.setitem(app_instance.config, "API_TOKEN_LEGACY", False)
+        assert User.verify_auth_token(legacy) is None
+
+
+def test_api_requests_do_not_query_users(client, app_instance):
+    with app_instance.app_context():
+        token = tokens.issue(_user(app_instance), 60)
+        engine = db.engine
+    headers = {"Authorization": "Bearer " + token}
+    with app_instance.test_request_context("/api/v1/bulk", method="POST", headers=headers):
+        assert current_user.email == "administrator@example.com"
+    with app_instance.test_request_context("/auth/bulk", headers=headers):
+        assert not current_user.is_authenticated
+
+    statements = []
+    collect = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", collect)
+    try:
+        response = client.post("/api/v1/bulk", json={"kind": "posters", "action": "delete", "ids": "1"},
+                               headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", collect)
+    assert response.status_code == 400
+    assert not [s for s in statements if "users" in s]
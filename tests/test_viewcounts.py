@@ -0,0 +1,109 @@
+from app import db, viewcounts
+from app.models import PostView
+from tests.test_main import seed_content
+
+
+def test_views_are_counted_in_memory_then_flushed(client, app_instance):
+    with app_instance.app_context():
+        post, _ = seed_content()
+        post_id = post.id
+
+    for _ in range(3):
+        assert client.get(f"/post/{post_id}/Header").status_code == 200
+
+    with app_instance.app_context():
+        assert PostView.query.get(post_id) is None
+        assert viewcounts.flush() == 1
+        assert PostView.query.get(post_id).views == 3
+
+        viewcounts.record(post_id)
+        viewcounts.flush()
+        counter = PostView.query.get(post_id)
+        assert counter.views == 4
+        # Scores decay between flushes, so they trail the raw count.
+        assert 3.99 < counter.score <= 4.0
+
+
+def test_ranking_is_rendered_without_a_query(client, app_instance):
+    with app_instance.app_context():
+        post, _ = seed_content()
+        viewcounts.record(post.id)
+        viewcounts.flush()
+
+    assert viewcounts.most_read()[0]["header"] == "Header"
+    response = client.get("/")
+    assert b"Most read this week" in response.data
+
+
+def test_decayed_ranking_prefers_recent_views(app_instance):
+    import time
+    from app.models import Post, PostType
+
+    with app_instance.app_context():
+        old = Post(header="Old", post_type=PostType.POSTER)
+        new = Post(header="New", post_type=PostType.POSTER)
+        db.session.add_all([old, new])
+        db.session.commit()
+        half_life = app_instance.config["VIEW_HALF_LIFE"]
+        now = time.time()
+        db.session.add_all([
+            PostView(post_id=old.id, views=10, score=10.0, score_at=now - 3 * half_life),
+            PostView(post_id=new.id, views=3, score=3.0, score_at=now),
+        ])
+        db.session.commit()
+
+        assert [p["header"] for p in viewcounts.load_ranking()] == ["New", "Old"]
+
+
+def test_views_of_a_deleted_poster_are_dropped(client, app_instance):
+    from app.models import Post, PostType
+
+    with app_instance.app_context():
+        post, _ = seed_content()
+        other = Post(header="Other", body="b", post_type=PostType.POSTER)
+        db.session.add(other)
+        db.session.commit()
+        post_id, other_id = post.id, other.id
+
+    assert client.get(f"/post/{post_id}/Header").status_code == 200
+    viewcounts.record(other_id)
+    with app_instance.app_context():
+        db.session.delete(db.session.get(Post, post_id))
+        db.session.commit()
+
+        assert viewcounts.flush() == 1
+        assert PostView.query.get(post_id) is None
+        assert PostView.query.get(other_id).views == 1
+        # Nothing was re-queued, so the next flush has nothing to retry.
+        assert not viewcounts._pending
+        assert viewcounts.flush() == 0
+
+
+def test_concurrent_first_requests_start_one_flusher(app_instance, monkeypatch):
+    import os
+    import time
+    import threading
+
+    started = []
+    monkeypatch.setitem(app_instance.config, "VIEW_FLUSH_INTERVAL", 10)
+    monkeypatch.setitem(viewcounts._flusher, "pid", None)
+    monkeypatch.setattr(viewcounts, "_run", lambda interval: started.append(interval))
+    barrier = threading.Barrier(8)
+
+    def first_request():
+        barrier.wait()
+        viewcounts._ensure_flusher()
+
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # The flusher thread itself may still be starting.
+    for _ in range(100):
+        if started:
+            break
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert started == [10]
+    assert viewcounts._flusher["pid"] == os.getpid()
@@ -0,0 +1,39 @@
+from app import warmup, suggest
+from tests.test_main import seed_content
+
+
+def test_ready_only_after_warm_up(client, app_instance, monkeypatch):
+    monkeypatch.setattr(warmup, "_state", {"pid": None, "ready": False, "seconds": None, "steps": {}})
+    with app_instance.app_context():
+        seed_content()
+
+    assert client.get("/ready").status_code == 503
+
+    steps = warmup.warm(app_instance)
+    assert set(steps) == {"templates", "connections", "pages", "indexes"}
+    assert suggest._state["index"] is not None
+
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "ready"
+
+
+def test_failed_step_does_not_block_readiness(client, app_instance, monkeypatch):
+    monkeypatch.setattr(warmup, "_state", {"pid": None, "ready": False, "seconds": None, "steps": {}})
+    # No posters: the index page fails, the other steps still run.
+    monkeypatch.setitem(app_instance.config, "WARMUP_URLS", ["/"])
+
+    steps = warmup.warm(app_instance)
+    assert "pages" not in steps and "indexes" in steps
+    assert client.get("/ready").status_code == 200
+
+
+def test_app_factory_does_not_warm_up(app_instance, monkeypatch):
+    import threading
+    from app import create_app
+
+    monkeypatch.setattr(warmup, "_state", {"pid": None, "ready": False, "seconds": None, "steps": {}})
+    monkeypatch.setitem(app_instance.config, "WARMUP", True)
+    create_app()
+    assert "warmup" not in [thread.name for thread in threading.enumerate()]
+    assert warmup._state["pid"] is None
@@ -1,6 +1,12 @@
 import os
+import logging
 from manage import app as application
+from app import warmup
 
-print("wsgi")
+logging.info("wsgi")
+# Only the serving process warms up; the cli, db_migrate.py and the
+# benchmarks call create_app() too. Under uWSGI this is a no-op and the
+# postfork hook warms each worker instead.
+warmup.start(application)
 if __name__ == "__main__":
     application.run(host="0.0.0.0")